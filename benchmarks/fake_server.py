@@ -0,0 +1,106 @@
+"""
+    In-process stand-in for the REST API of the weather station, serving /api/v1/auth/* and /api/v1/records/.
+
+    The records are generated once, deterministically, and their JSON is cached, so the time measured on the client
+    side is spent downloading and parsing, not producing the response.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+
+def make_records(total: int, start_id: int = 1) -> List[Dict[str, Any]]:
+    """
+        Hourly readings starting from 2022-01-01, as returned by the database.
+        Ids cannot exceed 99999 (see Id), so they start again from 1 in larger datasets.
+    """
+    records = []
+    for i in range(total):
+        day, hour = divmod(i, 24)
+        records.append({'id': (start_id + i - 1) % 99_999 + 1, 'condition': str(i % 4 + 1), 'humidity': i * 7 % 101,
+                        'temperature': i * 13 % 101 - 50, 'wind': i * 31 % 201,
+                        'date': f'{2022 + day // 336:04}-{day // 28 % 12 + 1:02}-{day % 28 + 1:02}T{hour:02}:00:00+02:00'})
+    return records
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, as the real server behind a proxy
+    disable_nagle_algorithm = True  # Headers and body are separate writes, Nagle would delay the body
+    server: 'FakeServer'
+
+    def __send(self, status: int, body: bytes = b'', headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.path.startswith('/api/v1/records/'):
+            return self.__send(404)
+        if self.headers.get('If-None-Match') == self.server.etag:
+            return self.__send(304, headers={'ETag': self.server.etag})
+        self.__send(200, self.server.body(), {'ETag': self.server.etag})
+
+    def do_POST(self):
+        payload = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/api/v1/auth/login/':
+            return self.__send(200, b'{"key": "benchmark"}')
+        if self.path == '/api/v1/auth/logout/':
+            return self.__send(200, b'{}')
+        if self.path != '/api/v1/records/':
+            return self.__send(404)
+        if self.headers.get('Content-Type') == 'application/json':
+            rows = [dict(row, id=self.server.next_id()) for row in json.loads(payload)]
+            return self.__send(201, json.dumps(rows).encode())
+        row = dict(parse_qsl(payload.decode()), id=self.server.next_id())
+        self.__send(201, json.dumps(row).encode())
+
+    def do_DELETE(self):
+        self.__send(204)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeServer(ThreadingHTTPServer):
+    """
+        Use as a context manager: the server runs in a daemon thread and base_url points to its /api/v1/
+    """
+    daemon_threads = True
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.__lock = threading.Lock()
+        self.__ids = count(1)
+        self.__thread: Optional[threading.Thread] = None
+        self.set_records(records or [])
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/api/v1/'
+
+    def set_records(self, records: List[Dict[str, Any]]) -> None:
+        self.__body = json.dumps(records).encode()
+        self.etag = f'"{len(records)}-{hash(self.__body)}"'
+
+    def body(self) -> bytes:
+        return self.__body
+
+    def next_id(self) -> int:
+        with self.__lock:
+            return next(self.__ids) % 99_999 + 1
+
+    def __enter__(self) -> 'FakeServer':
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
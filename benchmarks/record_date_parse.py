@@ -0,0 +1,56 @@
+"""
+    Micro-benchmark of the parsing of the dates sent by the database.
+
+    Compares the previous implementation (split at '+' and strptime) with the current one (fromisoformat, memoized),
+    both on distinct timestamps and on hourly readings, which repeat the same 24 timestamps every day.
+
+    Run with: python -m benchmarks.record_date_parse
+"""
+from datetime import datetime, timedelta
+from timeit import repeat
+
+from tui_ssd import domain
+from tui_ssd.domain import RecordDate
+
+
+def legacy_parse(value: str) -> datetime:
+    return datetime.strptime(value.split('+')[0], '%Y-%m-%dT%H:%M:%S')
+
+
+def current_parse(value: str) -> datetime:
+    return domain._parse_db_datetime(value)
+
+
+def distinct_dates(count: int) -> list:
+    start = datetime(2023, 1, 1)
+    return [(start + timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%S+01:00') for i in range(count)]
+
+
+def hourly_dates(days: int) -> list:
+    return [f'2023-12-08T{hour:02}:00:00+01:00' for _ in range(days) for hour in range(24)]
+
+
+def best_of(function, values: list, cold: bool) -> float:
+    def run():
+        if cold:
+            domain._parse_db_datetime.cache_clear()
+        for value in values:
+            function(value)
+    return min(repeat(run, number=1, repeat=5))
+
+
+def main() -> None:
+    datasets = {'distinct': distinct_dates(24_000), 'hourly': hourly_dates(1_000)}
+    print(f'{"dataset":<10} {"legacy (ms)":>12} {"current (ms)":>13} {"speedup":>8}')
+    for name, values in datasets.items():
+        legacy = best_of(legacy_parse, values, cold=False)
+        current = best_of(current_parse, values, cold=True)
+        print(f'{name:<10} {legacy * 1000:>12.1f} {current * 1000:>13.1f} {legacy / current:>7.1f}x')
+    parse = best_of(RecordDate.parse, datasets['hourly'], cold=True)
+    trusted = best_of(lambda values: RecordDate.parse_trusted(values), [datasets['hourly']], cold=True)
+    print(f'RecordDate.parse on {len(datasets["hourly"])} hourly dates: {parse * 1000:.1f} ms, '
+          f'parse_trusted: {trusted * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+    Benchmark suite of the TUI, run against the in-process FakeServer.
+
+    Cases: construction of the domain objects, sorts of RecordList, the synchronization done by App.__load
+    (download, parsing and merge) at 1k and 100k records (1M with --full), bulk save throughput and rendering
+    of the records table. Every case reports the best of its rounds.
+    Ids are at most 99999, so above that size the ids repeat: the 1M load measures download and parsing of 1M rows,
+    but the list ends up with fewer records.
+
+    The results are written as JSON and compared with a stored baseline: the run fails (exit code 1) if a case
+    got slower than the baseline by more than the threshold. The baseline is machine dependent,
+    refresh it with --update-baseline after changing machine or on purpose.
+
+    Run with: python -m benchmarks.suite [--full] [--threshold 0.25] [--update-baseline]
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.fake_server import FakeServer, make_records
+from tui_ssd.api import ApiClient
+from tui_ssd.app import App
+from tui_ssd.domain import Record, RecordList
+from tui_ssd.filters import parse_filter
+from tui_ssd.render import print_records
+
+BASELINE = Path(__file__).with_name('baseline.json')
+Results = Dict[str, Dict[str, Any]]
+
+
+def measure(run: Callable[[Any], None], setup: Callable[[], Any] = lambda: None, rounds: int = 5,
+            items: int = 1) -> Dict[str, Any]:
+    """
+        Best time of run(setup()) over the rounds; setup is not measured
+    """
+    best = float('inf')
+    for _ in range(rounds):
+        state = setup()
+        start = perf_counter()
+        run(state)
+        best = min(best, perf_counter() - start)
+    return {'seconds': best, 'rounds': rounds, 'items': items, 'per_second': items / best if best else None}
+
+
+def bench_domain(results: Results, rows: List[Dict[str, Any]]) -> None:
+    results[f'domain/parse_{len(rows)}'] = measure(lambda _: [Record.parse(row) for row in rows], items=len(rows))
+    results[f'domain/from_trusted_rows_{len(rows)}'] = measure(lambda _: Record.from_trusted_rows(rows),
+                                                               items=len(rows))
+
+
+def bench_sorts(results: Results, rows: List[Dict[str, Any]]) -> None:
+    loaded = RecordList()
+    loaded.add_records(Record.from_trusted_rows(rows))
+    columns = loaded.columns()
+
+    def fresh() -> RecordList:  # The permutations are cached, every round starts from an unsorted list
+        record_list = RecordList()
+        record_list.load_columns(columns)
+        return record_list
+
+    for key in ('temperature', 'humidity', 'wind', 'ascending_date'):
+        results[f'record_list/sort_by_{key}_{len(rows)}'] = \
+            measure(lambda record_list: getattr(record_list, f'sort_by_{key}')(), fresh, items=len(rows))
+    results[f'record_list/top_10_temperature_{len(rows)}'] = \
+        measure(lambda record_list: record_list.top_k('temperature', 10).records, fresh, items=len(rows))
+    expression = parse_filter('rainy and wind > 150')
+    results[f'record_list/filter_{len(rows)}'] = \
+        measure(lambda record_list: record_list.filter(expression).records, fresh, items=len(rows))
+
+
+def bench_load(results: Results, server: FakeServer, total: int) -> None:
+    server.set_records(make_records(total))
+
+    def fresh() -> App:
+        api = ApiClient(server.base_url)
+        api.token = 'benchmark'
+        return App(api)
+
+    def load(app: App) -> None:
+        with redirect_stdout(io.StringIO()):  # The progress line
+            app._App__load()  # The method run by the menu, private to App
+
+    rounds = 5 if total <= 100_000 else 1
+    results[f'app/load_{total}'] = measure(load, fresh, rounds=rounds, items=total)
+
+
+def bench_save(results: Results, server: FakeServer, total: int) -> None:
+    rows = [Record.parse(row).db_json for row in make_records(total)]
+    for name, batch_create in (('concurrent', False), ('batch', True)):
+        api = ApiClient(server.base_url, batch_create=batch_create)
+        results[f'api/create_records_{name}_{total}'] = measure(lambda _: api.create_records(rows), rounds=3,
+                                                                items=total)
+        api.close()
+
+
+def bench_render(results: Results, rows: List[Dict[str, Any]]) -> None:
+    record_list = RecordList()
+    record_list.add_records(Record.from_trusted_rows(rows))
+
+    def render(_) -> None:
+        with redirect_stdout(io.StringIO()):
+            print_records(record_list)
+
+    results[f'render/print_records_{len(rows)}'] = measure(render, items=len(rows))
+
+
+def run_suite(full: bool = False) -> Results:
+    results: Results = {}
+    bench_domain(results, make_records(10_000))
+    bench_sorts(results, make_records(100_000))
+    bench_render(results, make_records(10_000))
+    with FakeServer() as server:
+        for total in (1_000, 100_000, 1_000_000) if full else (1_000, 100_000):
+            bench_load(results, server, total)
+        bench_save(results, server, 1_000)
+    return results
+
+
+def compare(results: Results, baseline: Results, threshold: float) -> List[Tuple[str, float, float]]:
+    """
+        Returns (case, baseline seconds, current seconds) of the cases slower than the baseline by more than threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result['seconds'] > baseline[name]['seconds'] * (1 + threshold):
+            regressions.append((name, baseline[name]['seconds'], result['seconds']))
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description='Runs the benchmark suite')
+    parser.add_argument('--full', action='store_true', help='also load 1M records')
+    parser.add_argument('--output', type=Path, default=Path('benchmark-results.json'))
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.full)
+    document = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    args.output.write_text(json.dumps(document, indent=2))
+    print(f'{"case":<45} {"seconds":>10} {"items/s":>12}')
+    for name, result in results.items():
+        print(f'{name:<45} {result["seconds"]:>10.4f} {result["per_second"] or 0:>12.0f}')
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2))
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+    if not args.baseline.exists():
+        print(f'No baseline at {args.baseline}, run with --update-baseline to create it')
+        return 0
+    regressions = compare(results, json.loads(args.baseline.read_text())['results'], args.threshold)
+    for name, before, after in regressions:
+        print(f'REGRESSION {name}: {before:.4f}s -> {after:.4f}s (+{(after / before - 1) * 100:.0f}%)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,28 @@
+from benchmarks.fake_server import FakeServer, make_records
+from benchmarks.suite import bench_load, bench_save, compare, measure
+
+
+def test_compare_reports_only_slowdowns_beyond_threshold():
+    baseline = {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0}, 'c': {'seconds': 1.0}}
+    results = {'a': {'seconds': 1.2}, 'b': {'seconds': 1.3}, 'c': {'seconds': 0.5}, 'new': {'seconds': 9.0}}
+    assert compare(results, baseline, 0.25) == [('b', 1.0, 1.3)]
+
+
+def test_measure_does_not_time_setup():
+    calls = []
+    result = measure(lambda state: calls.append(state), setup=lambda: len(calls), rounds=3, items=10)
+    assert calls == [0, 1, 2]
+    assert result['rounds'] == 3 and result['items'] == 10
+
+
+def test_make_records_are_valid_with_ids_in_range():
+    records = make_records(100_100)
+    assert {record['id'] for record in records} == set(range(1, 100_000))
+
+
+def test_load_and_save_cases_run_against_fake_server():
+    results = {}
+    with FakeServer() as server:
+        bench_load(results, server, 50)
+        bench_save(results, server, 20)
+    assert set(results) == {'app/load_50', 'api/create_records_concurrent_20', 'api/create_records_batch_20'}
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from valid8 import ValidationError
+
+from tui_ssd.api import ApiClient, AsyncApiClient, ConnectionStats
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Needed to keep the connection alive between requests
+    seen_authorization = []
+    posts = []
+    deletes = []
+    idempotency_keys = []
+    batch_supported = False
+    paginated = False
+    records = []
+
+    def do_GET(self):
+        self.seen_authorization.append(self.headers.get('Authorization'))
+        query = parse_qs(urlparse(self.path).query)
+        if self.paginated:
+            limit, offset = int(query['limit'][0]), int(query.get('offset', ['0'])[0])
+            following = f'{self.path.split("?")[0]}?limit={limit}&offset={offset + limit}'
+            body = json.dumps({'count': len(self.records), 'previous': None, 'results': self.records[offset:offset + limit],
+                               'next': following if offset + limit < len(self.records) else None}).encode()
+        else:
+            body = json.dumps(self.records).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.posts.append(payload)
+        self.idempotency_keys.append(self.headers.get('Idempotency-Key'))
+        if self.headers.get('Content-Type') == 'application/json':
+            rows = json.loads(payload)
+            status, body = (201, [dict(row, id=i + 1) for i, row in enumerate(rows)]) if self.batch_supported else (400, {})
+        else:
+            status, body = 201, {'id': len(self.posts)}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_DELETE(self):
+        payload = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.deletes.append((self.path, payload))
+        if self.path.endswith('/records/'):
+            status = 204 if self.batch_supported else 405
+        else:
+            status = 404 if self.path.endswith('/13/') else 204
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.seen_authorization = []
+    _Handler.posts = []
+    _Handler.deletes = []
+    _Handler.idempotency_keys = []
+    _Handler.batch_supported = False
+    _Handler.paginated = False
+    _Handler.records = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/api/v1/'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_urls_are_built_from_base_url():
+    client = ApiClient('http://host/api/v1/')
+    assert client.login_url == 'http://host/api/v1/auth/login/'
+    assert client.logout_url == 'http://host/api/v1/auth/logout/'
+    assert client.records_url == 'http://host/api/v1/records/'
+    assert client.record_url(44) == 'http://host/api/v1/records/44/'
+
+
+@pytest.mark.parametrize('pool_size, timeout', [
+    (0, 1.0),
+    (1, 0.0),
+])
+def test_wrong_client_configuration_raises_validation_error(pool_size, timeout):
+    with pytest.raises(ValidationError):
+        ApiClient(pool_size=pool_size, timeout=timeout)
+
+
+def test_connection_stats_reused():
+    stats = ConnectionStats(24, 1)
+    assert stats.reused == 23
+    assert str(stats) == '24 requests over 1 connections (23 reused)'
+
+
+def test_token_is_sent_in_authorization_header(server):
+    client = ApiClient(server)
+    client.token = 'abc'
+    client.fetch_records().close()
+    client.token = None
+    client.fetch_records().close()
+    client.close()
+    assert _Handler.seen_authorization == ['Token abc', None]
+
+
+def test_connections_are_reused(server):
+    client = ApiClient(server)
+    for _ in range(5):
+        assert list(client.iter_records(client.fetch_records())) == []
+    stats = client.connection_stats()
+    client.close()
+    assert stats.requests == 5
+    assert stats.connections == 1
+    assert stats.reused == 4
+
+
+def test_create_records_sends_rows_concurrently(server):
+    client = ApiClient(server, pool_size=4)
+    results = client.create_records([{'wind': i} for i in range(10)])
+    stats = client.connection_stats()
+    client.close()
+    assert len(results) == 10
+    assert all(res.created for res in results)
+    assert len(_Handler.posts) == 10
+    assert stats.connections <= 4
+
+
+def test_create_records_uses_a_single_request_when_batch_is_supported(server):
+    _Handler.batch_supported = True
+    client = ApiClient(server, batch_create=True)
+    results = client.create_records([{'wind': i} for i in range(10)])
+    client.close()
+    assert len(_Handler.posts) == 1
+    assert [res.body['wind'] for res in results] == list(range(10))
+
+
+def test_create_records_falls_back_when_batch_is_refused(server):
+    client = ApiClient(server, batch_create=True)
+    results = client.create_records([{'wind': i} for i in range(3)])
+    client.close()
+    assert len(_Handler.posts) == 4  # The refused batch and then one request per row
+    assert all(res.created for res in results)
+
+
+def test_create_records_sends_an_idempotency_key_per_row(server):
+    client = ApiClient(server, pool_size=2)
+    results = client.create_records([{'wind': i} for i in range(3)], idempotency_keys=['a', 'b', 'c'])
+    client.close()
+    assert all(res.created for res in results)
+    assert sorted(_Handler.idempotency_keys) == ['a', 'b', 'c']
+
+
+def test_create_records_sends_the_key_of_every_row_in_a_batch(server):
+    _Handler.batch_supported = True
+    client = ApiClient(server, batch_create=True)
+    results = client.create_records([{'wind': 1}, {'wind': 2}], idempotency_keys=['a', 'b'])
+    client.close()
+    assert [res.body['wind'] for res in results] == [1, 2]
+    assert json.loads(_Handler.posts[0]) == [{'wind': 1, 'idempotency_key': 'a'}, {'wind': 2, 'idempotency_key': 'b'}]
+    assert _Handler.idempotency_keys == [None]
+
+
+def test_create_records_requires_a_key_per_row(server):
+    client = ApiClient(server)
+    with pytest.raises(ValidationError):
+        client.create_records([{'wind': 1}, {'wind': 2}], idempotency_keys=['a'])
+    client.close()
+
+
+@pytest.fixture
+def many_records():
+    return [{'id': i, 'condition': '1', 'humidity': 60, 'temperature': -i % 50, 'wind': 20,
+             'date': '2022-10-20T11:54:00+02:00', 'note': 'città' * (i % 3)} for i in range(1, 5001)]
+
+
+def test_plain_list_is_decoded_while_streaming(server, many_records):
+    _Handler.records = many_records
+    client = ApiClient(server, page_size=700)
+    progress = []
+    pages = list(client.iter_records(client.fetch_records(), on_progress=lambda loaded, total: progress.append(loaded)))
+    client.close()
+    assert [len(page) for page in pages] == [700] * 7 + [100]
+    assert [row for page in pages for row in page] == many_records
+    assert progress[-1] == 5000
+
+
+def test_paginated_response_is_followed(server, many_records):
+    _Handler.records = many_records
+    _Handler.paginated = True
+    client = ApiClient(server, page_size=1000)
+    progress = []
+    pages = list(client.iter_records(client.fetch_records(), on_progress=lambda *args: progress.append(args)))
+    stats = client.connection_stats()
+    client.close()
+    assert [row for page in pages for row in page] == many_records
+    assert progress == [(1000 * i, 5000) for i in range(1, 6)]
+    assert stats.requests == 5
+    assert stats.connections == 1
+
+
+def test_async_client_bounds_concurrency_and_streams_pages(server, many_records):
+    _Handler.records = many_records
+
+    async def scenario():
+        client = AsyncApiClient(ApiClient(server, pool_size=3, page_size=1000), max_concurrency=3)
+        peaks = []
+        creating = asyncio.ensure_future(client.create_records([{'wind': i} for i in range(12)]))
+        while not creating.done():
+            peaks.append(client.in_flight)
+            await asyncio.sleep(0)
+        pages = [rows async for rows in client.iter_records(await client.fetch_records())]
+        client.close()
+        return creating.result(), peaks, pages
+
+    results, peaks, pages = asyncio.run(scenario())
+    assert len(results) == 12 and all(res.created for res in results)
+    assert max(peaks) <= 3
+    assert [len(page) for page in pages] == [1000] * 5
+    assert [row for page in pages for row in page] == many_records
+
+
+def test_metrics_record_requests_per_endpoint(server):
+    from tui_ssd.metrics import Metrics
+    metrics = Metrics()
+    client = ApiClient(server, metrics=metrics)
+    list(client.iter_records(client.fetch_records()))
+    client.create_record({'wind': 1})
+    client.close()
+    assert metrics.histogram('http_request_seconds', method='GET', endpoint='records/').count == 1
+    assert metrics.counter('http_responses_total', method='POST', endpoint='records/', status='201') == 1
+
+
+def test_delete_records_reports_every_id(server):
+    client = ApiClient(server, pool_size=3)
+    results = client.delete_records([11, 12, 13, 14])
+    client.close()
+    assert [res.record_id for res in results] == [11, 12, 13, 14]
+    assert [res.status_code for res in results] == [204, 204, 404, 204]
+    assert all(res.deleted for res in results)
+    assert sorted(path for path, _ in _Handler.deletes) == [f'/api/v1/records/{i}/' for i in (11, 12, 13, 14)]
+
+
+def test_delete_records_uses_a_single_request_when_batch_is_supported(server):
+    _Handler.batch_supported = True
+    client = ApiClient(server, batch_delete=True)
+    results = client.delete_records([11, 12])
+    client.close()
+    assert _Handler.deletes == [('/api/v1/records/', b'{"ids": [11, 12]}')]
+    assert [res.status_code for res in results] == [204, 204]
+
+
+def test_delete_records_falls_back_when_batch_is_refused(server):
+    client = ApiClient(server, batch_delete=True)
+    results = client.delete_records([11, 12])
+    client.close()
+    assert len(_Handler.deletes) == 3
+    assert all(res.deleted for res in results)
@@ -1,11 +1,43 @@
+import os
+import json
 import pytest
 from pathlib import Path
 from unittest.mock import patch, mock_open, Mock, call, MagicMock
 from tui_ssd.app import App, main
+from tui_ssd.archive import RecordArchive
+from tui_ssd.journal import Journal, JournalEntry
+from tui_ssd.poller import PollInterval
+from tui_ssd.render import CLEAR_SCREEN
 from tui_ssd.domain import *
 import requests
 
 
+def json_response(data, status_code=200, headers=None) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status_code
+    res.headers.update(headers or {})
+    res._content = json.dumps(data).encode()
+    res._content_consumed = True
+    return res
+
+
+def last_table_rows(mocked_print, table: int = -1) -> list:
+    """
+        The record rows of the last table printed (or of the one before it with table=-2 and so on),
+        between its header and its closing separator
+    """
+    lines = [line for c in mocked_print.call_args_list if c.args for line in str(c.args[0]).split('\n')]
+    header = [i for i, line in enumerate(lines) if line.startswith('#  ')][table]
+    rows = lines[header + 2:]
+    return rows[:rows.index('-' * 130)]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    return tmp_path / 'tui_ssd'
+
+
 @pytest.fixture
 def my_json():
     return [{
@@ -28,17 +60,14 @@ def my_json():
 @patch('getpass.getpass', side_effect=['valid_password'])
 @patch('builtins.input', side_effect=['valid_username', 'valid_password', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_connect_correct_login_and_logout(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = Mock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_response_get.json.return_value = my_json
-    mocked_get.return_value = mocked_response_get
+    mocked_get.return_value = json_response(my_json)
 
     main('__main__')
     mocked_print.assert_any_call('*** Your Secure Weather TUI ***')
@@ -48,24 +77,21 @@ def test_app_connect_correct_login_and_logout(mocked_get, mocked_post, mocked_pr
     mocked_post.assert_any_call('http://localhost:8000/api/v1/auth/login/',
                                 json={'username': 'valid_username', 'email': '', 'password': 'valid_password'})
     assert mocked_get.call_count == 1  # get records
-    mocked_print.assert_any_call('0:\tExit')
+    assert list(filter(lambda x: '0: Exit' in str(x.args[0]), mocked_print.call_args_list))
     mocked_print.assert_any_call('Cya!')
 
 
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '1', '40', '60', '13', '1', '20/10/2022 11:54', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_add_new_record(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = Mock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_response_get.json.return_value = my_json
-    mocked_get.return_value = mocked_response_get
+    mocked_get.return_value = json_response(my_json)
 
     App().run()
     assert mocked_post.call_count == 3  # Login, add record, logout
@@ -79,17 +105,14 @@ def test_app_add_new_record(mocked_get, mocked_post, mocked_print, mocked_input,
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '1', '160', '40', '60',
                                       '13', '1', 'wrong_date', '20/10/2022 11:54', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_add_new_record_resists_wrong_values(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = Mock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_response_get.json.return_value = my_json
-    mocked_get.return_value = mocked_response_get
+    mocked_get.return_value = json_response(my_json)
 
     App().run()
     assert mocked_post.call_count == 3  # Login, add record, logout
@@ -103,17 +126,14 @@ def test_app_add_new_record_resists_wrong_values(mocked_get, mocked_post, mocked
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '2', '0', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_remove_record_can_be_cancelled(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = Mock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
 
     App().run()
     mocked_input.assert_called()
@@ -124,19 +144,15 @@ def test_app_remove_record_can_be_cancelled(mocked_get, mocked_post, mocked_prin
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '2', '1', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
-@patch('requests.delete')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
 def test_app_correct_remove_record(mocked_delete, mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
-    mocked_token = mocked_post().json().get()
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
 
     mocked_response = MagicMock()
     mocked_response.status_code = 204
@@ -144,17 +160,16 @@ def test_app_correct_remove_record(mocked_delete, mocked_get, mocked_post, mocke
 
     App().run()
     mocked_input.assert_called()
-    mocked_delete.assert_called_with(url=f'http://localhost:8000/api/v1/records/{44}/',
-                                     headers={'Authorization': f'Token {mocked_token}'})
+    mocked_delete.assert_called_with(url=f'http://localhost:8000/api/v1/records/{44}/')
     mocked_print.assert_any_call('Record removed!')
     mocked_print.assert_any_call('Cya!')
 
 
 @patch('getpass.getpass', side_effect=['fake_pass'])
-@patch('builtins.input', side_effect=['fake_username', 'fake_pass', '3', '0'])
+@patch('builtins.input', side_effect=['fake_username', 'fake_pass', '3', '', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_correct_generation_of_records(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
     mocked_response.status_code = 200
@@ -163,10 +178,7 @@ def test_app_correct_generation_of_records(mocked_get, mocked_post, mocked_print
     mocked_response.side_effect = mocked_response_post
     # mocked_token = mocked_post().json().get()
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
 
     App().run()
     mocked_input.assert_called()
@@ -178,31 +190,155 @@ def test_app_correct_generation_of_records(mocked_get, mocked_post, mocked_print
     mocked_print.assert_any_call('Cya!')
 
 
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', 'fake_pass', '3', 'x', '2d', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_generation_merges_created_records_without_reload(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                              mocked_getpass):
+    created = [MagicMock(status_code=201) for _ in range(48)]
+    for i, res in enumerate(created):
+        res.json.return_value = {'id': i + 1, 'condition': '2', 'humidity': 10, 'temperature': 5, 'wind': 3,
+                                 'date': '2023-12-08T12:20:00+01:00'}
+    login = MagicMock(status_code=200)
+    mocked_post.side_effect = [login, *created, MagicMock(status_code=200)]
+
+    mocked_get.return_value = json_response([])
+
+    App().run()
+    assert mocked_post.call_count == 50  # Login, 48 add to db, Logout
+    assert mocked_get.call_count == 1  # Only the first load after login
+    mocked_print.assert_any_call('48 of 48 records saved!')
+    assert list(filter(lambda x: '08/12/2023 at 12:20' in str(x), mocked_print.mock_calls))
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', 'fake_pass', '8', '8', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_update_applies_only_changes(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    first = json_response(my_json, headers={'ETag': '"v1"'})
+    not_modified = json_response(None, status_code=304)
+    changed = json_response([dict(my_json[1], wind=99)], headers={'ETag': '"v2"'})
+    mocked_get.side_effect = [first, not_modified, changed]
+
+    App().run()
+    assert mocked_get.call_args_list[1].kwargs['headers'] == {'If-None-Match': '"v1"'}
+    last_screen = last_table_rows(mocked_print)
+    assert not list(filter(lambda x: '20/10/2022 at 11:54' in x, last_screen))
+    assert list(filter(lambda x: '99' in x and '20/10/2022 at 14:54' in x, last_screen))
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', 'fake_pass', '8', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_starts_from_snapshot_and_reconciles_in_background(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                               mocked_getpass, my_json, cache_dir):
+    from tui_ssd.snapshot import Snapshot
+    cached = RecordList()
+    cached.add_record(Record(Temperature(1), Humidity(2), Wind(3), Condition.create('4'),
+                             RecordDate.create('01/01/2001 10:00'), id=Id(43)))
+    Snapshot('fake_username', cache_dir).save(cached, '"v1"')
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json, headers={'ETag': '"v2"'})
+
+    App().run()
+    screens = [str(c) for c in mocked_print.call_args_list]
+    first_screen = screens[:next(i for i, screen in enumerate(screens) if '0: Exit' in screen)]
+    assert list(filter(lambda x: '01/01/2001 at 10:00' in x, first_screen))
+    assert not list(filter(lambda x: '20/10/2022 at 11:54' in x, first_screen))
+    assert mocked_get.call_args_list[0].kwargs['headers'] == {'If-None-Match': '"v1"'}
+    last_screen = screens[len(first_screen):]
+    assert not list(filter(lambda x: '01/01/2001 at 10:00' in x, last_screen))
+    assert list(filter(lambda x: '20/10/2022 at 11:54' in x, last_screen))
+    kept = RecordList()
+    assert Snapshot('fake_username', cache_dir).load(kept) == ('"v2"', None)  # Kept for the next login
+    assert kept.records == 2
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input')
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_import_interrupted_by_the_server_can_be_resumed(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                              mocked_getpass, my_json, tmp_path):
+    archive = tmp_path / 'archive.csv'
+    archive.write_text('temperature,humidity,wind,condition,date\n'
+                       '10,50,5,1,08/12/2023 12:20\n')
+    mocked_post.side_effect = [MagicMock(status_code=200), requests.exceptions.ConnectionError(),
+                               MagicMock(status_code=200)]
+    mocked_get.return_value = json_response(my_json)
+
+    mocked_input.side_effect = ['fake_username', '11', str(archive), '', '0']
+    App().run()
+    mocked_print.assert_any_call(f'Server unreachable: import {archive} again to resume from the last batch sent')
+    assert len(last_table_rows(mocked_print)) == 2
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '2', '1', '2', '1', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+@patch('tui_ssd.snapshot.Snapshot.save')
+def test_app_does_not_save_the_snapshot_after_every_change(mocked_save, mocked_delete, mocked_get, mocked_post,
+                                                           mocked_print, mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+    mocked_delete.return_value = MagicMock(status_code=204)
+    App().run()
+    assert mocked_delete.call_count == 2
+    assert mocked_save.call_count == 2  # After the load and at the exit, not after every removal
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '5', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get', side_effect=requests.exceptions.ConnectionError())
+def test_app_keeps_the_snapshot_when_the_server_is_unreachable(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                               mocked_getpass, cache_dir):
+    from tui_ssd.snapshot import Snapshot
+    cached = RecordList()
+    cached.add_record(Record(Temperature(1), Humidity(2), Wind(3), Condition.create('4'),
+                             RecordDate.create('01/01/2001 10:00'), id=Id(43)))
+    Snapshot('fake_username', cache_dir).save(cached, '"v1"')
+    mocked_post.return_value = MagicMock(status_code=200)
+
+    App(poll_interval=PollInterval(initial=0)).run()
+    mocked_get.assert_called()
+    assert '01/01/2001 at 10:00' in last_table_rows(mocked_print)[0]  # After the failed reconcile was applied
+    mocked_print.assert_any_call('Cya!')
+
+
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '4', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_sorting_by_temperature(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
     App().run()
     """
-        Here we are accessing at the 26th and 27th position of the list of calls of the mocked_print
+        Here we are accessing the rows of the last table printed by the mocked_print
         We are asserting that the date (used as identifier to avoid ambiguities between numbers) are printed in 
         the correct order (sorted by temperature) on the screen  
     """
-    first_rec = mocked_print.call_args_list[26]
-    second_rec = mocked_print.call_args_list[27]
+    first_rec, second_rec = last_table_rows(mocked_print)[:2]
 
-    assert '20/10/2022 at 14:54' in first_rec.args[0]
-    assert '20/10/2022 at 11:54' in second_rec.args[0]
+    assert '20/10/2022 at 14:54' in first_rec
+    assert '20/10/2022 at 11:54' in second_rec
 
     mocked_print.assert_any_call('Cya!')
 
@@ -210,24 +346,20 @@ def test_app_sorting_by_temperature(mocked_get, mocked_post, mocked_print, mocke
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '5', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_sorting_by_humidity(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
     App().run()
 
-    first_rec = mocked_print.call_args_list[26]
-    second_rec = mocked_print.call_args_list[27]
+    first_rec, second_rec = last_table_rows(mocked_print)[:2]
 
-    assert '20/10/2022 at 11:54' in first_rec.args[0]
-    assert '20/10/2022 at 14:54' in second_rec.args[0]
+    assert '20/10/2022 at 11:54' in first_rec
+    assert '20/10/2022 at 14:54' in second_rec
 
     mocked_print.assert_any_call('Cya!')
 
@@ -235,24 +367,20 @@ def test_app_sorting_by_humidity(mocked_get, mocked_post, mocked_print, mocked_i
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '6', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_sorting_by_wind(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
     App().run()
 
-    first_rec = mocked_print.call_args_list[26]
-    second_rec = mocked_print.call_args_list[27]
+    first_rec, second_rec = last_table_rows(mocked_print)[:2]
 
-    assert '20/10/2022 at 14:54' in first_rec.args[0]
-    assert '20/10/2022 at 11:54' in second_rec.args[0]
+    assert '20/10/2022 at 14:54' in first_rec
+    assert '20/10/2022 at 11:54' in second_rec
 
     mocked_print.assert_any_call('Cya!')
 
@@ -260,24 +388,20 @@ def test_app_sorting_by_wind(mocked_get, mocked_post, mocked_print, mocked_input
 @patch('getpass.getpass', side_effect=['fake_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'fake_pass', '7', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_sorting_by_date(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
     mocked_response.status_code = 200
     mocked_post.return_value = mocked_response
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
     App().run()
 
-    first_rec = mocked_print.call_args_list[26]
-    second_rec = mocked_print.call_args_list[27]
+    first_rec, second_rec = last_table_rows(mocked_print)[:2]
 
-    assert '20/10/2022 at 11:54' in first_rec.args[0]
-    assert '20/10/2022 at 14:54' in second_rec.args[0]
+    assert '20/10/2022 at 11:54' in first_rec
+    assert '20/10/2022 at 14:54' in second_rec
 
     mocked_print.assert_any_call('Cya!')
 
@@ -285,8 +409,8 @@ def test_app_sorting_by_date(mocked_get, mocked_post, mocked_print, mocked_input
 @patch('getpass.getpass', side_effect=['wrong_pass', 'valid_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'wrong_pass', 'username', 'valid_pass', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_wrong_credentials_given(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass):
     mocked_bad_response = MagicMock()
     mocked_bad_response.status_code = 400
@@ -318,8 +442,8 @@ def test_app_wrong_credentials_given(mocked_get, mocked_post, mocked_print, mock
 @patch('getpass.getpass', side_effect=['valid_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'valid_pass', '1', '40', '60', '13', '1', '20/10/2022 11:54', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
 def test_app_gives_unauthorized_if_normal_user_add_new_data(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass):
     mocked_bad_response = MagicMock()
     mocked_bad_response.status_code = 405
@@ -339,9 +463,9 @@ def test_app_gives_unauthorized_if_normal_user_add_new_data(mocked_get, mocked_p
 @patch('getpass.getpass', side_effect=['valid_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'valid_pass', '2', '1', '0'])
 @patch('builtins.print')
-@patch('requests.post')
-@patch('requests.get')
-@patch('requests.delete')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
 def test_app_gives_unauthorized_if_normal_user_delete_data(mocked_delete, mocked_get, mocked_post, mocked_print,
                                                            mocked_input, mocked_getpass, my_json):
     mocked_response = MagicMock()
@@ -349,10 +473,7 @@ def test_app_gives_unauthorized_if_normal_user_delete_data(mocked_delete, mocked
     mocked_post.return_value = mocked_response
     mocked_token = mocked_post().json().get()
 
-    mocked_response_get = Mock()
-    mocked_response_get.status_code = 200
-    mocked_get.return_value = mocked_response_get
-    mocked_response_get.json.return_value = my_json
+    mocked_get.return_value = json_response(my_json)
 
     mocked_response = MagicMock()
     mocked_response.status_code = 405
@@ -370,7 +491,7 @@ def test_app_gives_unauthorized_if_normal_user_delete_data(mocked_delete, mocked
 @patch('getpass.getpass', side_effect=['valid_pass'])
 @patch('builtins.input', side_effect=['fake_username', 'valid_pass', '2', '1', '0'])
 @patch('builtins.print')
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_app_connection_error_exception_is_raised(mocked_post, mocked_print, mocked_input, mocked_getpass):
     mocked_post.side_effect = requests.exceptions.ConnectionError()
     App().run()
@@ -389,3 +510,423 @@ def test_app_global_exception_handler(mocked_print, mocked_input):
     exception_mock.side_effect = Mock(side_effect=Exception('AnExceptionThatBreaksTheCode'))
 
     App().run()
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', 'm', '', '8', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_times_load_phases_and_dumps_metrics_on_exit(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                         mocked_getpass, my_json, tmp_path, monkeypatch):
+    monkeypatch.setenv('TUI_SSD_METRICS', str(tmp_path / 'metrics.prom'))
+    monkeypatch.setenv('TUI_SSD_METRICS_FORMAT', 'prometheus')
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.side_effect = [json_response(my_json), json_response(my_json)]
+
+    App().run()
+    assert list(filter(lambda x: 'load_phase_seconds{phase="decode"}' in str(x), mocked_print.mock_calls))
+    dump = (tmp_path / 'metrics.prom').read_text()
+    for phase in ('request', 'decode', 'construct', 'insert'):
+        assert f'tui_ssd_load_phase_seconds_count{{phase="{phase}"}}' in dump
+    assert 'tui_ssd_load_phase_seconds_count{phase="request"} 2' in dump
+    assert 'tui_ssd_menu_action_seconds_count{action="Update records list"} 1' in dump
+    assert 'tui_ssd_render_seconds_count' in dump
+    assert '# TYPE tui_ssd_http_connections_reused gauge' in dump
+    assert list(filter(lambda x: str(x.args[0]).startswith('HTTP: ') and 'reused' in str(x.args[0]),
+                       mocked_print.call_args_list))
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '9', 'x', 'c', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_shows_statistics_by_condition(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass,
+                                           my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    printed = [str(c.args[0]) for c in mocked_print.call_args_list if c.args]
+    assert 'TEMPERATURE (˚C) BY CONDITION' in printed
+    assert list(filter(lambda x: x.startswith('SUNNY') and x.split()[1:4] == ['2', '34', '40'], printed))
+    assert 'WIND (Km/h) BY CONDITION' in printed
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '10', '20/10/2022 12:00', '20/10/2022 11:00',
+                                      '20/10/2022 23:59', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_shows_records_in_a_date_range(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass,
+                                           my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    rows = last_table_rows(mocked_print, -2)  # The menu is shown again before exiting
+    assert len(rows) == 1
+    assert '20/10/2022 at 14:54' in rows[0]
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input')
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_imports_and_exports_csv(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json,
+                                     tmp_path):
+    archive, exported = tmp_path / 'archive.csv', tmp_path / 'exported.csv'
+    archive.write_text('temperature,humidity,wind,condition,date\n'
+                       '10,50,5,1,08/12/2023 12:20\n'
+                       '99,50,5,1,08/12/2023 13:20\n')
+    mocked_input.side_effect = ['fake_username', '11', str(tmp_path / 'missing.csv'), str(archive), '',
+                                '12', str(exported), '', '0']
+    created = MagicMock(status_code=201)
+    created.json.return_value = {'id': 46, 'condition': '1', 'humidity': 50, 'temperature': 10, 'wind': 5,
+                                 'date': '2023-12-08T12:20:00+01:00'}
+    mocked_post.side_effect = [MagicMock(status_code=200), created, MagicMock(status_code=200)]
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    assert mocked_get.call_count == 1  # The imported record is merged without a reload
+    mocked_print.assert_any_call('1 records saved, 0 refused, 1 invalid rows skipped')
+    assert list(filter(lambda x: x.startswith('Line 3: '), [str(c.args[0]) for c in mocked_print.call_args_list]))
+    assert exported.read_text().splitlines() == ['id,temperature,humidity,wind,condition,date',
+                                                 '44,40,60,20,1,20/10/2022 11:54',
+                                                 '45,34,90,17,1,20/10/2022 14:54',
+                                                 '46,10,50,5,1,08/12/2023 12:20']
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '2', '1', '2', '1', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_app_remove_is_local_and_rolled_back_on_failure(mocked_delete, mocked_get, mocked_post, mocked_print,
+                                                        mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+    mocked_delete.side_effect = [MagicMock(status_code=405), MagicMock(status_code=204)]
+
+    App().run()
+    assert mocked_get.call_count == 1  # No reload after the removals
+    assert mocked_delete.call_args_list[0].kwargs['url'].endswith('/records/44/')
+    assert mocked_delete.call_args_list[1].kwargs['url'].endswith('/records/45/')  # 44 was put back at the end
+    rows = last_table_rows(mocked_print)
+    assert len(rows) == 1
+    assert '20/10/2022 at 11:54' in rows[0]
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '1', '40', '60', '13', '1', '08/12/2023 12:20', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_add_merges_the_created_record_without_reload(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                          mocked_getpass, my_json):
+    created = MagicMock(status_code=201)
+    created.json.return_value = {'id': 46, 'condition': '1', 'humidity': 60, 'temperature': 40, 'wind': 13,
+                                 'date': '2023-12-08T12:20:00+01:00'}
+    mocked_post.side_effect = [MagicMock(status_code=200), created, MagicMock(status_code=200)]
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    assert mocked_get.call_count == 1
+    rows = last_table_rows(mocked_print)
+    assert len(rows) == 3
+    assert '08/12/2023 at 12:20' in rows[2]
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '13', 'c', '1', 'y', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_app_removes_many_records_and_reports_failures(mocked_delete, mocked_get, mocked_post, mocked_print,
+                                                       mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json + [dict(my_json[0], id=46, condition='2')])
+    mocked_delete.side_effect = lambda url: MagicMock(status_code=405 if url.endswith('/45/') else 204)
+
+    App().run()
+    assert mocked_get.call_count == 1
+    assert mocked_delete.call_count == 2
+    mocked_print.assert_any_call('1 of 2 records removed!')
+    mocked_print.assert_any_call('Record 45 not removed (status 405)')
+    mocked_print.assert_any_call('Missing permissions to perform this action')
+    rows = last_table_rows(mocked_print)
+    assert len(rows) == 2
+    assert 'CLOUDY' in rows[1]
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '13', 'i', '1', '0', '2', 'n', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_app_remove_many_can_be_cancelled(mocked_delete, mocked_get, mocked_post, mocked_print, mocked_input,
+                                          mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    mocked_input.assert_any_call('Remove 2 records? (y/n): ')
+    mocked_delete.assert_not_called()
+    mocked_print.assert_any_call('Cancelled!')
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', 'n', 'n', 'p', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('shutil.get_terminal_size', return_value=os.terminal_size((130, 27)))
+def test_app_pages_through_the_records(mocked_size, mocked_get, mocked_post, mocked_print, mocked_input,
+                                       mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response([dict(my_json[0], id=i + 1, temperature=i % 50) for i in range(25)])
+
+    App().run()
+    assert [len(last_table_rows(mocked_print, table)) for table in range(4)] == [10, 10, 5, 10]
+    assert last_table_rows(mocked_print, 2)[0].startswith('21 ')
+    assert last_table_rows(mocked_print, 3)[0].startswith('11 ')
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('shutil.get_terminal_size', return_value=os.terminal_size((80, 24)))
+def test_app_fits_the_menu_and_a_page_in_24_lines(mocked_size, mocked_get, mocked_post, mocked_print, mocked_input,
+                                                  mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response([dict(my_json[0], id=i + 1, temperature=i % 50) for i in range(25)])
+
+    App().run()
+    screens = [str(c.args[0]) for c in mocked_print.call_args_list if c.args]
+    table = next(i for i, screen in enumerate(screens) if screen.startswith(CLEAR_SCREEN))
+    lines = screens[table].split('\n') + screens[table + 1:screens.index('Cya!')] + ['? ']
+    assert len(lines) <= 24
+    assert lines[1].startswith('#  ')  # The header of the table is still on the screen
+    assert len(last_table_rows(mocked_print)) >= 4
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '14', 'x', 't', '0', '2', '', '15', 'w', '1', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_shows_highest_and_lowest_readings(mocked_get, mocked_post, mocked_print, mocked_input,
+                                               mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response([dict(my_json[0], id=i + 1, temperature=t, wind=i)
+                                             for i, t in enumerate([5, -3, 20, 7])])
+
+    App().run()
+    highest, lowest = last_table_rows(mocked_print, -4), last_table_rows(mocked_print, -2)
+    assert [row.split()[2] for row in highest] == ['20', '7']
+    assert [row.split()[4] for row in lowest] == ['0']
+    assert [row.split()[2] for row in last_table_rows(mocked_print)] == ['5', '-3', '20', '7']  # List not sorted
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '16', 'wind >', 'sunny and humidity > 70', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_shows_filtered_records(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    assert 'Expected a number, found the end of the filter' in [str(c.args[0]) for c in mocked_print.call_args_list]
+    rows = last_table_rows(mocked_print, -2)
+    assert len(rows) == 1
+    assert rows[0].split()[3] == '90'
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '13', 'f', 'temperature < 40', 'y', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_app_removes_records_selected_by_filter(mocked_delete, mocked_get, mocked_post, mocked_print, mocked_input,
+                                                mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+    mocked_delete.return_value = MagicMock(status_code=204)
+
+    App().run()
+    mocked_delete.assert_called_once()
+    assert mocked_delete.call_args.kwargs['url'].endswith('/45/')
+    assert len(last_table_rows(mocked_print)) == 1
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '17', 'w', 'd', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_shows_rollups(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+
+    App().run()
+    screen = next(str(c.args[0]) for c in mocked_print.call_args_list if 'RECORDS BY DAY' in str(c.args[0]))
+    assert '20/10/2022             2' in screen
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '10', '20/10/2022 00:00', '20/10/2022 23:59', '', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_evicts_old_records_and_shows_them_from_the_archive(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                                mocked_getpass, my_json, tmp_path):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+    archive_path = tmp_path / 'tui_ssd' / 'records.archive'
+    archived = []
+    original_show = App._App__show_range
+
+    def show_range(app):  # Checks the archive before the logout removes it
+        archived.extend(RecordArchive('fake_username', archive_path.parent).rows())
+        original_show(app)
+
+    with patch.object(App, '_App__show_range', show_range):
+        App(retention=Retention(max_records=1)).run()
+    first_screen = last_table_rows(mocked_print, 0)
+    assert len(first_screen) == 1 and '20/10/2022 at 14:54' in first_screen[0]
+    assert [row[0] for row in archived] == [44]
+    assert [row.split()[-1] for row in last_table_rows(mocked_print, -2)] == ['11:54', '14:54']
+    assert not archive_path.exists()  # Removed on logout
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '1', '40', '60', '13', '1', '20/10/2022 18:00', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_keeps_records_saved_offline_and_sends_them_later(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                              mocked_getpass, my_json, cache_dir):
+    created = {'id': 46, 'condition': '1', 'humidity': 60, 'temperature': 40, 'wind': 13,
+               'date': '2022-10-20T18:00:00+02:00'}
+    mocked_post.side_effect = [MagicMock(status_code=200), requests.exceptions.ConnectionError(),
+                               json_response(created, status_code=201), MagicMock(status_code=200)]
+    mocked_get.return_value = json_response(my_json)
+    App().run()
+    mocked_print.assert_any_call('Server unreachable: 1 changes kept locally, they will be sent when it is back')
+    assert '18:00' in last_table_rows(mocked_print)[-1]  # Shown before the server has it
+    offline, replayed = mocked_post.call_args_list[1:3]
+    assert offline.kwargs['headers'] == replayed.kwargs['headers']  # Same idempotency key
+    mocked_print.assert_any_call('1 changes made while the server was unreachable have been sent')
+    assert not (cache_dir / 'records-fake_username.journal').exists()
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '2', '1', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_app_keeps_records_removed_offline_until_the_next_login(mocked_delete, mocked_get, mocked_post, mocked_print,
+                                                                mocked_input, mocked_getpass, my_json, cache_dir):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+    mocked_delete.side_effect = requests.exceptions.ConnectionError()
+    App().run()
+    mocked_print.assert_any_call('Server unreachable: 1 changes kept locally, they will be sent when it is back')
+    mocked_print.assert_any_call('1 changes not sent to the server yet, they will be sent at the next login')
+    assert (cache_dir / 'records-fake_username.journal').exists()
+
+    mocked_delete.side_effect = None
+    mocked_delete.return_value = MagicMock(status_code=204)
+    mocked_input.side_effect = ['fake_username', '0']
+    mocked_getpass.side_effect = ['fake_pass']
+    App().run()
+    mocked_delete.assert_called_with(url='http://localhost:8000/api/v1/records/44/')
+    mocked_print.assert_any_call('1 changes made while the server was unreachable have been sent')
+    assert not (cache_dir / 'records-fake_username.journal').exists()
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input')
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_refreshes_in_background_and_reports_new_records(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                             mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    server_rows = list(my_json)
+    mocked_get.side_effect = lambda *args, **kwargs: json_response(server_rows)
+    answers = iter(['fake_username', 'n', '0'])
+    app = App(poll_interval=PollInterval(initial=0.05, longest=0.05))
+
+    def answer(prompt):
+        value = next(answers)
+        if value == 'n':  # The user is idle while a record is added on the server
+            server_rows.append(dict(my_json[0], id=46, date='2022-10-20T18:00:00+02:00'))
+            app._App__reconcile.result(timeout=30)  # The poll started by the last redraw, private to App
+        return value
+
+    mocked_input.side_effect = answer
+    app.run()
+    mocked_print.assert_any_call('1 new records')
+    assert any('18:00' in row for row in last_table_rows(mocked_print))
+    assert [c.args[0] for c in mocked_print.call_args_list].count('1 new records') == 1  # Reported once
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '1', '40', '60', '13', '1', '20/10/2022 18:00', '2', '3', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_app_removing_a_record_saved_offline_cancels_its_creation(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                                  mocked_getpass, my_json, cache_dir):
+    mocked_post.side_effect = [MagicMock(status_code=200), requests.exceptions.ConnectionError(),
+                               MagicMock(status_code=200)]
+    mocked_get.return_value = json_response(my_json)
+    App().run()
+    mocked_print.assert_any_call('Record removed!')
+    assert mocked_post.call_count == 3  # Login, the create that failed and logout: nothing replayed
+    assert not any('18:00' in row for row in last_table_rows(mocked_print))
+    assert not (cache_dir / 'records-fake_username.journal').exists()
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_app_replay_keeps_server_errors_and_reports_refusals(mocked_delete, mocked_get, mocked_post, mocked_print,
+                                                             mocked_input, mocked_getpass, my_json, cache_dir):
+    row = {'condition': '1', 'humidity': 60, 'temperature': 40, 'date': '2022-10-20T18:00'}
+    failing, refused = JournalEntry.for_create(dict(row, wind=1)), JournalEntry.for_create(dict(row, wind=2))
+    failing_delete, refused_delete = JournalEntry.for_delete(44), JournalEntry.for_delete(45)
+    Journal('fake_username', cache_dir).append([failing, refused, failing_delete, refused_delete])
+
+    def post(url, data=None, **kwargs):
+        if data is None:  # Login and logout
+            return MagicMock(status_code=200)
+        return json_response({}, status_code=500 if data['wind'] == 1 else 405)
+
+    mocked_post.side_effect = post
+    mocked_get.return_value = json_response(my_json)
+    mocked_delete.side_effect = lambda url: MagicMock(status_code=500 if url.endswith('/44/') else 405)
+    App().run()
+    printed = [c.args[0] for c in mocked_print.call_args_list if c.args]
+    assert 'Record of 20/10/2022 at 18:00 not saved (status 405)' in printed
+    assert 'Record 45 not removed (status 405)' in printed
+    assert 'Missing permissions to perform this action' in printed
+    assert not [line for line in printed if 'have been sent' in str(line)]
+    assert '2 changes not sent to the server yet, they will be sent at the next login' in printed
+    assert Journal('fake_username', cache_dir).pending() == [failing, failing_delete]
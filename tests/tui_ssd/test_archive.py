@@ -0,0 +1,45 @@
+from tui_ssd.archive import RecordArchive
+from tui_ssd.domain import *
+
+
+def minutes(date: str) -> int:
+    return RecordDate.create(date).epoch_minutes
+
+
+ROWS = [(1, 10, 50, 5, 1, minutes('08/12/2023 12:00')), (2, -50, 0, 200, 4, minutes('09/12/2023 12:00')),
+        (0, 11, 51, 6, 2, minutes('08/12/2023 13:00'))]
+
+
+def test_archive_round_trip(tmp_path):
+    archive = RecordArchive('mr_bean', tmp_path)
+    assert list(archive.rows()) == []
+    archive.append(ROWS[:2])
+    archive.append(ROWS[2:])
+    assert list(RecordArchive('mr_bean', tmp_path).rows()) == ROWS
+    assert archive.between(minutes('08/12/2023 00:00'), minutes('08/12/2023 23:59')) == [ROWS[0], ROWS[2]]
+
+
+def test_archive_keeps_the_last_copy_of_a_record(tmp_path):
+    archive = RecordArchive('mr_bean', tmp_path)
+    archive.append(ROWS)
+    archive.append([(1, 20, 50, 5, 1, minutes('08/12/2023 12:00'))])
+    assert archive.between(minutes('08/12/2023 12:00'), minutes('08/12/2023 12:00')) == \
+        [(1, 20, 50, 5, 1, minutes('08/12/2023 12:00'))]
+
+
+def test_archive_of_another_user_is_started_again(tmp_path):
+    RecordArchive('mr_bean', tmp_path).append(ROWS)
+    archive = RecordArchive('teddy', tmp_path)
+    assert list(archive.rows()) == []
+    archive.append(ROWS[:1])
+    assert list(archive.rows()) == ROWS[:1]
+
+
+def test_incomplete_row_is_ignored(tmp_path):
+    archive = RecordArchive('mr_bean', tmp_path)
+    archive.append(ROWS)
+    with open(archive.path, 'ab') as file:
+        file.write(b'\x01\x02')
+    assert list(archive.rows()) == ROWS
+    archive.clear()
+    assert not archive.path.exists()
@@ -0,0 +1,111 @@
+import json
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from tui_ssd.async_app import AsyncApp
+import requests
+
+
+def json_response(data, status_code=200, headers=None) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status_code
+    res.headers.update(headers or {})
+    res._content = json.dumps(data).encode()
+    res._content_consumed = True
+    return res
+
+
+@pytest.fixture
+def my_json():
+    return [{'id': 44, 'condition': '1', 'humidity': 60, 'temperature': 40, 'wind': 20,
+             'date': '2022-10-20T11:54:00+02:00'},
+            {'id': 45, 'condition': '1', 'humidity': 90, 'temperature': 34, 'wind': 17,
+             'date': '2022-10-20T14:54:00+02:00'}]
+
+
+def created_response(record_id):
+    res = MagicMock(status_code=201)
+    res.json.return_value = {'id': record_id, 'condition': '2', 'humidity': 10, 'temperature': 5, 'wind': 3,
+                             'date': '2023-12-08T12:20:00+01:00'}
+    return res
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_async_app_login_load_and_logout(mocked_get, mocked_post, mocked_print, mocked_input, mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.return_value = json_response(my_json)
+
+    app = AsyncApp()
+    app.run()
+    assert mocked_get.call_count == 1
+    assert app.record_list.records == 2
+    mocked_print.assert_any_call('Hello user, please enter your credentials below.')
+    mocked_print.assert_any_call('Cya!')
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '3', '2d', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+def test_async_app_saves_run_concurrently_in_background(mocked_get, mocked_post, mocked_print, mocked_input,
+                                                        mocked_getpass):
+    lock, running, peak = threading.Lock(), [0], [0]
+    ids = iter(range(1, 49))
+
+    def post(url, **kwargs):
+        if not url.endswith('records/'):
+            return MagicMock(status_code=200)
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            record_id = next(ids)
+        threading.Event().wait(0.02)
+        with lock:
+            running[0] -= 1
+        return created_response(record_id)
+
+    mocked_post.side_effect = post
+    mocked_get.return_value = json_response([])
+
+    app = AsyncApp()
+    app.run()
+    assert mocked_post.call_count == 50  # Login, 48 add to db, Logout
+    assert mocked_get.call_count == 1  # The created records are merged without a reload
+    assert app.record_list.records == 48
+    assert 1 < peak[0] <= 10
+    assert list(filter(lambda x: 'operations in progress...' in str(x), mocked_print.mock_calls))  # Exit waited
+    mocked_print.assert_any_call('48 of 48 records saved!')
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '8', '2', '1', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+@patch('requests.Session.get')
+@patch('requests.Session.delete')
+def test_async_app_removes_record_without_reload(mocked_delete, mocked_get, mocked_post, mocked_print, mocked_input,
+                                                 mocked_getpass, my_json):
+    mocked_post.return_value = MagicMock(status_code=200)
+    mocked_get.side_effect = [json_response(my_json), json_response(None, status_code=304)]
+    mocked_delete.return_value = MagicMock(status_code=204)
+
+    app = AsyncApp()
+    app.run()
+    mocked_delete.assert_called_once_with(url='http://localhost:8000/api/v1/records/44/')
+    assert app.record_list.records == 1
+    assert app.record_list.record(0).id.value == 45
+
+
+@patch('getpass.getpass', side_effect=['fake_pass'])
+@patch('builtins.input', side_effect=['fake_username', '0'])
+@patch('builtins.print')
+@patch('requests.Session.post')
+def test_async_app_connection_error(mocked_post, mocked_print, mocked_input, mocked_getpass):
+    mocked_post.side_effect = requests.exceptions.ConnectionError()
+    AsyncApp().run()
+    mocked_print.assert_any_call('Error while connecting, shutting down...')
@@ -0,0 +1,127 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from valid8 import ValidationError
+
+from tui_ssd.api import CreateResult
+from tui_ssd.csv_io import ImportProgress, export_csv, import_csv, read_chunks
+from tui_ssd.domain import *
+
+
+CSV = '''temperature,humidity,wind,condition,date
+10,50,5,1,08/12/2023 12:20
+11,51,6,2,08/12/2023 13:20
+99,51,6,2,08/12/2023 14:20
+12,52,7,3,31/02/2023 15:20
+13,53,,4,08/12/2023 16:20
+14,54,9,1,08/12/2023 17:20
+'''
+
+
+def created(rows, idempotency_keys=None):
+    return [CreateResult(201, dict(row, id=i + 1)) for i, row in enumerate(rows)]
+
+
+def test_read_chunks_validates_rows_and_reports_lines():
+    chunks = list(read_chunks(io.StringIO(CSV), chunk_size=3))
+    assert [chunk.rows for chunk in chunks] == [3, 6]
+    assert [rec.temperature.value for chunk in chunks for rec in chunk.records] == [10, 11, 14]
+    assert [line for chunk in chunks for line, _ in chunk.errors] == [4, 5, 6]
+    assert chunks[0].records[1].record_date == RecordDate.create('08/12/2023 13:20')
+    assert chunks[0].records[0].id is None
+
+
+def test_read_chunks_skips_rows_already_imported():
+    chunks = list(read_chunks(io.StringIO(CSV), chunk_size=10, skip=5))
+    assert [rec.temperature.value for rec in chunks[0].records] == [14]
+    assert chunks[0].errors == []
+
+
+def test_read_chunks_requires_the_columns():
+    with pytest.raises(ValueError):
+        next(read_chunks(io.StringIO('temperature,humidity\n1,2\n')))
+    with pytest.raises(ValidationError):
+        next(read_chunks(io.StringIO(CSV), chunk_size=0))
+
+
+def test_import_uploads_batches_and_removes_progress(tmp_path):
+    path = tmp_path / 'archive.csv'
+    path.write_text(CSV)
+    api = MagicMock()
+    api.create_records.side_effect = created
+    batches = []
+    result = import_csv(api, path, chunk_size=2, on_batch=lambda results, rows: batches.append((len(results), rows)))
+    assert batches == [(2, 2), (0, 4), (1, 6)]
+    assert (result.saved, result.refused, len(result.errors), result.resumed_from) == (3, 0, 3, 0)
+    assert not ImportProgress(path).path.exists()
+
+
+def test_interrupted_import_resumes_from_last_batch(tmp_path):
+    path = tmp_path / 'archive.csv'
+    path.write_text(CSV)
+    api = MagicMock()
+    api.create_records.side_effect = [created([{}, {}]), requests.exceptions.ConnectionError()]
+    with pytest.raises(requests.exceptions.ConnectionError):
+        import_csv(api, path, chunk_size=2)
+    assert ImportProgress(path).load() == 2
+
+    api.create_records.side_effect = created
+    result = import_csv(api, path, chunk_size=2)
+    assert result.resumed_from == 2
+    assert result.saved == 1
+    assert [len(c.args[0]) for c in api.create_records.call_args_list[2:]] == [0, 1]
+
+
+def test_resumed_import_sends_the_same_keys_again(tmp_path):
+    path = tmp_path / 'archive.csv'
+    path.write_text('temperature,humidity,wind,condition,date\n' +
+                    ''.join(f'{i},50,5,1,08/12/2023 {i:02}:00\n' for i in range(10)))
+    server = {}  # Rows created by idempotency key, as a server honouring the keys
+    sent = []
+
+    def create_records(rows, idempotency_keys):
+        results = []
+        for row, key in zip(rows, idempotency_keys):
+            if len(sent) == 8:
+                raise requests.exceptions.ConnectionError()
+            sent.append(key)
+            server.setdefault(key, row)
+            results.append(CreateResult(201, dict(row, id=len(server))))
+        return results
+
+    api = MagicMock()
+    api.create_records.side_effect = create_records
+    with pytest.raises(requests.exceptions.ConnectionError):
+        import_csv(api, path, chunk_size=5)
+    assert ImportProgress(path).load() == 5
+    sent_before = list(sent)
+    sent.clear()
+    import_csv(api, path, chunk_size=5)
+    assert sent_before[5:] == sent[:3]  # The rows of the interrupted batch, sent again with the same keys
+    assert len(server) == 10
+
+
+def test_progress_of_a_changed_file_is_ignored(tmp_path):
+    path = tmp_path / 'archive.csv'
+    path.write_text(CSV)
+    ImportProgress(path).save(4)
+    path.write_text(CSV + '15,55,10,2,08/12/2023 18:20\n')
+    assert ImportProgress(path).load() == 0
+
+
+def test_export_writes_rows_that_can_be_imported_again():
+    record_list = RecordList()
+    record_list.add_records(list(next(read_chunks(io.StringIO(CSV))).records))
+    record_list.add_record(Record(Temperature(-5), Humidity(0), Wind(200), Condition.create('4'),
+                                  RecordDate.create('01/01/2024 00:00'), id=Id(7)))
+    file = io.StringIO()
+    assert export_csv(record_list, file) == 4
+    lines = file.getvalue().splitlines()
+    assert lines[0] == 'id,temperature,humidity,wind,condition,date'
+    assert lines[1] == ',10,50,5,1,08/12/2023 12:20'
+    assert lines[4] == '7,-5,0,200,4,01/01/2024 00:00'
+    again = next(read_chunks(io.StringIO(file.getvalue())))
+    assert again.errors == []
+    assert [rec.temperature.value for rec in again.records] == [10, 11, 14, -5]
@@ -1,6 +1,8 @@
 import pytest
+from unittest.mock import patch
 from valid8 import ValidationError
 from tui_ssd.domain import *
+from tui_ssd.filters import parse_filter
 
 
 # TESTS FOR TEMPERATURE
@@ -28,6 +30,22 @@ def test_correct_temperature_creation_value_and_str(temp):
     assert str(obj) == str(temp)
 
 
+@pytest.mark.parametrize('value_type, value', [
+    (Temperature, 21),
+    (Humidity, 0),
+    (Wind, 200),
+])
+def test_small_value_objects_are_interned(value_type, value):
+    assert value_type(value) is value_type(value)
+    assert value_type(value=value) is value_type(value)
+
+
+def test_invalid_values_are_not_interned():
+    for _ in range(2):
+        with pytest.raises(ValidationError):
+            Temperature(51)
+
+
 # TESTS FOR ID
 @pytest.mark.parametrize('id_val', [
     1,
@@ -107,6 +125,11 @@ def test_condition_cannot_be_created_directly_with_constructor():
         Condition('1')
 
 
+def test_condition_is_interned():
+    assert Condition.create('2') is Condition.create('2')
+    assert Condition.create('2') is not Condition.create('3')
+
+
 def test_dictionary_values_are_valid():
     obj = Condition.create('1')
     assert obj.values_dictionary[1] == "SUNNY"
@@ -156,9 +179,37 @@ def test_correct_date_parsing_from_database():
     assert obj.db_date == '2023-12-08T12:20'
 
 
-def test_wrong_date_parsing_raises_exception():
+@pytest.mark.parametrize('date', [
+    '01/01/2000 00:00',
+    '29/02/2000 10:00',
+    '31/12/2999 23:59',
+])
+def test_date_epoch_minutes_round_trip(date):
+    obj = RecordDate.create(date)
+    assert RecordDate.from_epoch_minutes(obj.epoch_minutes) == obj
+
+
+@pytest.mark.parametrize('date', [
+    '2023-12-08T12:20:00+01:00',
+    '2023-12-08T12:20:00-05:00',
+    '2023-12-08T12:20:00Z',
+    '2023-12-08T12:20:00.123456+00:00',
+    '2023-12-08T12:20:00',
+])
+def test_date_parsing_accepts_any_offset(date):
+    obj = RecordDate.parse(date)
+    assert obj.value == '08/12/2023 at 12:20'
+
+
+@pytest.mark.parametrize('date', [
+    'a',
+    '',
+    '08/12/2023 12:20',
+    '2023-13-08T12:20:00+01:00',
+])
+def test_wrong_date_parsing_raises_exception(date):
     with pytest.raises(ValueError):
-        RecordDate.parse('a')
+        RecordDate.parse(date)
 
 
 @pytest.mark.parametrize('date', [
@@ -267,11 +318,105 @@ def test_correct_sorting_of_a_records_by_date(my_record_list, dummy_records):
         assert my_record_list.record(i) == dummy_records[i]
 
 
+def test_sorted_list_stays_sorted_after_adding_records(my_record_list, dummy_records):
+    my_record_list.sort_by_temperature()
+    new_record = Record(Temperature(20), Humidity(1), Wind(1), Condition.create('2'), RecordDate.create('01/01/2001 10:00'))
+    my_record_list.add_record(new_record)
+    dummy_records.append(new_record)
+    dummy_records.sort(key=lambda x: x.temperature)
+    for i in range(my_record_list.records):
+        assert my_record_list.record(i) == dummy_records[i]
+
+
+def test_switching_sort_key_uses_each_ordering(my_record_list, dummy_records):
+    my_record_list.sort_by_wind()
+    my_record_list.sort_by_humidity()
+    my_record_list.sort_by_wind()
+    dummy_records.sort(key=lambda x: x.wind)
+    for i in range(my_record_list.records):
+        assert my_record_list.record(i) == dummy_records[i]
+
+
+def test_remove_records_by_id_keeps_active_sorting():
+    rl = RecordList()
+    for i, temp in enumerate([30, 10, 20, 0]):
+        rl.add_record(Record(Temperature(temp), Humidity(1), Wind(1), Condition.create('1'),
+                             RecordDate.create('01/01/2001 10:00'), id=Id(i + 1)))
+    rl.sort_by_temperature()
+    assert rl.remove_records([4, 2, 99]) == 2
+    assert rl.records == 2
+    assert [rl.record(i).temperature for i in range(rl.records)] == [Temperature(20), Temperature(30)]
+
+
+@pytest.mark.parametrize('batch_size', [1, 40])
+def test_add_records_keeps_sorting(my_record_list, dummy_records, batch_size):
+    my_record_list.sort_by_humidity()
+    batch = [Record(Temperature(i % 50), Humidity(i * 7 % 100), Wind(i), Condition.create('1'),
+                    RecordDate.create('01/01/2001 10:00')) for i in range(batch_size)]
+    my_record_list.add_records(batch)
+    dummy_records.extend(batch)
+    dummy_records.sort(key=lambda x: x.humidity)
+    assert [my_record_list.record(i) for i in range(my_record_list.records)] == dummy_records
+
+
+def test_columns_can_be_loaded_in_another_list(my_record_list, dummy_records):
+    rl = RecordList()
+    rl.load_columns(my_record_list.columns())
+    assert [rl.record(i) for i in range(rl.records)] == dummy_records
+    assert list(rl.rows()) == list(my_record_list.rows())
+
+
+def test_loaded_columns_are_validated(my_record_list):
+    columns = {name: array(column.typecode, column) for name, column in my_record_list.columns().items()}
+    columns['condition'][0] = 5
+    rl = RecordList()
+    with pytest.raises(ValidationError):
+        rl.load_columns(columns)
+    assert rl.records == 0
+
+
 def test_correct_list_dumping(my_record_list):
     my_record_list.dump_list()
     assert my_record_list.records == 0
 
 
+def test_record_list_keeps_ids(dummy_records):
+    rl = RecordList()
+    rl.add_record(Record(Temperature(1), Humidity(2), Wind(3), Condition.create('2'),
+                         RecordDate.create('01/01/2001 10:00'), id=Id(99999)))
+    rl.add_record(dummy_records[0])
+    assert rl.record(0).id == Id(99999)
+    assert rl.record(1).id is None
+
+
+@pytest.fixture
+def db_rows():
+    return [
+        {'id': 44, 'condition': '1', 'humidity': 60, 'temperature': 40, 'wind': 20, 'date': '2022-10-20T11:54:00+02:00'},
+        {'id': 45, 'condition': '3', 'humidity': 90, 'temperature': -34, 'wind': 17, 'date': '2022-10-20T14:54:00+02:00'},
+    ]
+
+
+def test_trusted_rows_give_the_same_records_as_parse(db_rows):
+    assert Record.from_trusted_rows(db_rows) == [Record.parse(row) for row in db_rows]
+    assert Record.from_trusted_rows([]) == []
+
+
+@pytest.mark.parametrize('field_name, value', [
+    ('id', 0),
+    ('temperature', 51),
+    ('humidity', -1),
+    ('wind', 201),
+    ('wind', '20'),
+    ('condition', '5'),
+    ('date', '1999-12-31T23:59:00+01:00'),
+])
+def test_trusted_rows_are_validated_as_a_batch(db_rows, field_name, value):
+    db_rows[1][field_name] = value
+    with pytest.raises(ValidationError):
+        Record.from_trusted_rows(db_rows)
+
+
 def test_correct_sorting_by_date_after_parsing():
     rec1 = Record(Temperature(17), Humidity(25), Wind(5), Condition.create('1'), RecordDate.parse('2023-03-01T00:00:00+01:00'))
     rec2 = Record(Temperature(21), Humidity(87), Wind(110), Condition.create('3'), RecordDate.parse('2023-01-01T00:00:00+01:00'))
@@ -329,3 +474,374 @@ def test_correct_password_creation_value_and_str(value):
 def test_wrong_password_raises_exception(value):
     with pytest.raises(ValidationError):
         Password(value)
+
+
+def test_statistics_by_condition_are_exact():
+    record_list = RecordList()
+    for temperature, condition in [(10, '1'), (20, '1'), (30, '1'), (40, '1'), (-5, '3')]:
+        record_list.add_record(Record(Temperature(temperature), Humidity(50), Wind(1), Condition.create(condition),
+                                      RecordDate.create('08/12/2023 12:20')))
+    stats = record_list.statistics('temperature', 'condition')
+    assert list(stats) == ['SUNNY', 'RAINY']
+    sunny = stats['SUNNY']
+    assert (sunny.count, sunny.minimum, sunny.maximum, sunny.mean) == (4, 10, 40, 25.0)
+    assert sunny.stddev == pytest.approx(11.1803, abs=1e-4)
+    assert sunny.percentiles == {50: 20, 90: 40, 95: 40, 99: 40}
+    assert stats['RAINY'].percentiles[50] == -5
+
+
+def test_statistics_by_day_and_hour():
+    record_list = RecordList()
+    for date, wind in [('08/12/2023 12:20', 10), ('08/12/2023 13:00', 30), ('09/12/2023 12:59', 50)]:
+        record_list.add_record(Record(Temperature(0), Humidity(0), Wind(wind), Condition.create('2'),
+                                      RecordDate.create(date)))
+    assert {day: stats.mean for day, stats in record_list.statistics('wind', 'day').items()} == \
+        {'08/12/2023': 20.0, '09/12/2023': 50.0}
+    assert {hour: stats.count for hour, stats in record_list.statistics('wind', 'hour').items()} == \
+        {'12:00': 2, '13:00': 1}
+
+
+def test_statistics_cache_is_updated_on_add_and_dropped_on_dump():
+    record_list = RecordList()
+    record = Record(Temperature(0), Humidity(10), Wind(1), Condition.create('2'), RecordDate.create('08/12/2023 12:20'))
+    record_list.add_record(record)
+    assert record_list.statistics('humidity', 'condition')['CLOUDY'].count == 1
+    record_list.add_record(Record(Temperature(0), Humidity(90), Wind(1), Condition.create('2'),
+                                  RecordDate.create('08/12/2023 12:20')))
+    record_list.add_records([record] * 3)
+    cloudy = record_list.statistics('humidity', 'condition')['CLOUDY']
+    assert (cloudy.count, cloudy.maximum) == (5, 90)
+    record_list.dump_list()
+    assert record_list.statistics('humidity', 'condition') == {}
+
+
+@pytest.mark.parametrize('measure, group_by, percentiles', [
+    ('condition', 'day', (50,)),
+    ('wind', 'week', (50,)),
+    ('wind', 'day', (0,)),
+])
+def test_statistics_wrong_query_raises_validation_error(measure, group_by, percentiles):
+    with pytest.raises(ValidationError):
+        RecordList().statistics(measure, group_by, percentiles)
+
+
+def hourly_list(dates):
+    record_list = RecordList()
+    for i, date in enumerate(dates):
+        record_list.add_record(Record(Temperature(i), Humidity(0), Wind(0), Condition.create('1'),
+                                      RecordDate.create(date), id=Id(i + 1)))
+    return record_list
+
+
+def test_between_returns_records_in_range_by_date():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00', '09/12/2023 12:00', '08/12/2023 13:00'])
+    view = record_list.between(RecordDate.create('08/12/2023 12:00'), RecordDate.create('08/12/2023 14:00'))
+    assert view.records == 3
+    assert [rec.id.value for rec in view] == [2, 4, 1]
+    assert view.record(2).record_date == RecordDate.create('08/12/2023 14:00')
+    assert record_list.between(RecordDate.create('01/01/2020 00:00'), RecordDate.create('01/01/2020 00:01')).records == 0
+
+
+def test_between_view_follows_the_list():
+    record_list = hourly_list(['08/12/2023 12:00', '08/12/2023 13:00'])
+    view = record_list.between(RecordDate.create('08/12/2023 12:30'), RecordDate.create('08/12/2023 23:59'))
+    assert [rec.id.value for rec in view] == [2]
+    record_list.add_record(Record(Temperature(0), Humidity(0), Wind(0), Condition.create('1'),
+                                  RecordDate.create('08/12/2023 12:45'), id=Id(9)))
+    assert [rec.id.value for rec in view] == [9, 2]
+    record_list.remove_records([2])
+    assert [rec.id.value for rec in view] == [9]
+    record_list.dump_list()
+    assert view.records == 0
+
+
+def test_between_does_not_change_the_order_of_the_list():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00'])
+    record_list.between(RecordDate.create('08/12/2023 12:00'), RecordDate.create('08/12/2023 14:00')).records
+    assert record_list.record(0).id.value == 1
+
+
+def test_between_end_before_start_raises_validation_error():
+    with pytest.raises(ValidationError):
+        RecordList().between(RecordDate.create('08/12/2023 14:00'), RecordDate.create('08/12/2023 12:00'))
+
+
+def test_get_and_remove_by_id():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00', '08/12/2023 13:00'])
+    assert record_list.get_by_id(2).record_date == RecordDate.create('08/12/2023 12:00')
+    assert record_list.get_by_id(99) is None
+    removed = record_list.remove_by_id(2)
+    assert removed.id.value == 2
+    assert record_list.remove_by_id(2) is None
+    assert record_list.get_by_id(2) is None
+    assert record_list.records == 2
+    assert [record_list.record(i).id.value for i in range(2)] == [1, 3]
+    assert record_list.get_by_id(3).id.value == 3  # Row renumbered by the compaction
+
+
+def test_remove_by_id_keeps_sorting_and_statistics():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00', '08/12/2023 13:00', '08/12/2023 11:00'])
+    record_list.sort_by_ascending_date()
+    assert record_list.statistics('temperature', 'day')['08/12/2023'].maximum == 3
+    record_list.remove_by_id(4)
+    record_list.remove_by_id(2)
+    assert record_list.statistics('temperature', 'day')['08/12/2023'].maximum == 2
+    assert [record_list.record(i).id.value for i in range(record_list.records)] == [3, 1]
+    assert [row[0] for row in record_list.rows()] == [1, 3]
+    record_list.add_record(Record(Temperature(9), Humidity(0), Wind(0), Condition.create('1'),
+                                  RecordDate.create('08/12/2023 12:30'), id=Id(2)))
+    assert [record_list.record(i).id.value for i in range(record_list.records)] == [2, 3, 1]
+    assert record_list.get_by_id(2).temperature.value == 9
+
+
+def test_add_records_after_remove_by_id_keeps_sorting():
+    record_list = hourly_list([f'08/12/2023 {hour:02}:00' for hour in range(20)] +
+                              [f'09/12/2023 {hour:02}:00' for hour in range(20)])
+    record_list.sort_by_ascending_date()
+    record_list.remove_by_id(5)
+    record_list.add_records([Record(Temperature(0), Humidity(0), Wind(0), Condition.create('1'),
+                                    RecordDate.create(f'07/12/2023 {hour:02}:00'), id=Id(100 + hour))
+                             for hour in range(2)])
+    assert record_list.records == 41
+    assert [record_list.record(i).id.value for i in range(3)] == [100, 101, 1]
+    assert record_list.record(40).id.value == 40
+
+
+@pytest.mark.parametrize('sort', [None, 'sort_by_ascending_date', 'sort_by_temperature'])
+def test_reads_skip_removed_rows_without_compacting(sort):
+    def reading(i):
+        return Record(Temperature(i % 7), Humidity(0), Wind(0), Condition.create('1'),
+                      RecordDate.create(f'{10 - i % 10:02}/12/2023 {i // 10:02}:{i % 3:02}'), id=Id(i + 1))
+
+    def shown(records):
+        return [records.row(i) for i in range(records.records)]
+
+    def compacted(removed, added=()):
+        records = RecordList()
+        records.add_records([reading(i) for i in list(range(130)) + list(added) if i + 1 not in removed])
+        if sort is not None:
+            getattr(records, sort)()
+        return shown(records)
+
+    expected = [compacted({1}), compacted({1, 65, 130}), compacted({1, 2, 65, 130}, [133])]
+    record_list = RecordList()
+    record_list.add_records([reading(i) for i in range(130)])  # With equal temperatures and dates
+    if sort is not None:
+        getattr(record_list, sort)()
+    with patch.object(RecordList, '_RecordList__compact') as compact:
+        record_list.remove_by_id(1)
+        assert shown(record_list) == expected[0]
+        record_list.remove_by_id(65)
+        record_list.remove_by_id(130)
+        assert shown(record_list) == expected[1]
+        record_list.add_record(reading(133))  # Shown before some of the removed rows
+        record_list.remove_by_id(2)
+        assert shown(record_list) == expected[2]
+        compact.assert_not_called()  # 4 tombstones out of 131 rows
+
+
+def test_remove_by_id_compacts_when_the_tombstones_are_many():
+    record_list = hourly_list([f'08/12/2023 {hour:02}:00' for hour in range(20)] +
+                              [f'09/12/2023 {hour:02}:00' for hour in range(20)])
+    record_list.sort_by_temperature()
+    for record_id in (40, 3):
+        record_list.remove_by_id(record_id)
+    assert [record_list.record(i).id.value for i in range(3)] == [1, 2, 4]
+    assert record_list.get_by_id(4).id.value == 4  # Row renumbered by the compaction
+    assert record_list.record(37).id.value == 39
+
+
+def test_slice_and_where_select_in_the_current_order():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00', '08/12/2023 13:00'])
+    assert record_list.slice(1, 3).ids() == [2, 3]
+    assert record_list.slice(2, 10).ids() == [3]
+    assert record_list.where(lambda rec: rec.temperature.value > 0).ids() == [2, 3]
+    record_list.sort_by_ascending_date()
+    view = record_list.slice(0, 2)
+    assert view.ids() == [2, 3]
+    assert record_list.where(lambda rec: rec.temperature.value > 0).ids() == [2, 3]
+    record_list.sort_by_temperature()
+    assert view.ids() == [1, 2]
+
+
+def test_slice_wrong_range_raises_validation_error():
+    with pytest.raises(ValidationError):
+        RecordList().slice(3, 2)
+
+
+def readings_list(winds):
+    record_list = RecordList()
+    for i, wind in enumerate(winds):
+        record_list.add_record(Record(Temperature(0), Humidity(0), Wind(wind), Condition.create('1'),
+                                      RecordDate.create(f'08/12/2023 {i:02}:00'), id=Id(i + 1)))
+    return record_list
+
+
+@pytest.mark.parametrize('sort_first', [False, True])
+def test_top_k_and_bottom_k(sort_first):
+    record_list = readings_list([30, 10, 50, 30, 10, 40, 30])
+    if sort_first:  # The cached permutation is used instead of a heap
+        record_list.sort_by_wind()
+    assert record_list.top_k('wind', 3).ids() == [3, 6, 1]
+    assert record_list.top_k('wind', 4).ids() == [3, 6, 1, 4]
+    assert record_list.bottom_k('wind', 3).ids() == [2, 5, 1]
+    assert record_list.top_k('wind', 10).ids() == [3, 6, 1, 4, 7, 2, 5]
+    assert record_list.bottom_k('date', 2).ids() == [1, 2]
+    assert record_list.top_k('wind', 0).records == 0
+
+
+def test_top_k_does_not_change_the_order_of_the_list():
+    record_list = readings_list([30, 10, 50])
+    record_list.sort_by_ascending_date()
+    assert record_list.top_k('wind', 1).ids() == [3]
+    assert [record_list.record(i).id.value for i in range(3)] == [1, 2, 3]
+
+
+def test_top_k_view_follows_the_list():
+    record_list = readings_list([30, 10, 50])
+    view = record_list.top_k('wind', 2)
+    assert view.ids() == [3, 1]
+    record_list.remove_by_id(3)
+    assert view.ids() == [1, 2]
+
+
+@pytest.mark.parametrize('key, k', [('condition', 1), ('id', 1), ('wind', -1)])
+def test_top_k_wrong_query_raises_validation_error(key, k):
+    with pytest.raises(ValidationError):
+        RecordList().top_k(key, k)
+
+
+def filter_list():
+    record_list = RecordList()
+    for i, (temperature, wind, condition) in enumerate([(10, 90, '3'), (20, 10, '3'), (5, 85, '1'), (30, 95, '3'),
+                                                        (15, 81, '3')]):
+        record_list.add_record(Record(Temperature(temperature), Humidity(0), Wind(wind), Condition.create(condition),
+                                      RecordDate.create(f'0{i + 1}/12/2023 12:00'), id=Id(i + 1)))
+    return record_list
+
+
+@pytest.mark.parametrize('indexed', [None, 'sort_by_wind', 'sort_by_temperature'])
+def test_filter_selects_in_the_current_order(indexed):
+    record_list = filter_list()
+    if indexed is not None:  # The cached permutation is used as index, the view follows the order of the list
+        getattr(record_list, indexed)()
+    expected = {None: [1, 4, 5], 'sort_by_wind': [5, 1, 4], 'sort_by_temperature': [1, 5, 4]}[indexed]
+    assert record_list.filter(parse_filter('rainy and wind > 80 and date >= 01/12/2023')).ids() == expected
+    assert record_list.filter(parse_filter('sunny or temperature = 20')).records == 2
+    assert record_list.filter(parse_filter('not rainy')).ids() == [3]
+
+
+def test_filter_view_follows_the_list():
+    record_list = filter_list()
+    view = record_list.filter(parse_filter('rainy and wind > 80'))
+    assert view.ids() == [1, 4, 5]
+    record_list.remove_by_id(4)
+    record_list.add_record(Record(Temperature(0), Humidity(0), Wind(100), Condition.create('3'),
+                                  RecordDate.create('09/12/2023 12:00'), id=Id(9)))
+    assert view.ids() == [1, 5, 9]
+    record_list.sort_by_wind()
+    assert view.ids() == [5, 1, 9]
+    assert view.record(0).temperature.value == 15
+
+
+def rollup_list():
+    record_list = RecordList()
+    for temperature, wind, condition, date in [(10, 5, '3', '30/11/2023 23:10'), (20, 15, '3', '01/12/2023 00:10'),
+                                               (0, 40, '1', '01/12/2023 00:50'), (30, 20, '1', '01/12/2023 13:00'),
+                                               (-5, 0, '3', '31/12/2023 23:59')]:
+        record_list.add_record(Record(Temperature(temperature), Humidity(50), Wind(wind), Condition.create(condition),
+                                      RecordDate.create(date), id=Id(record_list.records + 1)))
+    return record_list
+
+
+def test_rollups_by_hour_day_and_month():
+    record_list = rollup_list()
+    assert [(rollup.start.value, rollup.count) for rollup in record_list.rollups('hour')] == \
+        [('30/11/2023 at 23:00', 1), ('01/12/2023 at 00:00', 2), ('01/12/2023 at 13:00', 1), ('31/12/2023 at 23:00', 1)]
+    assert [rollup.count for rollup in record_list.rollups('day')] == [1, 3, 1]
+    november, december = record_list.rollups('month')
+    assert november.start == RecordDate.create('01/11/2023 00:00')
+    assert december.count == 4
+    assert december.temperature == Summary(-5, 30, 11.25)
+    assert december.wind == Summary(0, 40, 18.75)
+    assert december.humidity == Summary(50, 50, 50.0)
+    assert december.condition == Condition.create('1')  # Two RAINY and two SUNNY: the lowest value wins
+
+
+def test_rollups_are_updated_on_add_and_remove():
+    record_list = rollup_list()
+    record_list.rollups('month')
+    record_list.add_record(Record(Temperature(40), Humidity(50), Wind(0), Condition.create('3'),
+                                  RecordDate.create('15/12/2023 12:00'), id=Id(9)))
+    assert record_list.rollups('month')[1].temperature == Summary(-5, 40, 17.0)
+    assert record_list.rollups('month')[1].condition == Condition.create('3')
+    record_list.remove_by_id(9)
+    record_list.remove_by_id(5)
+    assert record_list.rollups('month')[1].temperature == Summary(0, 30, 50 / 3)  # Minimum and maximum scanned again
+    record_list.remove_records([1])
+    assert [rollup.start.month for rollup in record_list.rollups('month')] == [12]
+    record_list.dump_list()
+    assert record_list.rollups('day') == []
+
+
+def test_rollups_wrong_period_raises_validation_error():
+    with pytest.raises(ValidationError):
+        RecordList().rollups('week')
+
+
+def test_evict_oldest_readings_by_count_and_age():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00', '09/12/2023 12:00', '08/12/2023 13:00'])
+    assert record_list.evict(Retention()) == []
+    evicted = record_list.evict(Retention(max_records=3))
+    assert [row[0] for row in evicted] == [2]
+    assert record_list.records == 3
+    evicted = record_list.evict(Retention(max_age=timedelta(hours=21)))
+    assert [row[0] for row in evicted] == [4, 1]
+    assert [row[0] for row in record_list.rows()] == [3]
+    assert record_list.get_by_id(1) is None
+
+
+def test_evict_to_memory_budget():
+    record_list = hourly_list([f'08/12/2023 {hour:02}:00' for hour in range(10)])
+    assert record_list.evict(Retention(max_records=10)) == []  # Builds the index by date, kept by the list
+    budget = record_list.bytes_per_record * 4 + 1
+    assert len(record_list.evict(Retention(max_bytes=budget))) == 6
+    assert record_list.memory_usage <= budget
+    assert record_list.evict(Retention(max_bytes=budget)) == []
+
+
+def test_evicted_rows_can_be_loaded_again():
+    record_list = hourly_list(['08/12/2023 14:00', '08/12/2023 12:00'])
+    evicted = record_list.evict(Retention(max_records=1))
+    restored = RecordList()
+    restored.load_rows(evicted)
+    assert restored.get_by_id(2).record_date == RecordDate.create('08/12/2023 12:00')
+    restored.load_rows([])
+    assert restored.records == 0
+
+
+def test_retention_from_environ(monkeypatch):
+    assert not Retention.from_environ().is_bounded
+    monkeypatch.setenv('TUI_SSD_MAX_RECORDS', '1000')
+    monkeypatch.setenv('TUI_SSD_MAX_AGE', '30d')
+    monkeypatch.setenv('TUI_SSD_MAX_BYTES', '65536')
+    assert Retention.from_environ() == Retention(1000, timedelta(days=30), 65536)
+    monkeypatch.setenv('TUI_SSD_MAX_AGE', '36h')
+    assert Retention.from_environ().max_age == timedelta(hours=36)
+
+
+@pytest.mark.parametrize('name, value', [
+    ('MAX_AGE', 'abc'), ('MAX_AGE', '7w'), ('MAX_AGE', '0d'), ('MAX_RECORDS', '0'), ('MAX_BYTES', '1.5'),
+])
+def test_retention_from_environ_reports_the_wrong_variable(monkeypatch, name, value):
+    monkeypatch.setenv(f'TUI_SSD_{name}', value)
+    with pytest.raises(ValueError, match=f'TUI_SSD_{name}'):
+        Retention.from_environ()
+
+
+@pytest.mark.parametrize('max_records, max_age, max_bytes', [
+    (0, None, None), (None, timedelta(0), None), (None, None, 0), ('1', None, None),
+])
+def test_wrong_retention_raises_error(max_records, max_age, max_bytes):
+    with pytest.raises((TypeError, ValidationError)):
+        Retention(max_records, max_age, max_bytes)
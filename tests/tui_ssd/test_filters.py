@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+from tui_ssd.domain import *
+from tui_ssd.filters import And, Not, OneOf, Or, Range, parse_filter
+
+
+def minutes(date: str) -> int:
+    return RecordDate.create(date).epoch_minutes
+
+
+def test_parse_comparisons():
+    assert parse_filter('wind > 80') == Range('wind', 81, None)
+    assert parse_filter('Temperature <= -5') == Range('temperature', None, -5)
+    assert parse_filter('humidity between 10 and 20') == Range('humidity', 10, 20)
+    assert parse_filter('wind != 3') == Not(Range('wind', 3, 3))
+    assert parse_filter('RAINY') == Range('condition', 3, 3)
+    assert parse_filter('condition in (flurry, 1, rainy)') == OneOf('condition', (1, 3, 4))
+
+
+def test_parse_dates():
+    assert parse_filter('date >= 08/12/2023') == Range('date', minutes('08/12/2023 00:00'), None)
+    assert parse_filter('date between 08/12/2023 and 09/12/2023 12:30') == \
+        Range('date', minutes('08/12/2023 00:00'), minutes('09/12/2023 12:30'))
+    assert parse_filter('date within 7d', now=datetime(2023, 12, 8, 12, 0)) == \
+        Range('date', minutes('01/12/2023 12:00'), None)
+    assert parse_filter('date within 2h', now=datetime(2023, 12, 8, 12, 0)) == \
+        Range('date', minutes('08/12/2023 10:00'), None)
+
+
+def test_and_binds_tighter_than_or():
+    assert parse_filter('sunny or rainy and not wind > 5') == \
+        Or((Range('condition', 1, 1), And((Range('condition', 3, 3), Not(Range('wind', 6, None))))))
+    assert parse_filter('(sunny or rainy) and wind > 5') == \
+        And((Or((Range('condition', 1, 1), Range('condition', 3, 3))), Range('wind', 6, None)))
+
+
+def test_only_conjunctions_expose_ranges():
+    assert parse_filter('rainy and wind > 80').ranges() == [('condition', 3, 3), ('wind', 81, None)]
+    assert parse_filter('rainy or wind > 80').ranges() == []
+    assert parse_filter('not wind > 80').ranges() == []
+
+
+
+def test_predicates_read_the_columns():
+    columns = {'condition': [1, 3, 3], 'wind': [90, 90, 10]}
+    rows = range(3)
+    assert [row for row in rows if parse_filter('rainy and wind > 80').predicate(columns)(row)] == [1]
+    assert [row for row in rows if parse_filter('sunny or not wind > 80').predicate(columns)(row)] == [0, 2]
+    assert [row for row in rows if parse_filter('condition in (rainy, flurry)').predicate(columns)(row)] == [1, 2]
+
+
+def test_row_filter_is_abstract():
+    with pytest.raises(TypeError):
+        RowFilter()
+
+@pytest.mark.parametrize('text', [
+    '', 'wind', 'wind >', 'wind > x', 'wind ~ 3', 'pressure > 3', 'condition = hail', 'condition = 5',
+    '(rainy', 'rainy wind', 'date > 32/12/2023', 'date within 7', 'temperature between 1 2',
+])
+def test_wrong_filter_raises_value_error(text):
+    with pytest.raises(ValueError):
+        parse_filter(text)
@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+from tui_ssd.journal import Journal, JournalEntry
+
+
+def test_entries_are_pending_until_complete(tmp_path):
+    journal = Journal('mr_bean', tmp_path)
+    assert journal.pending() == []
+    create, delete = JournalEntry.for_create({'wind': 5}), JournalEntry.for_delete(3)
+    journal.append([create, delete])
+    assert Journal('mr_bean', tmp_path).pending() == [create, delete]
+    journal.complete([create.key])
+    assert Journal('mr_bean', tmp_path).pending() == [delete]
+
+
+def test_file_is_removed_when_nothing_is_pending(tmp_path):
+    journal = Journal('mr_bean', tmp_path)
+    entry = JournalEntry.for_delete(3)
+    journal.append([entry])
+    assert journal.path.exists()
+    journal.complete([entry.key])
+    assert not journal.path.exists()
+    journal.complete([entry.key])  # Completing again does nothing
+
+
+def test_many_entries_are_written_with_a_single_fsync(tmp_path):
+    journal = Journal('mr_bean', tmp_path)
+    with patch('os.fsync') as mocked_fsync:
+        journal.append([JournalEntry.for_delete(i) for i in range(1, 100)])
+    assert mocked_fsync.call_count == 1
+
+
+def test_incomplete_line_is_ignored(tmp_path):
+    journal = Journal('mr_bean', tmp_path)
+    entry = JournalEntry.for_create({'wind': 5})
+    journal.append([entry])
+    with open(journal.path, 'a', encoding='utf-8') as file:
+        file.write('{"key": "interrupted", "opera')
+    assert Journal('mr_bean', tmp_path).pending() == [entry]
+
+
+def test_every_user_has_a_journal(tmp_path):
+    Journal('mr_bean', tmp_path).append([JournalEntry.for_delete(3)])
+    assert Journal('teddy', tmp_path).pending() == []
@@ -1,3 +1,5 @@
+import asyncio
+import os
 from unittest.mock import patch, call, Mock
 
 import pytest
@@ -113,3 +115,58 @@ def test_menu_selection_on_wrong_key(mocked_print, mocked_input):
     menu.run()
     mocked_print.assert_any_call('Invalid selection. Please, try again...')
     mocked_input.assert_called()
+
+
+@patch('builtins.input', side_effect=['1', '0'])
+@patch('builtins.print')
+def test_menu_run_async_awaits_on_selected(mocked_print, mocked_input):
+    async def on_selected():
+        await asyncio.sleep(0)
+        print('awaited')
+
+    menu = Menu.Builder(Description('a description'), status=lambda: '1 operations in progress...')\
+        .with_entry(Entry.create('1', 'first entry', on_selected=on_selected))\
+        .with_entry(Entry.create('0', 'exit', is_exit=True))\
+        .build()
+    asyncio.run(menu.run_async())
+    mocked_print.assert_any_call('awaited')
+    mocked_print.assert_any_call('1 operations in progress...')
+
+
+@patch('builtins.input', side_effect=['h', '0'])
+@patch('builtins.print')
+def test_menu_hidden_entry_is_selectable_but_not_listed(mocked_print, mocked_input):
+    from tui_ssd.metrics import Metrics
+    metrics = Metrics()
+    menu = Menu.Builder(Description('a description'), metrics=metrics)\
+        .with_entry(Entry.create('h', 'hidden entry', on_selected=lambda: print('hidden selected'), is_hidden=True))\
+        .with_entry(Entry.create('0', 'exit', is_exit=True))\
+        .build()
+    menu.run()
+    mocked_print.assert_any_call('hidden selected')
+    assert not [c for c in mocked_print.mock_calls if c.args and 'hidden entry' in str(c.args[0])]
+    assert metrics.histogram('menu_action_seconds', action='hidden entry').count == 1
+
+
+def test_menu_height_counts_the_lines_of_entries():
+    menu = Menu.Builder(Description('a description'))\
+        .with_entry(Entry.create('1', 'first entry'))\
+        .with_entry(Entry.create('h', 'hidden entry', is_hidden=True))\
+        .with_entry(Entry.create('0', 'exit', is_exit=True))\
+        .build()
+    with patch('shutil.get_terminal_size', return_value=os.terminal_size((20, 24))):
+        assert menu.height == 3 + 1 + 2 + 1  # Title, status, entries and prompt
+    with patch('shutil.get_terminal_size', return_value=os.terminal_size((80, 24))):
+        assert menu.height == 3 + 1 + 1 + 1
+
+
+@patch('builtins.print')
+@patch('builtins.input', return_value='0')
+@patch('shutil.get_terminal_size', return_value=os.terminal_size((40, 24)))
+def test_menu_lists_the_entries_in_columns(mocked_size, mocked_input, mocked_print):
+    menu = Menu.Builder(Description('a description'))
+    for key in range(1, 6):
+        menu.with_entry(Entry.create(str(key), f'entry {key}'))
+    menu.with_entry(Entry.create('0', 'exit', is_exit=True)).build().run()
+    assert mocked_print.mock_calls[3:] == [call('1: entry 1  3: entry 3  5: entry 5'),
+                                           call('2: entry 2  4: entry 4  0: exit')]
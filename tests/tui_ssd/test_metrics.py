@@ -0,0 +1,83 @@
+import pytest
+from valid8 import ValidationError
+
+from tui_ssd.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram()
+    for value in [0.0005] * 90 + [0.3] * 9 + [42.0]:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert histogram.cumulative()[0] == 90
+    assert histogram.cumulative()[-1] == 100
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.95) == 0.5
+    assert histogram.quantile(1) == 42.0
+    assert histogram.max == 42.0
+
+
+def test_histogram_quantile_must_be_in_range():
+    with pytest.raises(ValidationError):
+        Histogram().quantile(1.5)
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    with metrics.timer('action_seconds', action='x'):
+        pass
+    metrics.increment('calls_total')
+    assert metrics.histogram('action_seconds', action='x') is None
+    assert metrics.counter('calls_total') == 0
+    assert metrics.timer('a') is metrics.timer('b')  # No allocation when disabled
+
+
+def test_timer_and_counters_are_kept_per_labels():
+    metrics = Metrics()
+    for _ in range(3):
+        with metrics.timer('load_phase_seconds', phase='decode'):
+            pass
+    metrics.increment('http_responses_total', status='200')
+    metrics.increment('http_responses_total', 2, status='404')
+    assert metrics.histogram('load_phase_seconds', phase='decode').count == 3
+    assert metrics.histogram('load_phase_seconds', phase='insert') is None
+    assert metrics.counter('http_responses_total', status='404') == 2
+    assert 'load_phase_seconds{phase="decode"}' in metrics.to_text()
+
+
+def test_prometheus_text_format():
+    metrics = Metrics()
+    metrics.observe('http_request_seconds', 0.02, method='GET')
+    metrics.observe('http_request_seconds', 7.0, method='GET')
+    metrics.increment('http_responses_total', method='GET', status='200')
+    lines = metrics.to_prometheus().splitlines()
+    assert lines[0] == '# TYPE tui_ssd_http_request_seconds histogram'
+    assert 'tui_ssd_http_request_seconds_bucket{method="GET",le="0.01"} 0' in lines
+    assert 'tui_ssd_http_request_seconds_bucket{method="GET",le="0.025"} 1' in lines
+    assert 'tui_ssd_http_request_seconds_bucket{method="GET",le="+Inf"} 2' in lines
+    assert 'tui_ssd_http_request_seconds_count{method="GET"} 2' in lines
+    assert '# TYPE tui_ssd_http_responses_total counter' in lines
+    assert 'tui_ssd_http_responses_total{method="GET",status="200"} 1' in lines
+
+
+
+def test_gauges_keep_the_last_value():
+    metrics = Metrics()
+    metrics.set_gauge('http_connections', 3)
+    metrics.set_gauge('http_connections', 2)
+    assert metrics.gauge('http_connections') == 2
+    assert '# TYPE tui_ssd_http_connections gauge' in metrics.to_prometheus().splitlines()
+    assert 'tui_ssd_http_connections 2' in metrics.to_prometheus().splitlines()
+    disabled = Metrics(enabled=False)
+    disabled.set_gauge('http_connections', 3)
+    assert disabled.gauge('http_connections') is None
+
+def test_metrics_from_environ(tmp_path, monkeypatch):
+    monkeypatch.delenv('TUI_SSD_METRICS', raising=False)
+    assert not Metrics.from_environ().enabled
+    monkeypatch.setenv('TUI_SSD_METRICS', str(tmp_path / 'out' / 'metrics.prom'))
+    monkeypatch.setenv('TUI_SSD_METRICS_FORMAT', 'prometheus')
+    metrics = Metrics.from_environ()
+    metrics.increment('calls_total')
+    metrics.dump()
+    assert (tmp_path / 'out' / 'metrics.prom').read_text() == '# TYPE tui_ssd_calls_total counter\ntui_ssd_calls_total 1\n'
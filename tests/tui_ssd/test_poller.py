@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from valid8 import ValidationError
+
+from tui_ssd.poller import PollInterval, Poller
+from tui_ssd.sync import Delta
+
+
+def test_interval_backs_off_while_nothing_changes():
+    interval = PollInterval(initial=10, longest=60, factor=2)
+    assert interval.after(10, changed=False) == 20
+    assert interval.after(40, changed=False) == 60
+    assert interval.after(60, changed=True) == 10
+
+
+def test_interval_is_validated():
+    with pytest.raises(ValidationError):
+        PollInterval(initial=60, longest=10)
+    with pytest.raises(ValidationError):
+        PollInterval(factor=0.5)
+    assert not PollInterval(initial=0).is_enabled
+
+
+def test_interval_from_environ(monkeypatch):
+    monkeypatch.setenv('TUI_SSD_POLL_INTERVAL', '5')
+    monkeypatch.setenv('TUI_SSD_POLL_MAX_INTERVAL', '120')
+    assert PollInterval.from_environ() == PollInterval(5, 120)
+    monkeypatch.setenv('TUI_SSD_POLL_INTERVAL', '0')
+    assert not PollInterval.from_environ().is_enabled
+    monkeypatch.delenv('TUI_SSD_POLL_INTERVAL')
+    monkeypatch.delenv('TUI_SSD_POLL_MAX_INTERVAL')
+    assert PollInterval.from_environ() == PollInterval()
+    monkeypatch.setenv('TUI_SSD_POLL_MAX_INTERVAL', 'often')
+    with pytest.raises(ValueError, match='TUI_SSD_POLL_MAX_INTERVAL'):
+        PollInterval.from_environ()
+
+
+def test_poller_returns_at_the_first_change_and_backs_off_before():
+    results = [[Delta()], [Delta()], [Delta(removed=[44])]]
+    poller = Poller(PollInterval(initial=0.01, longest=1, factor=2))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        deltas = poller.start(executor, lambda: results.pop(0)).result(timeout=5)
+    assert deltas == [Delta(removed=[44])]
+    assert results == []
+    assert poller.current == 0.01  # Back to the initial interval after a change
+
+
+def test_poller_stops_without_waiting_for_the_interval():
+    fetched = []
+    poller = Poller(PollInterval(initial=60, longest=60))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = poller.start(executor, lambda: fetched.append(1) or [])
+        poller.stop()
+        assert future.result(timeout=5) == []
+    assert fetched == []
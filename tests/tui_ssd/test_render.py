@@ -0,0 +1,84 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from valid8 import ValidationError
+
+from tui_ssd.domain import *
+from tui_ssd.render import CLEAR_SCREEN, RecordTable, print_records, print_rollups
+
+
+@pytest.fixture
+def record_list():
+    res = RecordList()
+    for hour in range(25):
+        res.add_record(Record(Temperature(hour), Humidity(50), Wind(10), Condition.create('3'),
+                              RecordDate.create(f'08/12/2023 {hour % 24:02}:30'), id=Id(hour + 1)))
+    return res
+
+
+@patch('builtins.print')
+def test_print_records_writes_the_screen_at_once(mocked_print, record_list):
+    with patch('os.system') as mocked_system:
+        print_records(record_list)
+    mocked_system.assert_not_called()
+    assert mocked_print.call_count == 1
+    screen = mocked_print.call_args.args[0]
+    assert screen.startswith(CLEAR_SCREEN)
+    lines = screen[len(CLEAR_SCREEN):].split('\n')
+    assert len(lines) == 25 + 4
+    rec = record_list.record(1)
+    assert lines[4] == '%-10s %-30s %-20s %-20s %-20s %-30s' % (2, rec.condition.value, rec.temperature.value,
+                                                                rec.humidity.value, rec.wind.value,
+                                                                rec.record_date.value)
+
+
+@patch('builtins.print')
+def test_table_shows_one_page_at_a_time(mocked_print, record_list):
+    table = RecordTable(page_size=10)
+    assert table.pages(record_list) == 3
+    table.render(record_list)
+    assert '\n1          RAINY' in mocked_print.call_args.args[0]
+    assert '\n11 ' not in mocked_print.call_args.args[0]
+    table.next_page()
+    table.next_page()
+    table.next_page()  # Past the end: the last page is shown
+    table.render(record_list)
+    screen = mocked_print.call_args.args[0]
+    assert screen.endswith('Page 3 of 3 (records 21-25 of 25)')
+    assert '\n21 ' in screen and '\n25 ' in screen
+    table.previous_page()
+    table.render(record_list)
+    assert 'Page 2 of 3 (records 11-20 of 25)' in mocked_print.call_args.args[0]
+
+
+@patch('builtins.print')
+def test_table_page_follows_a_shrinking_list(mocked_print, record_list):
+    table = RecordTable(page_size=10)
+    table.next_page()
+    record_list.remove_records(range(6, 26))
+    table.render(record_list)
+    assert table.page == 0
+    assert 'Page' not in mocked_print.call_args.args[0]
+
+
+def test_page_size_follows_the_terminal_height():
+    with patch('shutil.get_terminal_size', return_value=os.terminal_size((130, 60))):
+        assert RecordTable(reserved_lines=20).page_size == 35  # And the 5 lines of the table around the rows
+    with patch('shutil.get_terminal_size', return_value=os.terminal_size((130, 20))):
+        assert RecordTable(reserved_lines=20).page_size == 1
+        assert RecordTable(reserved_lines=lambda: 10).page_size == 5
+
+
+def test_wrong_page_size_raises_validation_error():
+    with pytest.raises(ValidationError):
+        RecordTable(page_size=0)
+
+
+@patch('builtins.print')
+def test_print_rollups_writes_one_line_per_bucket(mocked_print, record_list):
+    print_rollups('day', record_list.rollups('day'))
+    assert mocked_print.call_count == 1
+    lines = mocked_print.call_args.args[0].split('\n')
+    assert len(lines) == 4 + 1 + 1
+    assert lines[4].split() == ['08/12/2023', '25', '0/24/12.0', '50/50/50.0', '10/10/10.0', 'RAINY']
@@ -0,0 +1,62 @@
+import pytest
+
+from tui_ssd.domain import *
+from tui_ssd.snapshot import Snapshot
+
+
+@pytest.fixture
+def record_list() -> RecordList:
+    rl = RecordList()
+    rl.add_record(Record(Temperature(17), Humidity(25), Wind(5), Condition.create('1'),
+                         RecordDate.create('29/02/2000 10:00'), id=Id(44)))
+    rl.add_record(Record(Temperature(-5), Humidity(4), Wind(200), Condition.create('4'),
+                         RecordDate.create('09/09/2000 21:12')))
+    return rl
+
+
+def records(rl: RecordList) -> list:
+    return [rl.record(i) for i in range(rl.records)]
+
+
+def test_snapshot_round_trip(tmp_path, record_list):
+    Snapshot('mr_bean', tmp_path).save(record_list, '"v1"', None)
+    loaded = RecordList()
+    assert Snapshot('mr_bean', tmp_path).load(loaded) == ('"v1"', None)
+    assert records(loaded) == records(record_list)
+
+
+def test_missing_snapshot_is_not_loaded(tmp_path):
+    assert Snapshot('mr_bean', tmp_path).load(RecordList()) is None
+
+
+def test_snapshot_of_another_user_is_invalidated(tmp_path, record_list):
+    Snapshot('mr_bean', tmp_path).save(record_list)
+    snapshot = Snapshot('somebody_else', tmp_path)
+    assert snapshot.load(RecordList()) is None
+    assert not snapshot.path.exists()
+
+
+@pytest.mark.parametrize('position', [0, 4, 30, -10, -1])
+def test_corrupted_snapshot_is_invalidated(tmp_path, record_list, position):
+    snapshot = Snapshot('mr_bean', tmp_path)
+    snapshot.save(record_list)
+    data = bytearray(snapshot.path.read_bytes())
+    data[position] ^= 0xFF
+    snapshot.path.write_bytes(bytes(data))
+    loaded = RecordList()
+    assert snapshot.load(loaded) is None
+    assert loaded.records == 0
+    assert not snapshot.path.exists()
+
+
+def test_truncated_snapshot_is_invalidated(tmp_path, record_list):
+    snapshot = Snapshot('mr_bean', tmp_path)
+    snapshot.save(record_list)
+    snapshot.path.write_bytes(snapshot.path.read_bytes()[:20])
+    assert snapshot.load(RecordList()) is None
+
+
+def test_snapshot_of_another_version_is_invalidated(tmp_path, record_list, monkeypatch):
+    Snapshot('mr_bean', tmp_path).save(record_list)
+    monkeypatch.setattr(Snapshot, 'VERSION', Snapshot.VERSION + 1)
+    assert Snapshot('mr_bean', tmp_path).load(RecordList()) is None
@@ -0,0 +1,103 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from tui_ssd.domain import *
+from tui_ssd.sync import RecordSync
+
+
+@pytest.fixture
+def rows():
+    return [
+        {'id': 44, 'condition': '1', 'humidity': 60, 'temperature': 40, 'wind': 20, 'date': '2022-10-20T11:54:00+02:00'},
+        {'id': 45, 'condition': '1', 'humidity': 90, 'temperature': 34, 'wind': 17, 'date': '2022-10-20T14:54:00+02:00'},
+    ]
+
+
+def test_first_diff_adds_every_row(rows):
+    sync = RecordSync()
+    delta = sync.diff(rows, {})
+    assert [rec.id for rec in delta.added] == [Id(44), Id(45)]
+    assert delta.removed == []
+    assert sync.records == 2
+
+
+def test_unchanged_rows_give_an_empty_delta(rows):
+    sync = RecordSync()
+    sync.diff(rows, {})
+    assert sync.diff(rows, {}).is_empty
+
+
+def test_changed_row_is_removed_and_added_again(rows):
+    sync = RecordSync()
+    sync.diff(rows, {})
+    rows[1]['wind'] = 18
+    delta = sync.diff(rows, {})
+    assert [rec.wind for rec in delta.added] == [Wind(18)]
+    assert delta.removed == [45]
+    assert delta.changed == 1
+
+
+def test_missing_row_is_removed(rows):
+    sync = RecordSync()
+    sync.diff(rows, {})
+    delta = sync.diff(rows[:1], {})
+    assert delta.added == []
+    assert delta.removed == [45]
+
+
+def test_tracked_row_is_not_added_again(rows):
+    sync = RecordSync()
+    sync.track(rows[0])
+    delta = sync.diff(rows, {})
+    assert [rec.id for rec in delta.added] == [Id(45)]
+
+
+def test_validators_are_sent_back(rows):
+    sync = RecordSync()
+    assert sync.request_headers == {}
+    sync.diff(rows, {'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+    assert sync.request_headers == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+    sync.reset()
+    assert sync.request_headers == {}
+    assert sync.records == 0
+
+
+def test_sync_memory_stays_bounded():
+    date = RecordDate.create('20/10/2022 11:54')
+    rows = [(record_id, 40, 60, 20, 1, date.epoch_minutes) for record_id in range(20000, 0, -1)]  # Not sorted by id
+    same_rows = [{'id': record_id, 'condition': '1', 'humidity': 60, 'temperature': 40, 'wind': 20,
+                  'date': date.db_date} for record_id in range(1, 20001)]
+    sync = RecordSync()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sync.seed(rows, None, None)
+        assert sync.diff(same_rows, {}).is_empty
+        gc.collect()  # Empties the free lists of the interpreter
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert sync.records == 20000
+    assert sync.memory_usage == 20000 * sync.bytes_per_record
+    assert used < sync.memory_usage * 1.5  # Only the arrays are left, a tuple and a string per row took 200 bytes
+
+
+def test_forget_and_track_keep_the_ids_sorted(rows):
+    sync = RecordSync()
+    sync.diff(rows, {})
+    sync.forget(44)
+    sync.track(dict(rows[0], id=43))
+    sync.track(rows[0])
+    assert sync.records == 3
+    delta = sync.diff([dict(rows[0], id=43)] + rows, {})
+    assert delta.is_empty
+
+
+def test_evicted_records_stay_known_compactly(rows):
+    sync, record_list = RecordSync(), RecordList()
+    record_list.add_records(sync.diff(rows, {}).added)
+    assert len(record_list.evict(Retention(max_records=1))) == 1
+    assert sync.diff(rows, {}).is_empty  # The evicted record is not downloaded again
+    assert sync.memory_usage == 2 * sync.bytes_per_record == 32
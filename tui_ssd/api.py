@@ -0,0 +1,389 @@
+import asyncio
+import codecs
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from typeguard import typechecked
+from valid8 import validate
+
+from tui_ssd.metrics import Metrics
+
+
+@typechecked
+@dataclass(frozen=True)
+class ConnectionStats:
+    requests: int
+    connections: int
+
+    @property
+    def reused(self) -> int:  # Requests served on an already open connection
+        return self.requests - self.connections
+
+    def __str__(self):
+        return f'{self.requests} requests over {self.connections} connections ({self.reused} reused)'
+
+
+@typechecked
+@dataclass(frozen=True)
+class CreateResult:
+    status_code: int
+    body: Any = None  # The created record as returned by the server, None if unavailable
+
+    @property
+    def created(self) -> bool:
+        return self.status_code in (200, 201)
+
+    @staticmethod
+    def of(res: requests.Response) -> 'CreateResult':
+        return CreateResult(res.status_code, _json_or_none(res))
+
+
+@typechecked
+@dataclass(frozen=True)
+class DeleteResult:
+    record_id: int
+    status_code: int
+
+    @property
+    def deleted(self) -> bool:  # 404: the record does not exist anymore, e.g. deleted by someone else
+        return self.status_code in (200, 204, 404)
+
+
+def _json_or_none(res: requests.Response) -> Any:
+    try:
+        return res.json()
+    except ValueError:
+        return None
+
+
+def _iter_json_array(chunks: Iterator[bytes], batch_size: int) -> Iterator[List[Any]]:
+    """
+        Decodes a JSON array while it is being downloaded, yielding its items in lists of at most batch_size.
+        Only the text of the items not yet decoded is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, exhausted = '', 0, False
+    batch, state = [], 'start'  # start -> first item or end -> separator or end -> item -> separator or end ...
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if exhausted:
+                raise ValueError('Unexpected end of the records stream')
+            chunk = next(chunks, None)
+            exhausted = chunk is None
+            buffer, pos = buffer[pos:] + text_decoder.decode(chunk or b'', final=exhausted), 0
+            continue
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise ValueError(f'Expected a list of records, found {char!r}')
+            pos, state = pos + 1, 'first'
+        elif char == ']' and state in ('first', 'separator'):
+            if batch:
+                yield batch
+            return
+        elif state == 'separator':
+            if char != ',':
+                raise ValueError(f'Unexpected character in the records stream: {char!r}')
+            pos, state = pos + 1, 'item'
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                complete = end < len(buffer) or exhausted  # e.g. a number may go on in the next chunk
+            except ValueError:
+                if exhausted:
+                    raise
+                complete = False
+            if not complete:
+                chunk = next(chunks, None)
+                exhausted = chunk is None
+                buffer, pos = buffer[pos:] + text_decoder.decode(chunk or b'', final=exhausted), 0
+                continue
+            batch.append(item)
+            pos, state = end, 'separator'
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """
+        requests.Session has no session wide timeout, so the adapter applies a default one
+        to every request that does not specify its own.
+    """
+
+    def __init__(self, timeout: float, **kwargs):
+        self.default_timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        return super().send(request, **kwargs)
+
+
+@typechecked
+class ApiClient:
+    """
+        Single entry point for the REST API of the weather station.
+        All the calls go through one pooled requests.Session, so TCP connections are kept alive and reused
+        between calls and the Authorization header is set once at login instead of being rebuilt for every request.
+        With enabled metrics, the time until the response headers and the status of every request are recorded
+        per endpoint (e.g. "records/{id}/").
+    """
+    __ID = re.compile(r'/\d+/')
+    IDEMPOTENCY_HEADER = 'Idempotency-Key'
+    IDEMPOTENCY_FIELD = 'idempotency_key'  # Of every row of a batch
+
+    def __init__(self, base_url: str = 'http://localhost:8000/api/v1/', pool_size: int = 10,
+                 timeout: float = 10.0, keep_alive: bool = True, batch_create: bool = False, page_size: int = 500,
+                 metrics: Optional[Metrics] = None, batch_delete: bool = False):
+        validate('pool_size', pool_size, min_value=1)
+        validate('page_size', page_size, min_value=1)
+        validate('timeout', timeout, min_value=0, min_strict=True)
+        self.__base_url = base_url
+        self.__pool_size = pool_size
+        self.__batch_create = batch_create
+        self.__batch_delete = batch_delete
+        self.__page_size = page_size
+        self.__token: Optional[str] = None
+        self.__session = requests.Session()
+        adapter = _TimeoutAdapter(timeout, pool_connections=1, pool_maxsize=pool_size)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+        if not keep_alive:
+            self.__session.headers['Connection'] = 'close'
+        if metrics is not None and metrics.enabled:
+            self.__session.hooks['response'].append(lambda res, *args, **kwargs: self.__record(metrics, res))
+
+    def __record(self, metrics: Metrics, res: requests.Response) -> None:
+        path = urlsplit(res.request.url).path
+        base_path = urlsplit(self.__base_url).path
+        endpoint = self.__ID.sub('/{id}/', path[len(base_path):] if path.startswith(base_path) else path)
+        metrics.observe('http_request_seconds', res.elapsed.total_seconds(), method=res.request.method,
+                        endpoint=endpoint)
+        metrics.increment('http_responses_total', method=res.request.method, endpoint=endpoint,
+                          status=str(res.status_code))
+
+    @property
+    def login_url(self) -> str:
+        return f'{self.__base_url}auth/login/'
+
+    @property
+    def logout_url(self) -> str:
+        return f'{self.__base_url}auth/logout/'
+
+    @property
+    def records_url(self) -> str:
+        return f'{self.__base_url}records/'
+
+    def record_url(self, record_id: int) -> str:
+        return f'{self.records_url}{record_id}/'
+
+    @property
+    def token(self) -> Optional[str]:
+        return self.__token
+
+    @token.setter
+    def token(self, value: Optional[str]) -> None:
+        self.__token = value
+        if value is None:
+            self.__session.headers.pop('Authorization', None)
+        else:
+            self.__session.headers['Authorization'] = f'Token {value}'
+
+    def login(self, username: str, password: str) -> requests.Response:
+        credentials = {'username': username, 'email': '', 'password': password}
+        return self.__session.post(self.login_url, json=credentials)
+
+    def logout(self) -> requests.Response:
+        res = self.__session.post(self.logout_url)
+        self.token = None
+        return res
+
+    def fetch_records(self, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+            Requests the first page of the records without downloading the body, see iter_records
+        """
+        return self.__session.get(self.records_url, headers=headers, params={'limit': self.__page_size}, stream=True)
+
+    def iter_records(self, res: requests.Response,
+                     on_progress: Callable[[int, Optional[int]], None] = lambda loaded, total: None) \
+            -> Iterator[List[Dict[str, Any]]]:
+        """
+            Yields the records of the response returned by fetch_records in lists of at most page_size records.
+            A paginated response ({"count": ..., "next": ..., "results": [...]}) is followed page by page,
+            a plain list is decoded while it is downloaded. Either way the whole dataset is never in memory.
+            on_progress receives the number of records loaded so far and the total, if the server tells it.
+        """
+        loaded, current = 0, res
+        while current is not None:
+            try:
+                chunks = current.iter_content(chunk_size=64 * 1024)
+                head = b''
+                while not head.strip():
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        raise ValueError('Empty records response')
+                    head += chunk
+                if head.lstrip().startswith(b'['):
+                    for rows in _iter_json_array(chain([head], chunks), self.__page_size):
+                        loaded += len(rows)
+                        on_progress(loaded, None)
+                        yield rows
+                    return
+                page = json.loads(head + b''.join(chunks))  # A single page, its size is bounded by the limit
+            finally:
+                current.close()
+            loaded += len(page['results'])
+            on_progress(loaded, page.get('count'))
+            yield page['results']
+            current = self.__session.get(urljoin(current.url, page['next']), stream=True) if page.get('next') else None
+
+    def create_record(self, data: Dict[str, Any], idempotency_key: Optional[str] = None) -> requests.Response:
+        """
+            A request sent again with the same idempotency key (Idempotency-Key header) is not executed twice
+            by the server, e.g. when the response of the first one was lost
+        """
+        if idempotency_key is None:
+            return self.__session.post(self.records_url, data=data)
+        return self.__session.post(self.records_url, data=data, headers={self.IDEMPOTENCY_HEADER: idempotency_key})
+
+    def create_records(self, rows: List[Dict[str, Any]], idempotency_keys: Optional[List[str]] = None) \
+            -> List[CreateResult]:
+        """
+            Uploads many records at once and returns one result per row, in the same order of the rows.
+            If batch_create is enabled the whole list is sent in a single request, otherwise (or if the server
+            refuses the batch) the rows are sent concurrently, never using more threads than pooled connections.
+            With idempotency keys (one per row) every row is sent with its own key: in the header of its request,
+            or in the row itself within a batch, so that a row is never created twice however it is batched again.
+        """
+        if not rows:
+            return []
+        if idempotency_keys is not None:
+            validate('idempotency_keys', len(idempotency_keys), equals=len(rows))
+        if self.__batch_create:
+            batch = rows if idempotency_keys is None else \
+                [dict(row, **{self.IDEMPOTENCY_FIELD: key}) for row, key in zip(rows, idempotency_keys)]
+            res = self.__session.post(self.records_url, json=batch)
+            body = _json_or_none(res)
+            if res.status_code in (200, 201) and isinstance(body, list) and len(body) == len(rows):
+                return [CreateResult(res.status_code, item) for item in body]
+
+        keys = idempotency_keys if idempotency_keys is not None else [None] * len(rows)
+        return self.__map_concurrently(lambda item: CreateResult.of(self.create_record(*item)), list(zip(rows, keys)))
+
+    def __map_concurrently(self, function: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        with ThreadPoolExecutor(max_workers=min(self.__pool_size, len(items))) as executor:
+            return list(executor.map(function, items))
+
+    def delete_record(self, record_id: int) -> requests.Response:
+        return self.__session.delete(url=self.record_url(record_id))
+
+    def delete_records(self, ids: List[int]) -> List[DeleteResult]:
+        """
+            Deletes many records and returns one result per id, in the same order of the ids.
+            If batch_delete is enabled the ids are sent in a single request (DELETE records/ {"ids": [...]}),
+            otherwise (or if the server refuses it) one request per id is sent concurrently, as in create_records.
+        """
+        if not ids:
+            return []
+        if self.__batch_delete:
+            res = self.__session.delete(self.records_url, json={'ids': ids})
+            if res.status_code in (200, 204):
+                return [DeleteResult(record_id, res.status_code) for record_id in ids]
+
+        def delete(record_id: int) -> DeleteResult:
+            return DeleteResult(record_id, self.delete_record(record_id).status_code)
+
+        return self.__map_concurrently(delete, ids)
+
+    def connection_stats(self) -> ConnectionStats:
+        requests_sent, connections = 0, 0
+        for adapter in set(self.__session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        return ConnectionStats(requests_sent, connections)
+
+    def close(self) -> None:
+        self.__session.close()
+
+
+@typechecked
+class AsyncApiClient:
+    """
+        asyncio front end of ApiClient, for the event loop of AsyncApp.
+        Each call runs on the pooled session in a worker thread, so the loop is never blocked by the network,
+        and a semaphore keeps the calls in flight within max_concurrency (the size of the connection pool).
+    """
+
+    def __init__(self, client: Optional[ApiClient] = None, max_concurrency: int = 10):
+        validate('max_concurrency', max_concurrency, min_value=1)
+        self.__client = client if client is not None else ApiClient(pool_size=max_concurrency)
+        self.__semaphore = asyncio.Semaphore(max_concurrency)
+        self.__in_flight = 0
+
+    @property
+    def client(self) -> ApiClient:
+        return self.__client
+
+    @property
+    def in_flight(self) -> int:  # Requests currently running
+        return self.__in_flight
+
+    async def __call(self, function: Callable, *args: Any) -> Any:
+        async with self.__semaphore:
+            self.__in_flight += 1
+            try:
+                return await asyncio.to_thread(function, *args)
+            finally:
+                self.__in_flight -= 1
+
+    async def login(self, username: str, password: str) -> requests.Response:
+        return await self.__call(self.__client.login, username, password)
+
+    async def logout(self) -> requests.Response:
+        return await self.__call(self.__client.logout)
+
+    async def fetch_records(self, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        return await self.__call(self.__client.fetch_records, headers)
+
+    async def iter_records(self, res: requests.Response) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+            Async version of ApiClient.iter_records: every page is downloaded and decoded in a worker thread
+        """
+        pages = self.__client.iter_records(res)
+        while True:
+            rows = await self.__call(next, pages, None)
+            if rows is None:
+                return
+            yield rows
+
+    async def create_record(self, data: Dict[str, Any]) -> CreateResult:
+        res = await self.__call(self.__client.create_record, data)
+        return CreateResult.of(res)
+
+    async def create_records(self, rows: List[Dict[str, Any]]) -> List[CreateResult]:
+        return list(await asyncio.gather(*(self.create_record(row) for row in rows)))
+
+    async def delete_record(self, record_id: int) -> requests.Response:
+        return await self.__call(self.__client.delete_record, record_id)
+
+    async def delete_records(self, ids: List[int]) -> List[DeleteResult]:
+        responses = await asyncio.gather(*(self.delete_record(record_id) for record_id in ids))
+        return [DeleteResult(record_id, res.status_code) for record_id, res in zip(ids, responses)]
+
+    def close(self) -> None:
+        self.__client.close()
@@ -1,19 +1,67 @@
 import csv
 import sys
+from pathlib import Path
 from typing import Tuple
 from valid8 import ValidationError
 from tui_ssd.menu import *
 from tui_ssd.domain import *
+from tui_ssd.api import ApiClient, ConnectionStats, CreateResult
+from tui_ssd.archive import RecordArchive
+from tui_ssd.csv_io import export_csv, import_csv
+from tui_ssd.filters import parse_filter
+from tui_ssd.journal import Journal, JournalEntry
+from tui_ssd.metrics import Metrics
+from tui_ssd.poller import PollInterval, Poller
+from tui_ssd.sync import Delta, RecordSync
+from tui_ssd.snapshot import Snapshot
+from tui_ssd.render import RecordTable, print_records, print_rollups, print_statistics
+from concurrent.futures import Future, ThreadPoolExecutor
 import requests
 import json
 from random import randint, choice
 import getpass
-from os import system
+from time import monotonic
+
+
+def parse_period(value: str) -> int:
+    """
+        The period to collect is a number of hours ("24", "36h") or of days ("7d"), an empty value means 24 hours
+    """
+    if value == '':
+        return 24
+    hours = int(value[:-1]) * 24 if value.endswith('d') else int(value.removesuffix('h'))
+    validate('hours', hours, min_value=1, max_value=24 * 366)
+    return hours
+
+
+def collect_from_sensors(hours: int) -> List[Record]:
+    """
+        One reading per hour starting from today at 00:00
+    """
+    __start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    __records = []
+    for i in range(hours):
+        __date = RecordDate.create((__start + timedelta(hours=i)).strftime('%d/%m/%Y %H:%M'))
+        __temp = Temperature(randint(-50, 50))
+        __hum = Humidity(randint(0, 100))
+        __wind = Wind(randint(0, 200))
+        __cond = Condition.create(choice(['1', '2', '3', '4']))
+        __records.append(Record(__temp, __hum, __wind, __cond, __date))
+    return __records
 
 
 class App:
-    def __init__(self):
-        self.__menu = Menu.Builder(Description('Your Secure Weather TUI'), auto_select=lambda: self.__connect()) \
+    __OFFLINE = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    __REPLAY_INTERVAL = 30  # Seconds between two attempts to send the journal while the server is unreachable
+    __REPLAY_BATCH = 100
+    __SNAPSHOT_INTERVAL = 60  # Seconds between two saves of the snapshot for local changes
+
+    def __init__(self, api: Optional[ApiClient] = None, metrics: Optional[Metrics] = None,
+                 retention: Optional[Retention] = None, poll_interval: Optional[PollInterval] = None):
+        self.__metrics = metrics if metrics is not None else Metrics.from_environ()
+        self.__retention = retention if retention is not None else Retention.from_environ()
+        self.__menu = Menu.Builder(Description('Your Secure Weather TUI'), auto_select=lambda: self.__connect(),
+                                   status=lambda: self.__status(), metrics=self.__metrics) \
             .with_entry(Entry.create('1', 'Add new record', on_selected=lambda: self.__add_record())) \
             .with_entry(Entry.create('2', 'Remove record', on_selected=lambda: self.__remove_record())) \
             .with_entry(Entry.create('3', 'Collect records from sensors', on_selected=lambda: self.__generate_records())) \
@@ -22,59 +70,209 @@ class App:
             .with_entry(Entry.create('6', 'Sort by wind', on_selected=lambda: self.__sort_by_wind())) \
             .with_entry(Entry.create('7', 'Sort by ascending date', on_selected=lambda: self.__sort_by_ascending_date())) \
             .with_entry(Entry.create('8', 'Update records list', on_selected=lambda: self.__load())) \
+            .with_entry(Entry.create('9', 'Statistics', on_selected=lambda: self.__show_statistics())) \
+            .with_entry(Entry.create('10', 'Show records in a date range', on_selected=lambda: self.__show_range())) \
+            .with_entry(Entry.create('11', 'Import records from CSV', on_selected=lambda: self.__import_csv())) \
+            .with_entry(Entry.create('12', 'Export records to CSV', on_selected=lambda: self.__export_csv())) \
+            .with_entry(Entry.create('13', 'Remove many records', on_selected=lambda: self.__remove_many())) \
+            .with_entry(Entry.create('14', 'Show highest readings', on_selected=lambda: self.__show_extremes(True))) \
+            .with_entry(Entry.create('15', 'Show lowest readings', on_selected=lambda: self.__show_extremes(False))) \
+            .with_entry(Entry.create('16', 'Filter records', on_selected=lambda: self.__show_filtered())) \
+            .with_entry(Entry.create('17', 'Rollups by hour, day or month', on_selected=lambda: self.__show_rollups())) \
+            .with_entry(Entry.create('n', 'Next page', on_selected=lambda: self.__table.next_page())) \
+            .with_entry(Entry.create('p', 'Previous page', on_selected=lambda: self.__table.previous_page())) \
             .with_entry(Entry.create('0', 'Exit', on_selected=lambda: self.__logout(), is_exit=True)) \
+            .with_entry(Entry.create('m', 'Show metrics', on_selected=lambda: self.__show_metrics(), is_hidden=True)) \
             .build()
         self.__record_list = RecordList()
-        self.__token = None
-        self.__LOGIN_URL = "http://localhost:8000/api/v1/auth/login/"
-        self.__RECORDS_URL = "http://localhost:8000/api/v1/records/"
-        self.__LOGOUT_URL = "http://localhost:8000/api/v1/auth/logout/"
+        self.__table = RecordTable(reserved_lines=lambda: self.__menu.height)
+        self.__api = api if api is not None else ApiClient(metrics=self.__metrics)
+        self.__sync = RecordSync()
+        self.__snapshot: Optional[Snapshot] = None
+        self.__archive: Optional[RecordArchive] = None
+        self.__journal: Optional[Journal] = None
+        self.__next_replay = 0.0
+        self.__snapshot_stale = False  # Local changes not saved in the snapshot yet
+        self.__next_snapshot = 0.0
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__reconcile: Optional[Future] = None  # The reconcile of the snapshot or a poll, see __apply_reconcile
+        self.__poller = Poller(poll_interval if poll_interval is not None else PollInterval.from_environ())
+        self.__new_records = 0  # Added by the background refreshes and not reported yet
 
     def __connect(self) -> None:
-        if self.__token is None:
+        if self.__api.token is None:
             print("Hello user, please enter your credentials below.")
-            while self.__token is None:
+            while self.__api.token is None:
                 username = input("Username: ")
                 password = getpass.getpass("Password: ")
 
                 user = Username(username)
                 passw = Password(password)
 
-                credentials = {'username': user.value, 'email': '', 'password': passw.value}
-                req = requests.post(self.__LOGIN_URL, json=credentials)
+                req = self.__api.login(user.value, passw.value)
                 if req.status_code != 200:
                     print('Unable to login, please check your credentials...')
                 else:
-                    self.__token = req.json().get('key')
-                    # If login is good load data and then print
-                    if self.__record_list.records == 0:
+                    self.__api.token = req.json().get('key')
+                    # If login is good show the snapshot of the last session (if any) and sync it in background,
+                    # otherwise load data and then print
+                    self.__snapshot = Snapshot(user.value)
+                    self.__archive = RecordArchive(user.value)
+                    self.__journal = Journal(user.value)
+                    validators = self.__snapshot.load(self.__record_list)
+                    if validators is not None:
+                        rows = list(self.__record_list.rows())
+                        self.__reconcile = self.__executor.submit(self.__fetch_in_background, rows, *validators)
+                    elif self.__record_list.records == 0:
                         self.__load()
+                    self.__apply_pending()
+                    self.__replay()
                     self.__print_records()
+                    self.__start_polling()
         else:
+            self.__apply_reconcile(wait=False)
+            if monotonic() >= self.__next_replay:
+                self.__replay()
+            if self.__snapshot_stale and monotonic() >= self.__next_snapshot:
+                self.__apply_reconcile(wait=True)  # Until it is applied the validators of the sync are ahead
+                self.__save_snapshot()
             self.__print_records()
+            self.__start_polling()
+
+    def __status(self) -> str:
+        added, self.__new_records = self.__new_records, 0
+        return f'{added} new records' if added else ''
 
     def __logout(self) -> None:
-        req = requests.post(self.__LOGOUT_URL, headers={'Authorization': f'Token {self.__token}'})
-        self.__token = None
+        """
+            The snapshot is kept, so the next login of the same user shows the records right away and only asks
+            the server for what changed (the snapshot of another user is not loaded, see Snapshot).
+            The archive of the evicted records is removed: the sync of the next session does not know them.
+        """
+        self.__apply_reconcile(wait=True)
+        self.__replay()
+        if self.__journal is not None and self.__journal.pending():
+            print(f'{len(self.__journal.pending())} changes not sent to the server yet, they will be sent '
+                  f'at the next login')
+        if self.__snapshot_stale:
+            self.__save_snapshot()
+        self.__api.logout()
+        self.__sync.reset()
+        if self.__archive is not None:
+            self.__archive.clear()
         print("Cya!")
 
     def __print_records(self) -> None:
-        system('clear')
-        print_sep = lambda: print('-' * 130)
-        print_sep()
-        fmt = '%-10s %-30s %-20s %-20s %-20s %-30s'
-        print(fmt % ('#', 'CONDITION', 'TEMPERATURE (˚C)', 'HUMIDITY (%)', 'WIND (Km/h)', 'DATE'))
-        print_sep()
-        for index in range(self.__record_list.records):
-            rec = self.__record_list.record(index)
-            print(fmt % (index + 1, rec.condition.value, rec.temperature.value, rec.humidity.value,
-                         rec.wind.value, rec.record_date.value))
-        print_sep()
+        with self.__metrics.timer('render_seconds'):
+            self.__table.render(self.__record_list)
+
+    def __show_statistics(self) -> None:
+        if self.__record_list.records == 0:
+            print('No records')
+            return
+        groupings = {'c': 'condition', 'd': 'day', 'h': 'hour'}
+        def builder(value: str) -> str:
+            validate('value', value, is_in=groupings)
+            return groupings[value]
+
+        group_by = self.__read__str('Group by (c = condition, d = day, h = hour)', builder)
+        for measure, unit in zip(RecordList.MEASURES, ('˚C', '%', 'Km/h')):
+            print_statistics(f'{measure.upper()} ({unit}) BY {group_by.upper()}',
+                             self.__record_list.statistics(measure, group_by))
+        input('Press Enter to continue...')
+
+    def __show_rollups(self) -> None:
+        periods = {'h': 'hour', 'd': 'day', 'm': 'month'}
+        def builder(value: str) -> str:
+            validate('value', value, is_in=periods)
+            return periods[value]
+
+        period = self.__read__str('Period (h = hour, d = day, m = month)', builder)
+        with self.__metrics.timer('render_seconds'):
+            print_rollups(period, self.__record_list.rollups(period))
+        input('Press Enter to continue...')
+
+    def __show_range(self) -> None:
+        start = self.__read__str('From (dd/mm/yyyy HH:MM)', RecordDate.create)
+        end = self.__read__str('To (dd/mm/yyyy HH:MM)', lambda value: self.__date_after(start, value))
+        view = self.__record_list.between(start, end)
+        archived = self.__archived_between(start, end)
+        if archived:  # Evicted by the retention: shown together with the records in memory, by date
+            merged = RecordList()
+            merged.load_rows(archived + [view.row(index) for index in range(view.records)])
+            merged.sort_by_ascending_date()
+            view = merged
+        with self.__metrics.timer('render_seconds'):
+            print_records(view)
+        input('Press Enter to continue...')
+
+    def __show_extremes(self, highest: bool) -> None:
+        """
+            Shows the records with the highest (or lowest) value of a field, without sorting the list
+        """
+        keys = {'t': 'temperature', 'h': 'humidity', 'w': 'wind', 'd': 'date'}
+        def builder(value: str) -> str:
+            validate('value', value, is_in=keys)
+            return keys[value]
+
+        def count(value: int) -> int:
+            validate('value', value, min_value=1)
+            return value
+
+        key = self.__read__str('Field (t = temperature, h = humidity, w = wind, d = date)', builder)
+        k = self.__read_integer('How many records', count)
+        select = self.__record_list.top_k if highest else self.__record_list.bottom_k
+        with self.__metrics.timer('render_seconds'):
+            print_records(select(key, k))
+        input('Press Enter to continue...')
+
+    def __show_filtered(self) -> None:
+        view = self.__record_list.filter(self.__read_filter())
+        with self.__metrics.timer('render_seconds'):
+            print_records(view)
+        input('Press Enter to continue...')
+
+    def __read_filter(self) -> RowFilter:
+        return self.__read__str('Filter (e.g. rainy and wind > 80 and date within 7d)', parse_filter)
+
+    def __archived_between(self, start: RecordDate, end: RecordDate) -> List[tuple]:
+        if self.__archive is None:
+            return []
+        try:
+            rows = self.__archive.between(start.epoch_minutes, end.epoch_minutes)
+        except OSError:
+            return []
+        # A record added again after its eviction (e.g. changed on the server) is shown as it is in memory
+        return [row for row in rows if not row[0] or self.__record_list.get_by_id(row[0]) is None]
+
+    @staticmethod
+    def __date_after(start: RecordDate, value: str) -> RecordDate:
+        date = RecordDate.create(value)
+        validate('date', date, min_value=start)
+        return date
+
+    def __show_metrics(self) -> None:
+        stats = self.__record_connection_stats()
+        if not self.__metrics.enabled:
+            print('Metrics are disabled, set TUI_SSD_METRICS to the file where to save them on exit')
+        else:
+            print(self.__metrics.to_text())
+        print(f'HTTP: {stats}')
+        input('Press Enter to continue...')
+
+    def __record_connection_stats(self) -> ConnectionStats:
+        """
+            Requests and connections of the pool so far, as gauges: the pool counts them since it was opened
+        """
+        stats = self.__api.connection_stats()
+        self.__metrics.set_gauge('http_requests', stats.requests)
+        self.__metrics.set_gauge('http_connections', stats.connections)
+        self.__metrics.set_gauge('http_connections_reused', stats.reused)
+        return stats
 
     def __add_record(self) -> None:
         record = Record(*self.__read_record())
         self.__save(record)
-        self.__load()
         print('Record added!')
 
     def __remove_record(self) -> None:
@@ -90,61 +288,486 @@ class App:
         self.__remove_from_db(rec)
 
     def __generate_records(self) -> None:
-        for i in range(24):
-            __today_date = datetime.now()
-            __date = RecordDate.create(f"{__today_date.day}/{__today_date.month}/{__today_date.year} {i:02}:00")
-            __temp = Temperature(randint(-50, 50))
-            __hum = Humidity(randint(0, 100))
-            __wind = Wind(randint(0, 200))
-            __cond = Condition.create(choice(['1', '2', '3', '4']))
-
-            __rec = Record(__temp, __hum, __wind, __cond, __date)
-            self.__save(__rec)
+        hours = self.__read__str('Hours to collect (e.g. 24, or 7d for days)', parse_period)
+        self.__save_all(collect_from_sensors(hours))
         print('Data collected!')
-        self.__load()
 
     def __sort_by_temperature(self) -> None:
         self.__record_list.sort_by_temperature()
+        self.__table.first_page()
 
     def __sort_by_humidity(self) -> None:
         self.__record_list.sort_by_humidity()
+        self.__table.first_page()
 
     def __sort_by_wind(self) -> None:
         self.__record_list.sort_by_wind()
+        self.__table.first_page()
 
     def __sort_by_ascending_date(self) -> None:
         self.__record_list.sort_by_ascending_date()
+        self.__table.first_page()
 
     def __save(self, rec: Record) -> None:
-        __json_data = {'condition': rec.condition.enum_value, 'humidity': rec.humidity.value,
-                       'temperature': rec.temperature.value, 'wind': rec.wind.value, 'date': rec.record_date.db_date}
-        req = requests.post(self.__RECORDS_URL, headers={'Authorization': f'Token {self.__token}'}, data=__json_data)
+        """
+            Adds the record to the list as returned by the server (with its id), without reloading the list
+        """
+        self.__apply_reconcile(wait=True)
+        entry = JournalEntry.for_create(rec.db_json)
+        self.__write_ahead([entry])
+        try:
+            req = self.__api.create_record(rec.db_json, idempotency_key=entry.key)
+        except self.__OFFLINE:
+            self.__keep_offline([entry])
+            return
+        self.__done([entry])
         if req.status_code == 201 or req.status_code == 200:
+            if self.__merge_created([CreateResult.of(req)]):
+                self.__snapshot_changed()
+            else:
+                self.__load()
             print('Record saved!')
         elif req.status_code == 405:
             print("Missing permissions to perform this action")
 
+    def __save_all(self, records: List[Record]) -> None:
+        """
+            Uploads the records concurrently and adds the created ones to the list as returned by the server,
+            falling back to a full reload only if some created record could not be read from the response.
+        """
+        self.__apply_reconcile(wait=True)
+        entries = [JournalEntry.for_create(rec.db_json) for rec in records]
+        self.__write_ahead(entries)
+        try:
+            results = self.__api.create_records([entry.row for entry in entries], [entry.key for entry in entries])
+        except self.__OFFLINE:
+            self.__keep_offline(entries)
+            return
+        self.__done(entries)
+        created = [res for res in results if res.created]
+        if self.__merge_created(results):
+            self.__snapshot_changed()
+        else:
+            self.__load()
+        print(f'{len(created)} of {len(records)} records saved!')
+        if any(res.status_code == 405 for res in results):
+            print("Missing permissions to perform this action")
+
+    def __merge_created(self, results: List[CreateResult]) -> bool:
+        """
+            Adds the created records to the list as returned by the server;
+            returns False if some of them could not be read from the response and the list must be reloaded.
+        """
+        merged = True
+        for res in results:
+            if not res.created:
+                continue
+            try:
+                self.__record_list.add_record(Record.parse(res.body))
+                self.__sync.track(res.body)
+            except (KeyError, TypeError, ValueError):
+                merged = False
+        self.__evict()
+        return merged
+
+    def __import_csv(self) -> None:
+        path = self.__read__str('CSV file to import (empty to cancel)', self.__existing_file)
+        if path is None:
+            print('Cancelled!')
+            return
+        self.__apply_reconcile(wait=True)
+        merged = True
+
+        def on_batch(results: List[CreateResult], rows: int) -> None:
+            nonlocal merged
+            merged = self.__merge_created(results) and merged
+            sys.stdout.write(f'\rImporting records... {rows} rows read')
+            sys.stdout.flush()
+
+        try:
+            result = import_csv(self.__api, path, on_batch=on_batch)
+        except ValueError as e:  # Not a CSV file of records
+            print(f'Unable to import {path}: {e}')
+            input('Press Enter to continue...')
+            return
+        except self.__OFFLINE:
+            sys.stdout.write('\r\033[K')
+            print(f'Server unreachable: import {path} again to resume from the last batch sent')
+            if merged:
+                self.__snapshot_changed()  # The batches sent before
+            input('Press Enter to continue...')
+            return
+        finally:
+            sys.stdout.write('\r\033[K')
+        if merged:
+            self.__snapshot_changed()
+        else:
+            self.__load()
+        if result.resumed_from:
+            print(f'Resumed after {result.resumed_from} rows imported before')
+        print(f'{result.saved} records saved, {result.refused} refused, {len(result.errors)} invalid rows skipped')
+        for line, error in result.errors[:10]:
+            print(f'Line {line}: {error}')
+        if 405 in result.status_codes:
+            print("Missing permissions to perform this action")
+        input('Press Enter to continue...')
+
+    def __export_csv(self) -> None:
+        path = self.__read__str('CSV file to write (empty to cancel)', lambda value: Path(value) if value else None)
+        if path is None:
+            print('Cancelled!')
+            return
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                exported = export_csv(self.__record_list, file)
+            print(f'{exported} records exported to {path}')
+        except OSError as e:
+            print(f'Unable to write {path}: {e}')
+        input('Press Enter to continue...')
+
+    @staticmethod
+    def __existing_file(value: str) -> Optional[Path]:
+        if not value:
+            return None
+        if not Path(value).is_file():
+            raise ValueError(f'{value} is not a file')
+        return Path(value)
+
     def __load(self) -> None:
-        self.__record_list.dump_list()  # Clear old data
+        """
+            Synchronizes the list with the database: only new, changed and deleted records are applied,
+            and nothing is done when the server answers that the records are not modified since the last load.
+            The records are streamed page by page, so memory does not grow with the size of the response.
+        """
+        self.__apply_reconcile(wait=True)
+        try:
+            for __delta in self.__fetch_deltas(self.__print_progress):
+                with self.__metrics.timer('load_phase_seconds', phase='insert'):
+                    self.__apply(__delta)
+        except self.__OFFLINE:
+            print('\nServer unreachable, the records in memory are shown')
+        sys.stdout.write('\r\033[K')  # Erase the progress line
+        self.__save_snapshot()
+
+    def __fetch_deltas(self, on_progress: Callable[[int, Optional[int]], None]) -> Iterator[Delta]:
+        """
+            With enabled metrics the phases are timed separately: request (until the headers of the first page),
+            decode (download and JSON decoding of every page) and construct (diff and creation of the records)
+        """
+        with self.__metrics.timer('load_phase_seconds', phase='request'):
+            __records = self.__api.fetch_records(self.__sync.request_headers)
+        if __records.status_code != 200:  # 304 Not Modified, or an error that must not wipe the current list
+            __records.close()
+            return
+        self.__sync.begin()
+        __pages = self.__api.iter_records(__records, on_progress=on_progress)
+        while True:
+            with self.__metrics.timer('load_phase_seconds', phase='decode'):
+                __rows = next(__pages, None)
+            if __rows is None:
+                break
+            with self.__metrics.timer('load_phase_seconds', phase='construct'):
+                __delta = self.__sync.feed(__rows)
+            yield __delta
+        yield self.__sync.finish(__records.headers)
+
+    def __fetch_in_background(self, rows: List[tuple], etag: Optional[str], last_modified: Optional[str]) -> List[Delta]:
+        """
+            Runs in the executor: computes the changes between the snapshot and the server, without touching the list.
+            The main thread does not use the sync state until the result is applied by __apply_reconcile.
+            If the server is unreachable the snapshot is kept, and the next polls try again from it.
+        """
+        self.__sync.seed(rows, etag, last_modified)
+        return self.__poll()
+
+    def __apply_reconcile(self, wait: bool) -> None:
+        """
+            Applies the changes found in the background (by the reconcile of the snapshot or by a poll) once they are
+            ready, or right away with wait, which is needed before using the sync state or changing the list
+        """
+        if self.__reconcile is None or not (wait or self.__reconcile.done()):
+            return
+        self.__poller.stop()
+        __future, self.__reconcile = self.__reconcile, None
+        __deltas = __future.result()
+        for __delta in __deltas:
+            self.__apply(__delta)
+            self.__new_records += len(__delta.added) - __delta.changed
+        if __deltas:  # Nothing is returned by a poll stopped while waiting
+            self.__save_snapshot()
+
+    def __start_polling(self) -> None:
+        if self.__reconcile is None and self.__api.token is not None and self.__poller.interval.is_enabled:
+            self.__reconcile = self.__poller.start(self.__executor, self.__poll)
+
+    def __poll(self) -> List[Delta]:
+        """
+            Runs in the executor, as __fetch_in_background. The deltas received before the server became
+            unreachable are kept: the sync already counts their rows as seen.
+        """
+        deltas = []
+        try:
+            for delta in self.__fetch_deltas(lambda loaded, total: None):
+                deltas.append(delta)
+        except self.__OFFLINE:
+            pass
+        return deltas
+
+    def __snapshot_changed(self) -> None:
+        """
+            Writing the snapshot costs a write of every column, so a local change only marks it as stale: it is saved
+            at the first menu redraw after __SNAPSHOT_INTERVAL seconds from the last save, or when the TUI exits.
+            Loads save it right away.
+        """
+        self.__snapshot_stale = True
+
+    def __save_snapshot(self) -> None:
+        self.__snapshot_stale = False
+        self.__next_snapshot = monotonic() + self.__SNAPSHOT_INTERVAL
+        if self.__snapshot is None:
+            return
+        try:
+            self.__snapshot.save(self.__record_list, self.__sync.etag, self.__sync.last_modified)
+        except OSError:
+            pass  # The snapshot is only a cache
+
+    def __apply(self, delta: Delta) -> None:
+        self.__record_list.remove_records(delta.removed)
+        self.__record_list.add_records(delta.added)
+        self.__evict()
 
-        # Fetch data from DB
-        __records = requests.get(self.__RECORDS_URL, headers={'Authorization': f'Token {self.__token}'})
-        __json_data = __records.json()
-        # Here we have the data
-        for i in __json_data:
-            rec = Record(Temperature(i['temperature']), Humidity(i['humidity']), Wind(i['wind']),
-                         Condition.create(i['condition']), RecordDate.parse(i['date']), id=Id(i['id']))
+    def __evict(self) -> None:
+        """
+            Keeps the list within the retention, moving the oldest readings to the archive. Evicted records stay
+            known to the sync, so they are not downloaded again while they do not change on the server.
+        """
+        evicted = self.__record_list.evict(self.__retention)
+        if evicted and self.__archive is not None:
+            try:
+                self.__archive.append(evicted)
+            except OSError:
+                pass  # Like the snapshot, the archive is only a cache: the records are still on the server
 
-            self.__record_list.add_record(rec)
+    @staticmethod
+    def __print_progress(loaded: int, total: Optional[int]) -> None:
+        sys.stdout.write(f'\rLoading records... {loaded}' + (f'/{total}' if total is not None else ''))
+        sys.stdout.flush()
 
     def __remove_from_db(self, rec: Record) -> None:
-        req = requests.delete(url=f"{self.__RECORDS_URL}{rec.id.value}/", headers={'Authorization': f'Token {self.__token}'})
-        if req.status_code == 204:
+        """
+            The record is removed from the list before the request (optimistic update) and put back if the server
+            does not delete it, so the list is never reloaded
+        """
+        if rec.id is None:
+            self.__cancel_offline_create(rec)
+            return
+        self.__apply_reconcile(wait=True)
+        removed = self.__record_list.remove_by_id(rec.id.value)
+        entry = JournalEntry.for_delete(rec.id.value)
+        self.__write_ahead([entry])
+        try:
+            req = self.__api.delete_record(rec.id.value)
+        except self.__OFFLINE:
+            self.__keep_offline([entry])
+            return
+        except requests.exceptions.RequestException:
+            self.__done([entry])
+            self.__rollback_removal(removed)
+            raise
+        self.__done([entry])
+        if req.status_code in (204, 404):  # 404: already deleted by someone else
+            self.__sync.forget(rec.id.value)
+            self.__snapshot_changed()
             print('Record removed!')
+            return
+        self.__rollback_removal(removed)
+        if req.status_code == 405:
+            print("Missing permissions to perform this action")
+
+    def __cancel_offline_create(self, rec: Record) -> None:
+        """
+            A record without id was saved while the server was unreachable: its pending create is cancelled
+        """
+        pending = self.__journal.pending() if self.__journal is not None else []
+        entry = next((entry for entry in pending if entry.operation == 'create' and entry.row == rec.db_json), None)
+        if entry is None:
+            print('The record is not saved yet, it cannot be removed')
+            return
+        self.__done([entry])
+        self.__apply_pending()  # Only the records of the entries still pending are kept
+        self.__snapshot_changed()
+        print('Record removed!')
+
+    def __remove_many(self) -> None:
+        selection = self.__select_records()
+        ids = selection.ids()
+        if not ids:
+            print('No records selected')
+            input('Press Enter to continue...')
+            return
+        confirm = self.__read__str(f'Remove {len(ids)} records? (y/n)', lambda value: value.lower() == 'y')
+        if not confirm:
+            print('Cancelled!')
+            return
+        self.__apply_reconcile(wait=True)
+        entries = [JournalEntry.for_delete(record_id) for record_id in ids]
+        self.__write_ahead(entries)
+        try:
+            results = self.__api.delete_records(ids)
+        except self.__OFFLINE:
+            self.__keep_offline(entries)
+            input('Press Enter to continue...')
+            return
+        self.__done(entries)
+        deleted = [res.record_id for res in results if res.deleted]
+        self.__record_list.remove_records(deleted)  # The list is updated once, with a single pass
+        for record_id in deleted:
+            self.__sync.forget(record_id)
+        self.__snapshot_changed()
+        print(f'{len(deleted)} of {len(ids)} records removed!')
+        for res in results:
+            if not res.deleted:
+                print(f'Record {res.record_id} not removed (status {res.status_code})')
+        if any(res.status_code == 405 for res in results):
+            print("Missing permissions to perform this action")
+        input('Press Enter to continue...')
+
+    def __select_records(self) -> RecordView:
+        def kind(value: str) -> str:
+            validate('value', value, is_in=('i', 'd', 'c', 'f'))
+            return value
+
+        selector = self.__read__str('Select by (i = index range, d = date range, c = condition, f = filter)', kind)
+        if selector == 'i':
+            def index(value: str) -> int:
+                validate('value', int(value), min_value=1, max_value=self.__record_list.records)
+                return int(value)
+
+            first = self.__read__str('From index', index)
+            last = self.__read__str('To index', lambda value: self.__index_after(first, index(value)))
+            return self.__record_list.slice(first - 1, last)
+        if selector == 'd':
+            start = self.__read__str('From (dd/mm/yyyy HH:MM)', RecordDate.create)
+            end = self.__read__str('To (dd/mm/yyyy HH:MM)', lambda value: self.__date_after(start, value))
+            return self.__record_list.between(start, end)
+        if selector == 'f':
+            return self.__record_list.filter(self.__read_filter())
+        condition = self.__read__str('Condition (1,2,3,4)', Condition.create)
+        return self.__record_list.where(lambda rec: rec.condition == condition)
+
+    @staticmethod
+    def __index_after(first: int, last: int) -> int:
+        validate('index', last, min_value=first)
+        return last
+
+    def __write_ahead(self, entries: List[JournalEntry]) -> None:
+        if self.__journal is not None:
+            self.__journal.append(entries)
+
+    def __done(self, entries: List[JournalEntry]) -> None:
+        if self.__journal is not None:
+            self.__journal.complete([entry.key for entry in entries])
+
+    def __keep_offline(self, entries: List[JournalEntry]) -> None:
+        """
+            The server is unreachable: the changes stay in the journal and are applied to the list right away
+        """
+        self.__apply_entries(entries)
+        self.__snapshot_changed()
+        self.__next_replay = monotonic() + self.__REPLAY_INTERVAL
+        print(f'Server unreachable: {len(entries)} changes kept locally, they will be sent when it is back')
+
+    def __apply_entries(self, entries: List[JournalEntry]) -> None:
+        """
+            Applies changes not yet confirmed by the server: created records are added without id
+            (they get one when the server creates them, see __replay), deleted ones are removed
+        """
+        self.__record_list.add_records(Record.from_trusted_rows([entry.row for entry in entries
+                                                                 if entry.operation == 'create']))
+        self.__record_list.remove_records(entry.record_id for entry in entries if entry.operation == 'delete')
+
+    def __apply_pending(self) -> None:
+        """
+            Applies the changes of the journal left by a previous session, e.g. closed while the server was down.
+            Records without id only come from the journal, so those of the snapshot are replaced.
+        """
+        if self.__journal is None:
+            return
+        self.__record_list.remove_records([0])
+        self.__apply_entries(self.__journal.pending())
+
+    def __replay(self) -> None:
+        """
+            Sends the changes of the journal in batches, creates first. Every request carries the idempotency key
+            of its entry, so a change sent again after a lost response is not applied twice by the server.
+            A change is done once the server applied it or refused it for good (4xx, reported); after a server
+            error (5xx) it stays pending. Stops at the first batch the server cannot be reached for, and tries
+            again later.
+        """
+        pending = self.__journal.pending() if self.__journal is not None else []
+        if not pending:
+            return
+        self.__apply_reconcile(wait=True)
+        creates = [entry for entry in pending if entry.operation == 'create']
+        deletes = [entry for entry in pending if entry.operation == 'delete']
+        sent, refused, reload = 0, [], False
+        try:
+            for first in range(0, len(creates), self.__REPLAY_BATCH):
+                batch = creates[first:first + self.__REPLAY_BATCH]
+                results = self.__api.create_records([entry.row for entry in batch], [entry.key for entry in batch])
+                outcomes = [(entry, res.status_code, res.created) for entry, res in zip(batch, results)]
+                sent += self.__complete_replayed(outcomes, refused)
+                self.__record_list.remove_records([0])  # The records without id are replaced by the created ones
+                reload = not self.__merge_created(results) or reload
+                self.__apply_entries(self.__journal.pending())
+            for first in range(0, len(deletes), self.__REPLAY_BATCH):
+                batch = deletes[first:first + self.__REPLAY_BATCH]
+                results = self.__api.delete_records([entry.record_id for entry in batch])
+                outcomes = [(entry, res.status_code, res.deleted) for entry, res in zip(batch, results)]
+                sent += self.__complete_replayed(outcomes, refused)
+                deleted = [res.record_id for res in results if res.deleted]
+                self.__record_list.remove_records(deleted)
+                for record_id in deleted:
+                    self.__sync.forget(record_id)
+                # The refused ones were removed from the list
+                reload = reload or any(entry.operation == 'delete' for entry, _ in refused)
+        except self.__OFFLINE:
+            self.__next_replay = monotonic() + self.__REPLAY_INTERVAL
+        if reload:
+            self.__record_list.dump_list()
+            self.__sync.reset()
             self.__load()
-        elif req.status_code == 405:
+            self.__apply_pending()
+        self.__snapshot_changed()
+        if sent:
+            print(f'{sent} changes made while the server was unreachable have been sent')
+        for entry, status_code in refused:
+            if entry.operation == 'create':
+                print(f'Record of {RecordDate.parse(entry.row["date"])} not saved (status {status_code})')
+            else:
+                print(f'Record {entry.record_id} not removed (status {status_code})')
+        if any(status_code == 405 for _, status_code in refused):
             print("Missing permissions to perform this action")
 
+    def __complete_replayed(self, outcomes: List[Tuple[JournalEntry, int, bool]],
+                            refused: List[Tuple[JournalEntry, int]]) -> int:
+        """
+            Completes the entries applied or refused for good by the server, adding the refused ones to refused;
+            returns the number of applied ones. The others (server errors) are tried again later.
+        """
+        applied = [entry for entry, _, ok in outcomes if ok]
+        refused.extend((entry, status_code) for entry, status_code, ok in outcomes
+                       if not ok and 400 <= status_code < 500)
+        retried = {entry.key for entry, status_code, ok in outcomes if not ok and not 400 <= status_code < 500}
+        self.__done([entry for entry, _, _ in outcomes if entry.key not in retried])
+        if retried:
+            self.__next_replay = monotonic() + self.__REPLAY_INTERVAL
+        return len(applied)
+
+    def __rollback_removal(self, removed: Optional[Record]) -> None:
+        if removed is not None:
+            self.__record_list.add_record(removed)
+
     def __run(self) -> None:
         self.__menu.run()
 
@@ -156,6 +779,17 @@ class App:
             print("Error while connecting, shutting down...")
         except:
             print('Panic error!', file=sys.stderr)
+        finally:
+            self.__poller.stop()
+            self.__executor.shutdown(cancel_futures=True)
+            if self.__snapshot_stale and self.__reconcile is None:
+                self.__save_snapshot()
+            self.__record_connection_stats()  # Before closing the pool
+            self.__api.close()
+            try:
+                self.__metrics.dump()
+            except OSError as e:
+                print(f'Unable to save the metrics: {e}', file=sys.stderr)
 
     @staticmethod
     def __read__str(prompt: str, builder: Callable) -> Any:
@@ -189,7 +823,12 @@ class App:
 
 def main(name: str):
     if name == '__main__':
-        App().run()
+        try:
+            app = App()
+        except ValueError as e:  # A wrong setting in the environment
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        app.run()
 
 
 main(__name__)
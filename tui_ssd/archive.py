@@ -0,0 +1,85 @@
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from typeguard import typechecked
+
+from tui_ssd.snapshot import default_cache_dir
+
+
+@typechecked
+class RecordArchive:
+    """
+        Records evicted from memory by the retention (see RecordList.evict), appended to a file next to the snapshot,
+        so that they can be shown again on demand without keeping them in memory and without downloading them.
+
+        Layout (little endian): header with magic, format version and user, then one fixed size row per record
+        (id, temperature, humidity, wind, condition, date as epoch minutes). A record evicted again (e.g. after
+        a restart) is appended again: the last copy wins. A file of another user or version is started again.
+    """
+    MAGIC = b'TSSA'
+    VERSION = 1
+    __HEADER = struct.Struct('<4sHH')
+    __ROW = struct.Struct('<LbbHbq')
+    __ROWS_PER_READ = 4096
+
+    def __init__(self, username: str, directory: Optional[Path] = None):
+        self.__username = username.encode('utf-8')
+        self.__path = (directory or default_cache_dir()) / 'records.archive'
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    def __header(self) -> bytes:
+        return self.__HEADER.pack(self.MAGIC, self.VERSION, len(self.__username)) + self.__username
+
+    def __is_valid(self) -> bool:
+        header = self.__header()
+        try:
+            with open(self.__path, 'rb') as file:
+                return file.read(len(header)) == header
+        except OSError:
+            return False
+
+    def append(self, rows: Iterable[tuple]) -> None:
+        data = b''.join(self.__ROW.pack(*row) for row in rows)
+        if not data:
+            return
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.__is_valid():
+            self.__path.write_bytes(self.__header())
+        with open(self.__path, 'ab') as file:
+            file.write(data)
+
+    def rows(self) -> Iterator[tuple]:
+        """
+            Reads the archived rows in the order they were evicted, a block at a time: memory does not depend
+            on the size of the archive. A row left incomplete by an interrupted write is ignored.
+        """
+        if not self.__is_valid():
+            return
+        with open(self.__path, 'rb') as file:
+            file.seek(len(self.__header()))
+            while True:
+                data = file.read(self.__ROW.size * self.__ROWS_PER_READ)
+                yield from self.__ROW.iter_unpack(data[:len(data) - len(data) % self.__ROW.size])
+                if len(data) < self.__ROW.size * self.__ROWS_PER_READ:
+                    return
+
+    def between(self, first: int, last: int) -> List[tuple]:
+        """
+            Archived rows dated from first to last minute (both included), one per record
+        """
+        by_id: Dict[int, tuple] = {}
+        without_id = []
+        for row in self.rows():
+            if first <= row[5] <= last:
+                if row[0]:
+                    by_id[row[0]] = row
+                else:
+                    without_id.append(row)
+        return list(by_id.values()) + without_id
+
+    def clear(self) -> None:
+        self.__path.unlink(missing_ok=True)
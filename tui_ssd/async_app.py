@@ -0,0 +1,230 @@
+import asyncio
+import getpass
+import sys
+from typing import Coroutine, Set, Tuple
+
+import requests
+from valid8 import ValidationError
+
+from tui_ssd.menu import *
+from tui_ssd.domain import *
+from tui_ssd.api import AsyncApiClient, CreateResult
+from tui_ssd.app import collect_from_sensors, parse_period
+from tui_ssd.render import print_records
+from tui_ssd.sync import Delta, RecordSync
+
+
+class AsyncApp:
+    """
+        Variant of App running on an asyncio event loop: saves, deletes and reloads are scheduled as tasks
+        and the menu is shown again right away, with the number of operations still in progress.
+        The list and the sync state are only touched by the event loop thread; reloads and merges are serialized
+        by a lock, so a reload never sees a record half merged.
+    """
+
+    def __init__(self, api: Optional[AsyncApiClient] = None):
+        self.__menu = Menu.Builder(Description('Your Secure Weather TUI'), auto_select=lambda: self.__print_records(),
+                                   status=lambda: self.__status()) \
+            .with_entry(Entry.create('1', 'Add new record', on_selected=lambda: self.__add_record())) \
+            .with_entry(Entry.create('2', 'Remove record', on_selected=lambda: self.__remove_record())) \
+            .with_entry(Entry.create('3', 'Collect records from sensors', on_selected=lambda: self.__generate_records())) \
+            .with_entry(Entry.create('4', 'Sort by temperature', on_selected=lambda: self.__record_list.sort_by_temperature())) \
+            .with_entry(Entry.create('5', 'Sort by humidity', on_selected=lambda: self.__record_list.sort_by_humidity())) \
+            .with_entry(Entry.create('6', 'Sort by wind', on_selected=lambda: self.__record_list.sort_by_wind())) \
+            .with_entry(Entry.create('7', 'Sort by ascending date', on_selected=lambda: self.__record_list.sort_by_ascending_date())) \
+            .with_entry(Entry.create('8', 'Update records list', on_selected=lambda: self.__spawn(self.__load()))) \
+            .with_entry(Entry.create('0', 'Exit', on_selected=lambda: self.__logout(), is_exit=True)) \
+            .build()
+        self.__record_list = RecordList()
+        self.__api = api if api is not None else AsyncApiClient()
+        self.__sync = RecordSync()
+        self.__tasks: Set[asyncio.Task] = set()
+        self.__messages: List[str] = []
+        self.__loaded: Optional[int] = None  # Records received by the reload in progress, if any
+        self.__lock: Optional[asyncio.Lock] = None  # Created in the event loop
+
+    @property
+    def record_list(self) -> RecordList:
+        return self.__record_list
+
+    def __status(self) -> str:
+        lines, self.__messages = self.__messages, []
+        if self.__tasks:
+            line = f'{len(self.__tasks)} operations in progress ({self.__api.in_flight} requests)'
+            if self.__loaded is not None:
+                line += f', {self.__loaded} records loaded'
+            lines.append(line + '...')
+        return '\n'.join(lines)
+
+    def __print_records(self) -> None:
+        print_records(self.__record_list)
+
+    def __spawn(self, coroutine: Coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__task_done)
+
+    def __task_done(self, task: asyncio.Task) -> None:
+        self.__tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if isinstance(error, requests.exceptions.ConnectionError):
+            self.__messages.append('Error while connecting, operation not completed')
+        elif error is not None:
+            self.__messages.append(f'Operation failed: {error}')
+
+    async def __connect(self) -> None:
+        print("Hello user, please enter your credentials below.")
+        while self.__api.client.token is None:
+            username = await asyncio.to_thread(input, "Username: ")
+            password = await asyncio.to_thread(getpass.getpass, "Password: ")
+
+            user = Username(username)
+            passw = Password(password)
+
+            req = await self.__api.login(user.value, passw.value)
+            if req.status_code != 200:
+                print('Unable to login, please check your credentials...')
+            else:
+                self.__api.client.token = req.json().get('key')
+
+    async def __logout(self) -> None:
+        if self.__tasks:
+            print(f'Waiting for {len(self.__tasks)} operations in progress...')
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+        await self.__api.logout()
+        self.__sync.reset()
+        for message in self.__messages:
+            print(message)
+        print("Cya!")
+
+    async def __add_record(self) -> None:
+        record = Record(*await self.__read_record())
+        self.__spawn(self.__save_all([record]))
+
+    async def __remove_record(self) -> None:
+        def builder(value: str) -> int:
+            validate('value', int(value), min_value=0, max_value=self.__record_list.records)
+            return int(value)
+
+        index = await self.__read__str('Index (0 to cancel)', builder)
+        if index == 0:
+            print('Cancelled!')
+            return
+        self.__spawn(self.__remove_from_db(self.__record_list.record(index - 1)))
+
+    async def __generate_records(self) -> None:
+        hours = await self.__read__str('Hours to collect (e.g. 24, or 7d for days)', parse_period)
+        self.__spawn(self.__save_all(collect_from_sensors(hours)))
+
+    async def __save_all(self, records: List[Record]) -> None:
+        """
+            Uploads the records (at most max_concurrency requests at a time) and merges the created ones
+        """
+        results = await self.__api.create_records([rec.db_json for rec in records])
+        created = [res for res in results if res.created]
+        if not await self.__merge(created):
+            await self.__load()
+        self.__messages.append('Record saved!' if len(records) == 1 and created
+                               else f'{len(created)} of {len(records)} records saved!')
+        if any(res.status_code == 405 for res in results):
+            self.__messages.append("Missing permissions to perform this action")
+
+    async def __merge(self, created: List[CreateResult]) -> bool:
+        async with self.__get_lock():
+            for res in created:
+                try:
+                    self.__record_list.add_record(Record.parse(res.body))
+                    self.__sync.track(res.body)
+                except (KeyError, TypeError, ValueError):
+                    return False
+        return True
+
+    async def __remove_from_db(self, rec: Record) -> None:
+        req = await self.__api.delete_record(rec.id.value)
+        if req.status_code == 204:
+            async with self.__get_lock():
+                self.__record_list.remove_records([rec.id.value])
+                self.__sync.forget(rec.id.value)
+            self.__messages.append('Record removed!')
+        elif req.status_code == 405:
+            self.__messages.append("Missing permissions to perform this action")
+
+    async def __load(self) -> None:
+        """
+            Same synchronization of App: the pages are downloaded in worker threads and applied as they arrive
+        """
+        async with self.__get_lock():
+            __records = await self.__api.fetch_records(self.__sync.request_headers)
+            if __records.status_code != 200:
+                __records.close()
+                return
+            self.__loaded = 0
+            try:
+                self.__sync.begin()
+                async for __rows in self.__api.iter_records(__records):
+                    self.__apply(self.__sync.feed(__rows))
+                    self.__loaded += len(__rows)
+                self.__apply(self.__sync.finish(__records.headers))
+            finally:
+                self.__loaded = None
+
+    def __apply(self, delta: Delta) -> None:
+        self.__record_list.remove_records(delta.removed)
+        self.__record_list.add_records(delta.added)
+
+    def __get_lock(self) -> asyncio.Lock:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    async def __run(self) -> None:
+        await self.__connect()
+        self.__spawn(self.__load())
+        await self.__menu.run_async()
+
+    # noinspection PyBroadException
+    def run(self) -> None:
+        try:
+            asyncio.run(self.__run())
+        except requests.exceptions.ConnectionError:
+            print("Error while connecting, shutting down...")
+        except:
+            print('Panic error!', file=sys.stderr)
+        finally:
+            self.__api.close()
+
+    @staticmethod
+    async def __read__str(prompt: str, builder: Callable) -> Any:
+        while True:
+            try:
+                line = await asyncio.to_thread(input, f'{prompt}: ')
+                return builder(line.strip())
+            except (TypeError, ValueError, ValidationError) as e:
+                print(e)
+
+    @staticmethod
+    async def __read_integer(prompt: str, builder: Callable) -> Any:
+        while True:
+            try:
+                line = await asyncio.to_thread(input, f'{prompt}: ')
+                return builder(int(line.strip()))
+            except (TypeError, ValueError, ValidationError) as e:
+                print(e)
+
+    async def __read_record(self) -> Tuple[Temperature, Humidity, Wind, Condition, RecordDate]:
+        temperature = await self.__read_integer('Temperature (-50, +50)', Temperature)
+        humidity = await self.__read_integer('Humidity (0, 100)', Humidity)
+        wind = await self.__read_integer('Wind (0, 200)', Wind)
+        condition = await self.__read__str('Condition (1,2,3,4)', Condition.create)
+        date = await self.__read__str('Date (dd/mm/yyyy HH:MM)', RecordDate.create)
+        return temperature, humidity, wind, condition, date
+
+
+def main(name: str):
+    if name == '__main__':
+        AsyncApp().run()
+
+
+main(__name__)
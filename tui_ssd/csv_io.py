@@ -0,0 +1,198 @@
+import csv
+import json
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+from tui_ssd.api import ApiClient, CreateResult
+from tui_ssd.domain import Record, RecordList, from_epoch_minutes
+
+FIELDS = ('id', 'temperature', 'humidity', 'wind', 'condition', 'date')
+_REQUIRED = FIELDS[1:]  # The id of an imported record is assigned by the server
+
+
+@typechecked
+@dataclass(frozen=True)
+class CsvChunk:
+    records: List[Record]
+    lines: List[int]  # Line of every record
+    errors: List[Tuple[int, str]]  # Line and reason of the invalid rows, which are skipped
+    rows: int  # Data rows read from the start of the file, up to the end of this chunk
+
+
+@typechecked
+@dataclass(frozen=True)
+class ImportResult:
+    saved: int = 0
+    refused: int = 0  # Rows not created by the server, e.g. for missing permissions
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    resumed_from: int = 0  # Data rows already imported by a previous, interrupted run
+    status_codes: List[int] = field(default_factory=list)  # Distinct status codes of the refused rows
+
+
+def _to_db_row(row: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """
+        Converts a row of the file (date as dd/mm/yyyy HH:MM, like the input of RecordDate.create) to the format
+        of the database rows accepted by Record.from_trusted_rows
+    """
+    date, time = row['date'].strip().split(' ')
+    day, month, year = date.split('/')
+    hour, minute = time.split(':')
+    return {'temperature': int(row['temperature']), 'humidity': int(row['humidity']), 'wind': int(row['wind']),
+            'condition': row['condition'].strip(),
+            'date': f'{int(year):04}-{int(month):02}-{int(day):02}T{int(hour):02}:{int(minute):02}'}
+
+
+def _validate_chunk(rows: List[Tuple[int, Dict[str, Any]]], errors: List[Tuple[int, str]], read: int) -> CsvChunk:
+    """
+        Validates the rows of a chunk all at once; only if the chunk is not valid every row is validated on its own,
+        to tell which ones are wrong
+    """
+    try:
+        return CsvChunk(Record.from_trusted_rows([row for _, row in rows]), [line for line, _ in rows], errors, read)
+    except (TypeError, ValueError):
+        pass
+    records, lines = [], []
+    for line, row in rows:
+        try:
+            records.extend(Record.from_trusted_rows([row]))
+            lines.append(line)
+        except (TypeError, ValueError) as e:
+            errors.append((line, str(e)))
+    return CsvChunk(records, lines, sorted(errors), read)
+
+
+def read_chunks(lines: Iterable[str], chunk_size: int = 500, skip: int = 0) -> Iterator[CsvChunk]:
+    """
+        Reads the records of a CSV file with a header (see FIELDS, the id column is optional and ignored)
+        in chunks of at most chunk_size rows, keeping in memory only one chunk at a time.
+        The first skip data rows are read but not validated, to resume an import.
+    """
+    validate('chunk_size', chunk_size, min_value=1)
+    reader = csv.DictReader(lines)
+    missing = [name for name in _REQUIRED if name not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+    rows, errors, read = [], [], 0
+    for row in reader:
+        read += 1
+        if read <= skip:
+            continue
+        try:
+            rows.append((reader.line_num, _to_db_row(row)))
+        except (AttributeError, TypeError, ValueError) as e:  # A missing value is None
+            errors.append((reader.line_num, str(e)))
+        if len(rows) + len(errors) == chunk_size:
+            yield _validate_chunk(rows, errors, read)
+            rows, errors = [], []
+    if rows or errors:
+        yield _validate_chunk(rows, errors, read)
+
+
+@typechecked
+class ImportProgress:
+    """
+        Number of data rows of a file already uploaded, saved next to it (file.csv.progress) after every batch.
+        The progress of a file that changed since (size or modification time) is ignored.
+    """
+    __KEYS = uuid.UUID('5b0c9a4e-6f3d-4d8e-9a1c-2f7e8d3b6c10')  # Namespace of the idempotency keys
+
+    def __init__(self, path: Path):
+        self.__path = path
+        self.__progress_path = path.with_name(path.name + '.progress')
+
+    @property
+    def path(self) -> Path:
+        return self.__progress_path
+
+    def __signature(self) -> Dict[str, int]:
+        stat = self.__path.stat()
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def load(self) -> int:
+        try:
+            data = json.loads(self.__progress_path.read_text())
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(data, dict) or data.get('file') != self.__signature() or type(data.get('rows')) is not int:
+            return 0
+        return data['rows']
+
+    def save(self, rows: int) -> None:
+        tmp_path = self.__progress_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'file': self.__signature(), 'rows': rows}))
+        tmp_path.replace(self.__progress_path)
+
+    def clear(self) -> None:
+        self.__progress_path.unlink(missing_ok=True)
+
+    def idempotency_keys(self, lines: List[int]) -> List[str]:
+        """
+            One key per line of the file, the same in every run while the file does not change: rows sent again
+            when an interrupted import is resumed are not created twice
+        """
+        signature = self.__signature()
+        prefix = f'{self.__path.resolve()}:{signature["size"]}:{signature["mtime_ns"]}'
+        return [str(uuid.uuid5(self.__KEYS, f'{prefix}:{line}')) for line in lines]
+
+
+def import_csv(api: ApiClient, path: Path, chunk_size: int = 500,
+               on_batch: Callable[[List[CreateResult], int], None] = lambda results, rows: None) -> ImportResult:
+    """
+        Uploads the records of a CSV file batch by batch: every chunk is sent concurrently by
+        ApiClient.create_records while the next one is read and validated.
+        After every batch the progress is saved, so an interrupted import (e.g. a connection error)
+        starts again from the first batch not completed; the progress is removed when the import ends.
+        Every row is sent with an idempotency key derived from the file and its line, so the rows of a batch
+        created before the interruption are not created again.
+        on_batch receives the results of every batch and the data rows read so far.
+    """
+    progress = ImportProgress(path)
+    skip = progress.load()
+    saved, refused, errors, status_codes = 0, 0, [], set()
+
+    def finish(pending: Tuple[Future, CsvChunk]) -> None:
+        nonlocal saved, refused
+        future, chunk = pending
+        results = future.result()
+        saved += sum(1 for res in results if res.created)
+        refused += sum(1 for res in results if not res.created)
+        status_codes.update(res.status_code for res in results if not res.created)
+        errors.extend(chunk.errors)
+        progress.save(chunk.rows)
+        on_batch(results, chunk.rows)
+
+    with open(path, newline='', encoding='utf-8') as file, ThreadPoolExecutor(max_workers=1) as uploader:
+        pending: Optional[Tuple[Future, CsvChunk]] = None
+        for chunk in read_chunks(file, chunk_size, skip):  # The next chunk is validated while the previous uploads
+            if pending is not None:
+                finish(pending)
+            keys = progress.idempotency_keys(chunk.lines)
+            pending = uploader.submit(api.create_records, [rec.db_json for rec in chunk.records], keys), chunk
+        if pending is not None:
+            finish(pending)
+    progress.clear()
+    return ImportResult(saved, refused, errors, skip, sorted(status_codes))
+
+
+def _format_row(row: tuple) -> tuple:
+    record_id, temperature, humidity, wind, condition, date = row
+    return (record_id or '', temperature, humidity, wind, condition,
+            from_epoch_minutes(date).strftime('%d/%m/%Y %H:%M'))
+
+
+def export_csv(record_list: RecordList, file: TextIO) -> int:
+    """
+        Writes the records in insertion order, row by row from the columns of the list, without building
+        Record objects or lists: memory does not depend on the number of records.
+        The file can be imported again by import_csv.
+    """
+    writer = csv.writer(file)
+    writer.writerow(FIELDS)
+    writer.writerows(map(_format_row, record_list.rows()))
+    return record_list.records
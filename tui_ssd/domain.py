@@ -1,11 +1,124 @@
+from abc import ABC, abstractmethod
+from array import array
+import heapq
+import os
+from bisect import bisect_left, bisect_right, insort_right
 from dataclasses import dataclass, InitVar, field
-from typing import Any, List, Optional
-from valid8 import validate
+from functools import lru_cache
+from itertools import compress, islice
+from math import ceil, sqrt
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+from valid8 import ValidationError, validate
 from typeguard import typechecked
 from validation.regex import pattern
 import re
 from types import MappingProxyType
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+def _trusted(cls: type, **values: Any) -> Any:
+    """
+        Builds an instance of a frozen dataclass without calling its __init__, so without typeguard and valid8.
+        Only for values already validated in bulk, e.g. by Record.from_trusted_rows.
+    """
+    instance = object.__new__(cls)
+    for name, value in values.items():
+        object.__setattr__(instance, name, value)
+    return instance
+
+
+def environ_setting(name: str, parse: Callable[[str], Any]) -> Any:
+    """
+        Value of the environment variable TUI_SSD_<name> read by parse, None if unset or empty.
+        Raises ValueError naming the variable if parse refuses the value.
+    """
+    value = os.environ.get(f'TUI_SSD_{name}')
+    if not value:
+        return None
+    try:
+        return parse(value.strip())
+    except (ValueError, ValidationError) as e:
+        raise ValueError(f'Invalid TUI_SSD_{name}={value!r}: {e}') from None
+
+
+def _positive_integer(value: str) -> int:
+    validate('value', int(value), min_value=1)
+    return int(value)
+
+
+def _hours_or_days(value: str) -> timedelta:
+    match = re.fullmatch(r'(\d+)([hd]?)', value)
+    if match is None:
+        raise ValueError('expected a number of hours or days, e.g. 36h or 30d')
+    hours = int(match.group(1)) * (24 if match.group(2) == 'd' else 1)
+    validate('hours', hours, min_value=1)
+    return timedelta(hours=hours)
+
+
+def _validate_column(name: str, values: List[Any], min_value: Any, max_value: Any, instance_of: type) -> None:
+    """
+        Validates a whole column with a single type check and a single range check
+    """
+    if not values:
+        return
+    validate(f'{name}.types', set(map(type, values)), equals={instance_of})
+    validate(f'{name}.min', min(values), min_value=min_value)
+    validate(f'{name}.max', max(values), max_value=max_value)
+
+
+@lru_cache(maxsize=8192)
+def _parse_db_datetime(value: str) -> datetime:
+    """
+        The date in the database is in ISO-8601 format, e.g. 2023-12-08T12:20:00+01:00, 2023-12-08T12:20:00-05:00
+        or 2023-12-08T12:20:00Z. The offset is accepted but dropped: dates are shown as the wall-clock time of the
+        station, as sent by the server.
+        Hourly readings repeat the same timestamps, so the results are memoized.
+    """
+    if value[-1:] in ('Z', 'z'):  # Not accepted by fromisoformat before Python 3.11
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value).replace(tzinfo=None)
+
+
+EPOCH = datetime(1970, 1, 1)  # Origin of the epoch minutes of RecordDate and of the dates of RecordList
+_ONE_MINUTE = timedelta(minutes=1)
+
+
+def from_epoch_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
+
+
+def to_epoch_minutes(moment: datetime) -> int:
+    return (moment - EPOCH) // _ONE_MINUTE
+
+
+@lru_cache(maxsize=65536)
+def _month_of_day(day: int) -> int:
+    """
+        Month (as year * 12 + month - 1) of a day counted from 01/01/1970, for the monthly rollups
+    """
+    date = from_epoch_minutes(day * 1440)
+    return date.year * 12 + date.month - 1
+
+
+class _Interned(type):
+    """
+        Metaclass for the value objects with a small domain (e.g. the 101 valid temperatures).
+        A value is validated only the first time it is built, afterwards the same immutable instance is returned,
+        so building the fields of a record costs a dictionary lookup.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls.__instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        value = args[0] if args else kwargs.get('value')
+        if type(value) is not int:  # Invalid values (and bools, equal to 0 and 1) are never interned
+            return super().__call__(*args, **kwargs)
+        instance = cls.__instances.get(value)
+        if instance is None:
+            instance = cls.__instances[value] = super().__call__(*args, **kwargs)
+        return instance
 
 
 @typechecked
@@ -19,7 +132,7 @@ class Id:
 
 @typechecked
 @dataclass(frozen=True, order=True)
-class Temperature:
+class Temperature(metaclass=_Interned):
     value: int
 
     def __post_init__(self):
@@ -31,7 +144,7 @@ class Temperature:
 
 @typechecked
 @dataclass(frozen=True, order=True)
-class Humidity:
+class Humidity(metaclass=_Interned):
     value: int
 
     def __post_init__(self):
@@ -43,7 +156,7 @@ class Humidity:
 
 @typechecked
 @dataclass(frozen=True, order=True)
-class Wind:
+class Wind(metaclass=_Interned):
     value: int
 
     def __post_init__(self):
@@ -63,6 +176,8 @@ class Condition:
     __condition_value: int
     create_key: InitVar[Any] = field(default="it must be the __create_key")
     __create_key = object()
+    __VALUES = MappingProxyType({1: 'SUNNY', 2: 'CLOUDY', 3: 'RAINY', 4: 'FLURRY'})
+    __instances = {}  # Only four conditions exist: create() returns always the same instance for the same value
 
     def __post_init__(self, create_key):
         validate('condition_value', self.__condition_value, min_value=1, max_value=4, instance_of=int)
@@ -75,14 +190,14 @@ class Condition:
             It allows us to have an immutable copy of the mapped object (such as a dictionary)
             not allowing any direct modification of the view
         """
-        return MappingProxyType({1: 'SUNNY', 2: 'CLOUDY', 3: 'RAINY', 4: 'FLURRY'})
+        return self.__VALUES
 
     def __str__(self):
-        return self.values_dictionary[self.__condition_value]
+        return self.__VALUES[self.__condition_value]
 
     @property
     def value(self) -> str:
-        return self.values_dictionary[self.__condition_value]
+        return self.__VALUES[self.__condition_value]
 
     @property
     def enum_value(self) -> str:
@@ -90,10 +205,13 @@ class Condition:
 
     @staticmethod
     def create(value: str) -> 'Condition':
-        validate('value', value, min_len=1, max_len=1, instance_of=str, custom=pattern(r'[0-4]{1}'))
-        integer_value = int(value)
-        validate('integer_value', integer_value, min_value=1, max_value=4, instance_of=int)
-        return Condition(integer_value, Condition.__create_key)
+        instance = Condition.__instances.get(value)
+        if instance is None:
+            validate('value', value, min_len=1, max_len=1, instance_of=str, custom=pattern(r'[0-4]{1}'))
+            integer_value = int(value)
+            validate('integer_value', integer_value, min_value=1, max_value=4, instance_of=int)
+            instance = Condition.__instances[value] = Condition(integer_value, Condition.__create_key)
+        return instance
 
 
 @typechecked
@@ -140,6 +258,20 @@ class RecordDate:
     def minute(self) -> int:
         return self.__date_value.minute
 
+    @property
+    def epoch_minutes(self) -> int:
+        """
+            Minutes elapsed since 01/01/1970 00:00, used as a compact integer representation of the date
+        """
+        return to_epoch_minutes(self.__date_value)
+
+    @staticmethod
+    def from_epoch_minutes(value: int) -> 'RecordDate':
+        return RecordDate(from_epoch_minutes(value), RecordDate.__create_key)
+
+    def strftime(self, fmt: str) -> str:
+        return self.__date_value.strftime(fmt)
+
     @staticmethod
     def create(value: str) -> 'RecordDate':
         """
@@ -155,11 +287,19 @@ class RecordDate:
 
     @staticmethod
     def parse(value: str) -> 'RecordDate':
-        # The date in the database is in the format 2023-12-08T12:20:00+01:00
-
-        __create_date = datetime.strptime(value.split('+')[0], '%Y-%m-%dT%H:%M:%S')
+        __create_date = _parse_db_datetime(value)
         return RecordDate(__create_date, RecordDate.__create_key)
 
+    @staticmethod
+    def parse_trusted(values: List[str]) -> List['RecordDate']:
+        """
+            Parses many dates coming from the database, checking the range of all of them at once
+        """
+        distinct = {value: _parse_db_datetime(value) for value in set(values)}
+        _validate_column('date', list(distinct.values()), RecordDate.__MIN_DATA, RecordDate.__MAX_DATA, datetime)
+        record_dates = {value: _trusted(RecordDate, _RecordDate__date_value=date) for value, date in distinct.items()}
+        return [record_dates[value] for value in values]
+
 
 @typechecked
 @dataclass(frozen=True, order=True)
@@ -171,37 +311,809 @@ class Record:
     record_date: RecordDate
     id: Optional[Id] = None
 
+    @property
+    def db_json(self) -> Dict[str, Any]:
+        return {'condition': self.condition.enum_value, 'humidity': self.humidity.value,
+                'temperature': self.temperature.value, 'wind': self.wind.value, 'date': self.record_date.db_date}
+
+    @staticmethod
+    def parse(value: Dict[str, Any]) -> 'Record':
+        # A record as returned by the database, e.g. {"id": 44, "condition": "1", "humidity": 60, ...}
+        return Record(Temperature(value['temperature']), Humidity(value['humidity']), Wind(value['wind']),
+                      Condition.create(value['condition']), RecordDate.parse(value['date']), id=Id(value['id']))
+
+    @staticmethod
+    def from_trusted_rows(rows: List[Dict[str, Any]]) -> List['Record']:
+        """
+            Fast path of parse() for the batches of rows sent by the database.
+            Every column is validated at once (one type check and one range check), then the records are built
+            without running typeguard and valid8 on each object. User input must still go through the constructors.
+            Rows without an "id" (e.g. not yet saved) give records without id.
+        """
+        ids = [row.get('id') for row in rows]
+        temperatures = [row['temperature'] for row in rows]
+        humidities = [row['humidity'] for row in rows]
+        winds = [row['wind'] for row in rows]
+        _validate_column('id', [record_id for record_id in ids if record_id is not None], 1, 99999, int)
+        _validate_column('temperature', temperatures, -50, 50, int)
+        _validate_column('humidity', humidities, 0, 100, int)
+        _validate_column('wind', winds, 0, 200, int)
+        conditions = {value: Condition.create(value) for value in {row['condition'] for row in rows}}
+        dates = RecordDate.parse_trusted([row['date'] for row in rows])
+        return [_trusted(Record, temperature=Temperature(temperature), humidity=Humidity(humidity), wind=Wind(wind),
+                         condition=conditions[row['condition']], record_date=record_date,
+                         id=_trusted(Id, value=record_id) if record_id is not None else None)
+                for row, record_id, temperature, humidity, wind, record_date
+                in zip(rows, ids, temperatures, humidities, winds, dates)]
+
+
+@typechecked
+@dataclass(frozen=True)
+class Statistics:
+    count: int
+    minimum: int
+    maximum: int
+    mean: float
+    stddev: float  # Of the population
+    percentiles: Dict[int, int]  # Nearest rank, e.g. {50: median, 95: 95th percentile}
+
+
+@typechecked
+@dataclass(frozen=True)
+class Summary:
+    minimum: int
+    maximum: int
+    mean: float
+
+
+@typechecked
+@dataclass(frozen=True)
+class Rollup:
+    start: RecordDate  # First minute of the hour, day or month
+    count: int
+    temperature: Summary
+    humidity: Summary
+    wind: Summary
+    condition: Condition  # The most frequent one, the lowest value on ties
+
+
+@typechecked
+@dataclass(frozen=True)
+class Retention:
+    """
+        Limits of the records kept in memory, see RecordList.evict: at most max_records records, none older than
+        max_age before the most recent reading, at most max_bytes used by the list. None means no limit.
+    """
+    max_records: Optional[int] = None
+    max_age: Optional[timedelta] = None
+    max_bytes: Optional[int] = None
+
+    def __post_init__(self):
+        validate('max_records', self.max_records, enforce_not_none=False, min_value=1)
+        validate('max_age', self.max_age, enforce_not_none=False, min_value=timedelta(minutes=1))
+        validate('max_bytes', self.max_bytes, enforce_not_none=False, min_value=1)
+
+    @property
+    def is_bounded(self) -> bool:
+        return self.max_records is not None or self.max_age is not None or self.max_bytes is not None
+
+    @staticmethod
+    def from_environ() -> 'Retention':
+        """
+            TUI_SSD_MAX_RECORDS (a number), TUI_SSD_MAX_AGE (hours or days, e.g. 36h or 30d)
+            and TUI_SSD_MAX_BYTES (a number); unset variables are no limit
+        """
+        return Retention(environ_setting('MAX_RECORDS', _positive_integer), environ_setting('MAX_AGE', _hours_or_days),
+                         environ_setting('MAX_BYTES', _positive_integer))
+
+
+def _summarize(counts: array, low: int, percentiles: Sequence[int]) -> Statistics:
+    """
+        Statistics of the values counted in counts, where counts[i] is the number of occurrences of low + i
+    """
+    present = [(low + offset, count) for offset, count in enumerate(counts) if count]
+    total = sum(count for _, count in present)
+    mean = sum(value * count for value, count in present) / total
+    variance = sum(count * (value - mean) ** 2 for value, count in present) / total
+    ranks, res, seen = sorted((max(1, ceil(q * total / 100)), q) for q in percentiles), {}, 0
+    values = iter(present)
+    value, count = next(values)
+    for rank, q in ranks:
+        while seen + count < rank:
+            seen += count
+            value, count = next(values)
+        res[q] = value
+    return Statistics(total, present[0][0], present[-1][0], mean, sqrt(variance), res)
+
+
+class _RowSlice(Sequence):
+    """
+        Rows lo to hi (excluded) of a permutation, without copying them
+    """
+
+    def __init__(self, rows: array, lo: int, hi: int):
+        self.__rows, self.__lo, self.__hi = rows, lo, hi
+
+    def __len__(self) -> int:
+        return self.__hi - self.__lo
+
+    def __getitem__(self, index: int) -> int:
+        return self.__rows[self.__lo + index]
+
+    def __iter__(self) -> Iterator[int]:
+        return islice(self.__rows, self.__lo, self.__hi)
+
+
+class RowFilter(ABC):
+    """
+        Condition on the raw values of a row (see RecordList.rows), built by tui_ssd.filters.parse_filter
+    """
+
+    @abstractmethod
+    def predicate(self, columns: Mapping[str, Sequence[int]]) -> Callable[[int], bool]:
+        """
+            Function of the row position reading the column arrays, named as in RecordList.COLUMN_NAMES
+        """
+
+    def ranges(self) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """
+            Inclusive ranges (column, low, high) that every matching row must satisfy (None is unbounded),
+            so each one can be looked up in a sorted index instead of scanning the list
+        """
+        return []
+
+
+@typechecked
+class RecordView:
+    """
+        Read-only, lazy selection of the records of a RecordList, e.g. the result of RecordList.between.
+        The selected rows are computed on the first access and again only after the list changes,
+        so a view always reflects the current content of the list. Records are built one at a time by record().
+    """
+
+    def __init__(self, record_list: 'RecordList', resolve: Callable[[], Sequence[int]]):
+        self.__record_list = record_list
+        self.__resolve = resolve
+        self.__version = -1
+        self.__rows: Sequence[int] = ()
+
+    def __current_rows(self) -> Sequence[int]:
+        if self.__version != self.__record_list._version:
+            self.__rows = self.__resolve()
+            self.__version = self.__record_list._version
+        return self.__rows
+
+    @property
+    def records(self) -> int:
+        return len(self.__current_rows())
+
+    def __len__(self) -> int:
+        return self.records
+
+    def record(self, index: int) -> 'Record':
+        rows = self.__current_rows()
+        validate("record_index", index, min_value=0, max_value=len(rows) - 1)
+        return self.__record_list._record_at(rows[index])
+
+    def row(self, index: int) -> tuple:  # Raw values of a record, see RecordList.row
+        rows = self.__current_rows()
+        validate("record_index", index, min_value=0, max_value=len(rows) - 1)
+        return self.__record_list._row_at(rows[index])
+
+    def __iter__(self) -> Iterator['Record']:
+        record_at = self.__record_list._record_at
+        return (record_at(row) for row in self.__current_rows())
+
+    def ids(self) -> List[int]:  # Ids of the selected records that have one
+        return [rec.id.value for rec in self if rec.id is not None]
+
 
 @typechecked
 @dataclass(frozen=True)
 class RecordList:
-    __records: List[Record] = field(default_factory=list, init=False)
+    """
+        Records stored column by column, in compact arrays (one slot per record): a reading costs a handful of bytes
+        and Record instances are built only when read. A record without id is stored with id 0, never a valid Id.
+        Orderings, statistics and rollups are cached and kept up to date when records are added or removed.
+    """
+    __ids: array = field(default_factory=lambda: array('L'), init=False, repr=False)
+    __temperatures: array = field(default_factory=lambda: array('b'), init=False, repr=False)
+    __humidities: array = field(default_factory=lambda: array('b'), init=False, repr=False)
+    __winds: array = field(default_factory=lambda: array('H'), init=False, repr=False)
+    __conditions: array = field(default_factory=lambda: array('b'), init=False, repr=False)
+    __dates: array = field(default_factory=lambda: array('l'), init=False, repr=False)
+    __permutations: Dict[str, array] = field(default_factory=dict, init=False, repr=False)
+    __sort_key: List[str] = field(default_factory=list, init=False, repr=False)  # Empty means insertion order
+    __histograms: Dict[Tuple[str, str], Dict[int, array]] = field(default_factory=dict, init=False, repr=False)
+    __versions: List[int] = field(default_factory=lambda: [0], init=False, repr=False)  # Changed on every update
+    __index: Dict[int, int] = field(default_factory=dict, init=False, repr=False)  # Id -> row
+    __removed: Set[int] = field(default_factory=set, init=False, repr=False)  # Rows removed, not yet compacted
+    __skipped: List[Any] = field(default_factory=lambda: [None, []], init=False, repr=False)  # See __tombstones
+    __rollups: Dict[str, Dict[int, array]] = field(default_factory=dict, init=False, repr=False)
+    COLUMN_NAMES = ('id', 'temperature', 'humidity', 'wind', 'condition', 'date')
+    MEASURES = ('temperature', 'humidity', 'wind')
+    GROUPINGS = ('condition', 'day', 'hour')
+    RANKINGS = MEASURES + ('date',)
+    PERIODS = ('hour', 'day', 'month')
+    __INDEXED = RANKINGS + ('condition',)  # Columns with a sorted index (a permutation), see filter
+    __INDEX_ENTRY_BYTES = 100  # Slot of the hash table, key and value (int objects) of an entry of the index by id
+    __TOMBSTONES_FRACTION = 32  # Removed rows are compacted when they are more than 1/32 of the rows
+    __SYNC_ENTRY_BYTES = 16  # Id and fingerprint of the record kept by RecordSync, see RecordSync.bytes_per_record
+    __RANGES = ((0, 99999), (-50, 50), (0, 100), (0, 200), (1, 4),
+                (RecordDate.create('01/01/2000 00:00').epoch_minutes, RecordDate.create('31/12/2999 23:59').epoch_minutes))
+
+    def __columns(self) -> tuple:
+        return self.__ids, self.__temperatures, self.__humidities, self.__winds, self.__conditions, self.__dates
+
+    def __sort_column(self, key: str) -> array:
+        return {'temperature': self.__temperatures, 'humidity': self.__humidities,
+                'wind': self.__winds, 'date': self.__dates, 'condition': self.__conditions}[key]
+
+    def __permutation(self, key: str) -> array:
+        """
+            Row positions sorted by key, built once and cached: the columns are never reordered, so changing
+            ordering only changes the permutation read through. The permutation by date is also the time index
+            of between, filter, evict and the rollups.
+        """
+        self.__compact()
+        if key not in self.__permutations:
+            column = self.__sort_column(key)
+            self.__permutations[key] = array('L', sorted(range(self.records), key=column.__getitem__))
+        return self.__permutations[key]
+
+    def __shown_position(self, row: int) -> int:  # Position of a row in the order shown, tombstones included
+        if not self.__sort_key:
+            return row
+        column = self.__sort_column(self.__sort_key[0])
+        position = lambda row: (column[row], row)  # Permutations are stable: equal keys are ordered by row
+        return bisect_left(self.__permutations[self.__sort_key[0]], position(row), key=position)
+
+    def __tombstones(self) -> List[int]:
+        """
+            Sorted positions of the removed rows in the order shown. They are found once, then kept up to date
+            by remove_by_id until the order changes, a record is added or the rows are compacted.
+        """
+        key = self.__sort_key[0] if self.__sort_key else ''
+        if self.__skipped[0] != key:
+            self.__skipped[:] = key, sorted(self.__shown_position(row) for row in self.__removed)
+        return self.__skipped[1]
+
+    def __row(self, index: int) -> int:
+        """
+            Row of the record shown at index, skipping the removed rows without compacting them, in O(log n)
+        """
+        if self.__sort_key and self.__sort_key[0] not in self.__permutations:
+            self.__permutation(self.__sort_key[0])
+        shown = self.__permutations[self.__sort_key[0]] if self.__sort_key else None
+        position = index
+        if self.__removed:
+            tombstones, previous = self.__tombstones(), -1
+            while position != previous:  # The smallest position with index records shown before it
+                previous, position = position, index + bisect_right(tombstones, position)
+        return shown[position] if shown is not None else position
 
     @property
     def records(self) -> int:  # Return the  number of records in the list (Utility method)
-        return len(self.__records)
+        return len(self.__ids) - len(self.__removed)
+
+    @property
+    def _version(self) -> int:  # For RecordView, to know when the list changed
+        return self.__versions[0]
+
+    def __changed(self) -> None:
+        self.__versions[0] += 1
 
     def record(self, index: int) -> Record:  # Given an index return a record
         validate("record_index", index, min_value=0, max_value=self.records - 1)
-        return self.__records[index]
+        return self._record_at(self.__row(index))
+
+    def row(self, index: int) -> tuple:
+        """
+            Raw values of the record at the given index, as yielded by rows(), without building a Record
+        """
+        validate("record_index", index, min_value=0, max_value=self.records - 1)
+        return self._row_at(self.__row(index))
+
+    def _row_at(self, row: int) -> tuple:
+        return tuple(column[row] for column in self.__columns())
+
+    def _record_at(self, row: int) -> Record:  # Given a position in the columns return a record
+        record_id = self.__ids[row]
+        return Record(Temperature(self.__temperatures[row]), Humidity(self.__humidities[row]),
+                      Wind(self.__winds[row]), Condition.create(str(self.__conditions[row])),
+                      RecordDate.from_epoch_minutes(self.__dates[row]),
+                      id=Id(record_id) if record_id else None)
+
+    def __append(self, rec: Record) -> None:
+        if rec.id is not None:
+            self.__index[rec.id.value] = len(self.__ids)
+        self.__ids.append(rec.id.value if rec.id is not None else 0)
+        self.__temperatures.append(rec.temperature.value)
+        self.__humidities.append(rec.humidity.value)
+        self.__winds.append(rec.wind.value)
+        self.__conditions.append(int(rec.condition.enum_value))
+        self.__dates.append(rec.record_date.epoch_minutes)
 
     def add_record(self, rec: Record) -> None:
-        self.__records.append(rec)
+        row = len(self.__ids)
+        self.__skipped[0] = None  # Positions shown after the new record move
+        self.__append(rec)
+        self.__changed()
+        for key, permutation in self.__permutations.items():
+            # Inserting on the right keeps records with equal keys in insertion order, as a stable sort would
+            insort_right(permutation, row, key=self.__sort_column(key).__getitem__)
+        self.__count_added(row)
+
+    def add_records(self, records: List[Record]) -> None:
+        """
+            Adds a batch of records. When the batch is large compared to the list, re-sorting once is cheaper than
+            inserting every record in the cached permutations, so they are dropped and rebuilt on the next access.
+        """
+        first_row, existing = len(self.__ids), self.records
+        self.__skipped[0] = None
+        for rec in records:
+            self.__append(rec)
+        self.__changed()
+        self.__count_added(first_row)
+        if len(records) > existing // 8:
+            self.__permutations.clear()
+            return
+        for key, permutation in self.__permutations.items():
+            column = self.__sort_column(key)
+            for row in range(first_row, len(self.__ids)):
+                insort_right(permutation, row, key=column.__getitem__)
 
     def dump_list(self) -> None:
-        self.__records.clear()
+        for column in self.__columns():
+            del column[:]
+        self.__permutations.clear()
+        self.__histograms.clear()
+        self.__rollups.clear()
+        self.__index.clear()
+        self.__removed.clear()
+        self.__skipped[0] = None
+        self.__sort_key.clear()
+        self.__changed()
+
+    def remove_records(self, ids: Iterable[int]) -> int:
+        """
+            Removes all the records having one of the given ids with a single pass over the columns.
+            Returns the number of removed records.
+        """
+        ids = set(ids)
+        if not ids:
+            return 0
+        self.__compact()
+        rows = [row for row, record_id in enumerate(self.__ids) if record_id in ids]
+        for row in rows:
+            self.__remove_row(row)
+        if rows:
+            self.__changed()
+            self.__compact()
+        return len(rows)
+
+    def get_by_id(self, record_id: int) -> Optional[Record]:
+        row = self.__index.get(record_id)
+        return self._record_at(row) if row is not None else None
+
+    def remove_by_id(self, record_id: int) -> Optional[Record]:
+        """
+            Removes the record with the given id in O(1) and returns it, or returns None if there is no such record
+        """
+        row = self.__index.get(record_id)
+        if row is None:
+            return None
+        rec = self._record_at(row)
+        if self.__skipped[0] == (self.__sort_key[0] if self.__sort_key else ''):
+            insort_right(self.__skipped[1], self.__shown_position(row))
+        self.__remove_row(row)
+        self.__changed()
+        if len(self.__removed) * self.__TOMBSTONES_FRACTION > len(self.__ids):
+            self.__compact()
+        return rec
+
+    def __remove_row(self, row: int) -> None:
+        self.__removed.add(row)
+        if self.__index.get(self.__ids[row]) == row:
+            del self.__index[self.__ids[row]]
+        for (measure, group_by), histograms in self.__histograms.items():
+            date = self.__dates[row]
+            group = {'condition': self.__conditions[row], 'day': date // 1440, 'hour': date // 60 % 24}[group_by]
+            low = self.__RANGES[self.COLUMN_NAMES.index(measure)][0]
+            histograms[group][self.__sort_column(measure)[row] - low] -= 1
+        for period, buckets in self.__rollups.items():
+            self.__unroll(buckets, period, row)
+
+    def __compact(self) -> None:
+        """
+            remove_by_id only marks the row as removed (a tombstone) in O(1). The removed rows are dropped from
+            the columns here, in a single pass, renumbering the rows of the cached permutations and of the index:
+            when the tombstones are a fraction of the rows, or before a read that does not skip them (see __row)
+        """
+        if not self.__removed:
+            return
+        total = len(self.__ids)
+        kept = bytearray(b'\x01') * total
+        for row in self.__removed:
+            kept[row] = 0
+        positions = array('L', [0]) * total  # New row of every kept row
+        new_row = 0
+        for row, keep in enumerate(kept):
+            positions[row] = new_row
+            new_row += keep
+        for column in self.__columns():
+            column[:] = array(column.typecode, compress(column, kept))
+        for key, permutation in self.__permutations.items():
+            permutation[:] = array('L', [positions[row] for row in permutation if kept[row]])
+        for record_id, row in self.__index.items():
+            self.__index[record_id] = positions[row]
+        self.__removed.clear()
+        self.__skipped[0] = None
+
+    def rows(self) -> Iterator[tuple]:
+        """
+            Iterates over the raw values of the records in insertion order, without building Record objects:
+            (id or 0, temperature, humidity, wind, condition as 1 to 4, date as epoch minutes)
+        """
+        self.__compact()
+        return zip(*self.__columns())
+
+    def columns(self) -> Dict[str, array]:
+        """
+            The arrays backing the list, e.g. to save them to disk. They must not be modified.
+        """
+        self.__compact()
+        return dict(zip(self.COLUMN_NAMES, self.__columns()))
+
+    def load_columns(self, columns: Dict[str, array]) -> None:
+        """
+            Replaces the content of the list with the given arrays, as returned by columns().
+            Every column is validated at once, since the arrays may come from a file.
+        """
+        validate('columns', sorted(columns), equals=sorted(self.COLUMN_NAMES))
+        validate('columns.length', {len(column) for column in columns.values()}, max_len=1)
+        for name, (min_value, max_value) in zip(self.COLUMN_NAMES, self.__RANGES):
+            validate(f'{name}.typecode', columns[name].typecode, equals=self.columns()[name].typecode)
+            if columns[name]:
+                validate(f'{name}.min', min(columns[name]), min_value=min_value)
+                validate(f'{name}.max', max(columns[name]), max_value=max_value)
+        for name, column in zip(self.COLUMN_NAMES, self.__columns()):
+            column[:] = columns[name]
+        self.__permutations.clear()
+        self.__histograms.clear()
+        self.__rollups.clear()
+        self.__removed.clear()
+        self.__skipped[0] = None
+        self.__index.clear()
+        self.__index.update((record_id, row) for row, record_id in enumerate(self.__ids) if record_id)
+        self.__changed()
+
+    def __group_keys(self, group_by: str, first_row: int) -> Iterator[int]:
+        if group_by == 'condition':
+            return islice(self.__conditions, first_row, None)
+        if group_by == 'day':
+            return (date // 1440 for date in islice(self.__dates, first_row, None))
+        return (date // 60 % 24 for date in islice(self.__dates, first_row, None))
+
+    def __count(self, histograms: Dict[int, array], measure: str, group_by: str, first_row: int) -> None:
+        """
+            Measures have a small integer domain, so a group counts the occurrences of every value: any statistic,
+            exact percentiles included, is then derived from at most 201 counters
+        """
+        low, high = self.__RANGES[self.COLUMN_NAMES.index(measure)]
+        empty = array('L', [0]) * (high - low + 1)
+        for group, value in zip(self.__group_keys(group_by, first_row),
+                                islice(self.__sort_column(measure), first_row, None)):
+            counts = histograms.get(group)
+            if counts is None:
+                counts = histograms[group] = array('L', empty)
+            counts[value - low] += 1
+
+    def __count_added(self, first_row: int) -> None:
+        for (measure, group_by), histograms in self.__histograms.items():
+            self.__count(histograms, measure, group_by, first_row)
+        for period, buckets in self.__rollups.items():
+            self.__roll(buckets, period, first_row)
+
+    def __group_label(self, group_by: str, group: int) -> str:
+        if group_by == 'condition':
+            return Condition.create(str(group)).value
+        if group_by == 'day':
+            return from_epoch_minutes(group * 1440).strftime('%d/%m/%Y')
+        return f'{group:02}:00'
+
+    def statistics(self, measure: str, group_by: str, percentiles: Sequence[int] = (50, 90, 95, 99)) \
+            -> Dict[str, Statistics]:
+        """
+            Statistics of a measure (temperature, humidity or wind) for every group of records, grouped by
+            condition, by day or by hour of the day (00:00 groups the readings of midnight of every day).
+            Groups are ordered by condition, day or hour; groups without records are not returned.
+        """
+        validate('measure', measure, is_in=self.MEASURES)
+        validate('group_by', group_by, is_in=self.GROUPINGS)
+        validate('percentiles', percentiles, custom=lambda values: all(0 < q <= 100 for q in values))
+        key = measure, group_by
+        if key not in self.__histograms:
+            self.__compact()
+            histograms = {}
+            self.__count(histograms, measure, group_by, 0)
+            self.__histograms[key] = histograms
+        low = self.__RANGES[self.COLUMN_NAMES.index(measure)][0]
+        return {self.__group_label(group_by, group): _summarize(counts, low, percentiles)
+                for group, counts in sorted(self.__histograms[key].items()) if any(counts)}
+
+    @staticmethod
+    def __bucket(period: str, date: int) -> int:
+        if period == 'hour':
+            return date // 60
+        if period == 'day':
+            return date // 1440
+        return _month_of_day(date // 1440)
+
+    def __bucket_minutes(self, period: str, bucket: int) -> Tuple[int, int]:  # First and last minute of a bucket
+        if period == 'hour':
+            return bucket * 60, bucket * 60 + 59
+        if period == 'day':
+            return bucket * 1440, bucket * 1440 + 1439
+        year, month = divmod(bucket, 12)
+        first = datetime(year, month + 1, 1)
+        last = datetime(year + month // 11, (month + 1) % 12 + 1, 1)
+        return to_epoch_minutes(first), to_epoch_minutes(last) - 1
+
+    def __roll(self, buckets: Dict[int, array], period: str, first_row: int) -> None:
+        """
+            Adds the rows from first_row to the buckets. A bucket is an array of: count, sums of temperature,
+            humidity and wind, their minimums and maximums, the counts of the four conditions and a flag set
+            when minimums and maximums must be computed again: a removal cannot update them, so __refresh scans
+            the rows of the bucket, found in the time index, when it is read
+        """
+        columns = self.__temperatures, self.__humidities, self.__winds, self.__conditions, self.__dates
+        for temperature, humidity, wind, condition, date in zip(*(islice(column, first_row, None)
+                                                                  for column in columns)):
+            key = self.__bucket(period, date)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = array('l', [0, 0, 0, 0, temperature, temperature, humidity, humidity,
+                                                    wind, wind, 0, 0, 0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += temperature
+            bucket[2] += humidity
+            bucket[3] += wind
+            bucket[4], bucket[5] = min(bucket[4], temperature), max(bucket[5], temperature)
+            bucket[6], bucket[7] = min(bucket[6], humidity), max(bucket[7], humidity)
+            bucket[8], bucket[9] = min(bucket[8], wind), max(bucket[9], wind)
+            bucket[9 + condition] += 1
+
+    def __unroll(self, buckets: Dict[int, array], period: str, row: int) -> None:
+        key = self.__bucket(period, self.__dates[row])
+        bucket = buckets[key]
+        bucket[0] -= 1
+        if bucket[0] == 0:
+            del buckets[key]
+            return
+        for offset, column in enumerate((self.__temperatures, self.__humidities, self.__winds)):
+            value = column[row]
+            bucket[1 + offset] -= value
+            if value in (bucket[4 + 2 * offset], bucket[5 + 2 * offset]):
+                bucket[14] = 1
+        bucket[9 + self.__conditions[row]] -= 1
+
+    def __refresh(self, period: str, key: int, bucket: array) -> None:
+        permutation, date = self.__permutation('date'), self.__dates.__getitem__
+        first, last = self.__bucket_minutes(period, key)
+        rows = _RowSlice(permutation, bisect_left(permutation, first, key=date),
+                         bisect_right(permutation, last, key=date))
+        for offset, column in enumerate((self.__temperatures, self.__humidities, self.__winds)):
+            values = [column[row] for row in rows]
+            bucket[4 + 2 * offset], bucket[5 + 2 * offset] = min(values), max(values)
+        bucket[14] = 0
+
+    @property
+    def bytes_per_record(self) -> int:
+        """
+            Memory taken by a record: its slots in the columns and in the cached permutations, its entry
+            in the index by id (estimated) and in the sync. Histograms and rollups do not depend on the number
+            of records. The sync also keeps the 16 bytes of every evicted record, so they are not downloaded again.
+        """
+        arrays = list(self.__columns()) + list(self.__permutations.values())
+        return sum(column.itemsize for column in arrays) + self.__INDEX_ENTRY_BYTES + self.__SYNC_ENTRY_BYTES
+
+    @property
+    def memory_usage(self) -> int:  # Bytes taken by the records, see bytes_per_record
+        return self.records * self.bytes_per_record
+
+    def evict(self, retention: Retention) -> List[tuple]:
+        """
+            Removes the oldest readings (by date, records with the same date in insertion order) until the list
+            is within the retention limits, and returns their raw values as yielded by rows(), oldest first.
+            The index by date is used to find them, so only the evicted rows are visited.
+        """
+        if not retention.is_bounded or self.records == 0:
+            return []
+        permutation, total = self.__permutation('date'), self.records
+        excess = 0
+        if retention.max_records is not None:
+            excess = total - retention.max_records
+        if retention.max_age is not None:
+            cutoff = self.__dates[permutation[-1]] - retention.max_age // timedelta(minutes=1)
+            excess = max(excess, bisect_left(permutation, cutoff, key=self.__dates.__getitem__))
+        if retention.max_bytes is not None:
+            excess = max(excess, total - retention.max_bytes // self.bytes_per_record)
+        if excess <= 0:
+            return []
+        rows = permutation[:excess]
+        evicted = [self._row_at(row) for row in rows]
+        for row in rows:
+            self.__remove_row(row)
+        self.__changed()
+        self.__compact()
+        return evicted
+
+    def load_rows(self, rows: Iterable[tuple]) -> None:
+        """
+            Replaces the content of the list with raw rows, as yielded by rows()
+        """
+        values = list(zip(*rows)) or [()] * len(self.COLUMN_NAMES)
+        self.load_columns({name: array(column.typecode, column_values)
+                           for (name, column), column_values in zip(self.columns().items(), values)})
+
+    def rollups(self, period: str) -> List[Rollup]:
+        """
+            Rollup of every hour, day or month with records, in date order. After the first call for a period
+            the cost does not depend on the number of records but on the number of buckets.
+        """
+        validate('period', period, is_in=self.PERIODS)
+        if period not in self.__rollups:
+            self.__compact()
+            buckets = {}
+            self.__roll(buckets, period, 0)
+            self.__rollups[period] = buckets
+        res = []
+        for key, bucket in sorted(self.__rollups[period].items()):
+            if bucket[14]:
+                self.__refresh(period, key, bucket)
+            count, conditions = bucket[0], bucket[10:14]
+            res.append(Rollup(RecordDate.from_epoch_minutes(self.__bucket_minutes(period, key)[0]), count,
+                              *(Summary(bucket[4 + 2 * offset], bucket[5 + 2 * offset], bucket[1 + offset] / count)
+                                for offset in range(3)),
+                              Condition.create(str(conditions.index(max(conditions)) + 1))))
+        return res
+
+    def between(self, start: RecordDate, end: RecordDate) -> RecordView:
+        """
+            Records dated from start to end (both included) in ascending date order, as a lazy view.
+            Finding the range costs O(log n), after the index by date is built (once, as for sort_by_ascending_date).
+        """
+        validate('end', end, min_value=start)
+        first, last = start.epoch_minutes, end.epoch_minutes
+
+        def resolve() -> Sequence[int]:
+            permutation, key = self.__permutation('date'), self.__dates.__getitem__
+            return _RowSlice(permutation, bisect_left(permutation, first, key=key),
+                             bisect_right(permutation, last, key=key))
+
+        return RecordView(self, resolve)
+
+    def __display_rows(self) -> Sequence[int]:  # Rows in the order records are shown
+        self.__compact()
+        return self.__permutation(self.__sort_key[0]) if self.__sort_key else range(len(self.__ids))
+
+    def slice(self, start: int, stop: int) -> RecordView:
+        """
+            Records at positions start to stop (excluded) in the current order, as a lazy view
+        """
+        validate('start', start, min_value=0)
+        validate('stop', stop, min_value=start)
+
+        def resolve() -> Sequence[int]:
+            rows = self.__display_rows()
+            return _RowSlice(rows, start, max(start, min(stop, len(rows)))) if self.__sort_key \
+                else rows[start:stop]
+
+        return RecordView(self, resolve)
+
+    def where(self, predicate: Callable[[Record], bool]) -> RecordView:
+        """
+            Records for which predicate is true, in the current order, as a lazy view
+        """
+        return RecordView(self, lambda: [row for row in self.__display_rows() if predicate(self._record_at(row))])
+
+    def filter(self, expression: RowFilter) -> RecordView:
+        """
+            Records matching the filter, in the current order, as a lazy view.
+            The filter is turned once into a function of the row position reading the columns directly,
+            so no Record is built. If the filter requires a range of a column (e.g. wind > 80 and ...)
+            only the rows in that range are tested, found by binary search in the sorted index of the column:
+            an index already cached (the most selective one, if several) is preferred, otherwise the index
+            of the first range is built and kept for the next queries. Indexes by condition act as buckets.
+        """
+        columns = dict(zip(self.COLUMN_NAMES, self.__columns()))  # Compaction updates the arrays in place
+        predicate = expression.predicate(columns)
+        ranges = [(key, low, high) for key, low, high in expression.ranges() if key in self.__INDEXED]
+
+        def resolve() -> Sequence[int]:
+            self.__compact()
+            if not ranges:
+                return [row for row in self.__display_rows() if predicate(row)]
+            rows = [row for row in self.__index_lookup(ranges) if predicate(row)]
+            if self.__sort_key:  # Permutations are stable: equal keys are ordered by row
+                column = self.__sort_column(self.__sort_key[0])
+                rows.sort(key=lambda row: (column[row], row))
+            else:
+                rows.sort()
+            return rows
+
+        return RecordView(self, resolve)
+
+    def __index_lookup(self, ranges: List[Tuple[str, Optional[int], Optional[int]]]) -> Sequence[int]:
+        cached = [lookup for lookup in ranges if lookup[0] in self.__permutations]
+        best: Optional[_RowSlice] = None
+        for key, low, high in cached or ranges[:1]:
+            permutation, value = self.__permutation(key), self.__sort_column(key).__getitem__
+            lo = 0 if low is None else bisect_left(permutation, low, key=value)
+            hi = len(permutation) if high is None else bisect_right(permutation, high, key=value)
+            rows = _RowSlice(permutation, lo, max(lo, hi))
+            if best is None or len(rows) < len(best):
+                best = rows
+        return best
+
+    def top_k(self, key: str, k: int) -> RecordView:
+        """
+            The k records with the highest value of key (temperature, humidity, wind or date), highest first,
+            as a lazy view; records with the same value are in insertion order. The list is not sorted.
+        """
+        return self.__select_k(key, k, highest=True)
+
+    def bottom_k(self, key: str, k: int) -> RecordView:
+        """
+            The k records with the lowest value of key (temperature, humidity, wind or date), lowest first,
+            as a lazy view; records with the same value are in insertion order. The list is not sorted.
+        """
+        return self.__select_k(key, k, highest=False)
+
+    def __select_k(self, key: str, k: int, highest: bool) -> RecordView:
+        """
+            If the permutation of key is cached (the list was sorted by key) the rows are read from its ends
+            in O(k log k), otherwise they are selected with a heap of k rows in O(n log k)
+        """
+        validate('key', key, is_in=self.RANKINGS)
+        validate('k', k, min_value=0)
+
+        def resolve() -> Sequence[int]:
+            self.__compact()
+            column = self.__sort_column(key)
+            if key not in self.__permutations:
+                select = heapq.nlargest if highest else heapq.nsmallest
+                return select(k, range(len(self.__ids)), key=column.__getitem__)
+            permutation, total = self.__permutations[key], len(self.__ids)
+            if not highest or k == 0:
+                return permutation[:k]
+            rows = permutation
+            if k < total:  # Rows with the k-th highest value are taken in insertion order, as nlargest does
+                threshold = column[permutation[total - k]]
+                above = bisect_right(permutation, threshold, key=column.__getitem__)
+                ties = bisect_left(permutation, threshold, key=column.__getitem__)
+                rows = permutation[ties:ties + k - (total - above)] + permutation[above:]
+            return sorted(rows, key=column.__getitem__, reverse=True)  # Stable, ties stay in insertion order
+
+        return RecordView(self, resolve)
+
+    def __sort_by(self, key: str) -> None:
+        self.__permutation(key)
+        self.__sort_key[:] = [key]
+        self.__changed()  # Views by position follow the new order
 
     def sort_by_temperature(self) -> None:
-        self.__records.sort(key=lambda x: x.temperature)
+        self.__sort_by('temperature')
 
     def sort_by_humidity(self) -> None:
-        self.__records.sort(key=lambda x: x.humidity)
+        self.__sort_by('humidity')
 
     def sort_by_wind(self) -> None:
-        self.__records.sort(key=lambda x: x.wind)
+        self.__sort_by('wind')
 
     def sort_by_ascending_date(self) -> None:
-        self.__records.sort(key=lambda x: x.record_date)
+        self.__sort_by('date')
 
 
 @typechecked
@@ -0,0 +1,235 @@
+"""
+    Filter expressions over the records, e.g.
+
+        rainy and wind > 80 and date within 7d
+        condition in (rainy, flurry) or not (temperature between -10 and 30)
+        date between 01/12/2023 and 08/12/2023 12:00
+
+    - temperature, humidity and wind are compared with =, !=, <, <=, >, >= or between ... and ... (inclusive)
+    - condition = name, condition != name and condition in (name, ...), where the name is sunny, cloudy, rainy
+      or flurry (or 1 to 4); a name alone means condition = name
+    - date is compared with dates as dd/mm/yyyy HH:MM (dd/mm/yyyy means 00:00), with between or with within,
+      followed by a number of hours or days (24h, 7d) before the time the expression is parsed
+    - and binds tighter than or; not and parentheses as usual. Keywords are case insensitive.
+"""
+import re
+from dataclasses import dataclass
+from functools import reduce
+from datetime import datetime, timedelta
+from typing import Callable, List, Mapping, Optional, Sequence, Tuple
+
+from typeguard import typechecked
+
+from tui_ssd.domain import RecordDate, RowFilter, to_epoch_minutes
+
+_MEASURES = ('temperature', 'humidity', 'wind')
+_CONDITIONS = {'sunny': 1, 'cloudy': 2, 'rainy': 3, 'flurry': 4}
+_TOKEN = re.compile(r'\s*(?:(?P<date>\d{2}/\d{2}/\d{4}(?:\s+\d{2}:\d{2})?)|(?P<period>\d+[hd])\b'
+                    r'|(?P<number>-?\d+)\b|(?P<word>[A-Za-z_]+)|(?P<symbol><=|>=|!=|==|[<>=(),]))')
+
+
+@typechecked
+@dataclass(frozen=True)
+class Range(RowFilter):
+    column: str
+    low: Optional[int]  # None is unbounded
+    high: Optional[int]
+
+    def predicate(self, columns: Mapping[str, Sequence[int]]) -> Callable[[int], bool]:
+        column, low, high = columns[self.column], self.low, self.high
+        if low is None:
+            return lambda row: column[row] <= high
+        if high is None:
+            return lambda row: column[row] >= low
+        return lambda row: low <= column[row] <= high
+
+    def ranges(self) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        return [(self.column, self.low, self.high)]
+
+
+@typechecked
+@dataclass(frozen=True)
+class OneOf(RowFilter):
+    column: str
+    values: Tuple[int, ...]
+
+    def predicate(self, columns: Mapping[str, Sequence[int]]) -> Callable[[int], bool]:
+        column, values = columns[self.column], frozenset(self.values)
+        return lambda row: column[row] in values
+
+
+@typechecked
+@dataclass(frozen=True)
+class And(RowFilter):
+    operands: Tuple[RowFilter, ...]
+
+    def predicate(self, columns: Mapping[str, Sequence[int]]) -> Callable[[int], bool]:
+        return reduce(lambda first, second: lambda row: first(row) and second(row),
+                      (operand.predicate(columns) for operand in self.operands))
+
+    def ranges(self) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        return [lookup for operand in self.operands for lookup in operand.ranges()]
+
+
+@typechecked
+@dataclass(frozen=True)
+class Or(RowFilter):
+    operands: Tuple[RowFilter, ...]
+
+    def predicate(self, columns: Mapping[str, Sequence[int]]) -> Callable[[int], bool]:
+        return reduce(lambda first, second: lambda row: first(row) or second(row),
+                      (operand.predicate(columns) for operand in self.operands))
+
+
+@typechecked
+@dataclass(frozen=True)
+class Not(RowFilter):
+    operand: RowFilter
+
+    def predicate(self, columns: Mapping[str, Sequence[int]]) -> Callable[[int], bool]:
+        operand = self.operand.predicate(columns)
+        return lambda row: not operand(row)
+
+
+class _Parser:
+    def __init__(self, text: str, now: datetime):
+        self.__tokens = self.__tokenize(text)
+        self.__position = 0
+        self.__now = now
+
+    @staticmethod
+    def __tokenize(text: str) -> List[str]:
+        tokens, position = [], 0
+        while text[position:].strip():
+            match = _TOKEN.match(text, position)
+            if match is None:
+                raise ValueError(f'Unexpected text: {text[position:].strip()}')
+            tokens.append(match.group(match.lastgroup))
+            position = match.end()
+        return tokens
+
+    def __peek(self) -> Optional[str]:
+        return self.__tokens[self.__position].lower() if self.__position < len(self.__tokens) else None
+
+    def __next(self, what: str) -> str:
+        token = self.__peek()
+        if token is None:
+            raise ValueError(f'Expected {what}, found the end of the filter')
+        self.__position += 1
+        return token
+
+    def __expect(self, expected: str) -> None:
+        token = self.__next(repr(expected))
+        if token != expected:
+            raise ValueError(f'Expected {expected!r}, found {token!r}')
+
+    def parse(self) -> RowFilter:
+        res = self.__or()
+        if self.__peek() is not None:
+            raise ValueError(f'Unexpected {self.__peek()!r}')
+        return res
+
+    def __or(self) -> RowFilter:
+        operands = [self.__and()]
+        while self.__peek() == 'or':
+            self.__position += 1
+            operands.append(self.__and())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def __and(self) -> RowFilter:
+        operands = [self.__not()]
+        while self.__peek() == 'and':
+            self.__position += 1
+            operands.append(self.__not())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def __not(self) -> RowFilter:
+        if self.__peek() == 'not':
+            self.__position += 1
+            return Not(self.__not())
+        if self.__peek() == '(':
+            self.__position += 1
+            res = self.__or()
+            self.__expect(')')
+            return res
+        return self.__comparison()
+
+    def __comparison(self) -> RowFilter:
+        token = self.__next('a field')
+        if token in _CONDITIONS:
+            return Range('condition', _CONDITIONS[token], _CONDITIONS[token])
+        if token == 'condition':
+            return self.__condition()
+        if token == 'date':
+            return self.__date()
+        if token not in _MEASURES:
+            raise ValueError(f'Unknown field {token!r}, expected one of temperature, humidity, wind, condition, date '
+                             f'or a condition')
+        return self.__compare(token, self.__number)
+
+    def __compare(self, column: str, value: Callable[[], int]) -> RowFilter:
+        operator = self.__next('a comparison')
+        if operator == 'between':
+            low = value()
+            self.__expect('and')
+            return Range(column, low, value())
+        operand = value()
+        if operator in ('=', '=='):
+            return Range(column, operand, operand)
+        if operator == '!=':
+            return Not(Range(column, operand, operand))
+        bounds = {'<': (None, operand - 1), '<=': (None, operand), '>': (operand + 1, None), '>=': (operand, None)}
+        if operator not in bounds:
+            raise ValueError(f'Unknown comparison {operator!r}')
+        return Range(column, *bounds[operator])
+
+    def __number(self) -> int:
+        token = self.__next('a number')
+        try:
+            return int(token)
+        except ValueError:
+            raise ValueError(f'Expected a number, found {token!r}') from None
+
+    def __condition_value(self) -> int:
+        token = self.__next('a condition')
+        if token in _CONDITIONS:
+            return _CONDITIONS[token]
+        if token not in ('1', '2', '3', '4'):
+            raise ValueError(f'Unknown condition {token!r}, expected one of {", ".join(_CONDITIONS)} or 1 to 4')
+        return int(token)
+
+    def __condition(self) -> RowFilter:
+        if self.__peek() != 'in':
+            return self.__compare('condition', self.__condition_value)
+        self.__position += 1
+        self.__expect('(')
+        values = [self.__condition_value()]
+        while self.__peek() == ',':
+            self.__position += 1
+            values.append(self.__condition_value())
+        self.__expect(')')
+        return OneOf('condition', tuple(sorted(set(values))))
+
+    def __date_value(self) -> int:
+        token = self.__next('a date')
+        date, *time = token.split()
+        return RecordDate.create(f'{date} {time[0] if time else "00:00"}').epoch_minutes
+
+    def __date(self) -> RowFilter:
+        if self.__peek() != 'within':
+            return self.__compare('date', self.__date_value)
+        self.__position += 1
+        period = self.__next('a period (e.g. 24h or 7d)')
+        if not re.fullmatch(r'\d+[hd]', period):
+            raise ValueError(f'Expected a period (e.g. 24h or 7d), found {period!r}')
+        hours = int(period[:-1]) * (24 if period.endswith('d') else 1)
+        return Range('date', to_epoch_minutes(self.__now - timedelta(hours=hours)), None)
+
+
+def parse_filter(text: str, now: Optional[datetime] = None) -> RowFilter:
+    """
+        Parses a filter expression (see the module documentation) into a RowFilter for RecordList.filter.
+        Periods (date within 7d) are relative to now, the current time by default.
+        Raises ValueError if the expression is not valid.
+    """
+    return _Parser(text, now if now is not None else datetime.now()).parse()
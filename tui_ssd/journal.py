@@ -0,0 +1,106 @@
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from typeguard import typechecked
+from valid8 import validate
+
+from tui_ssd.snapshot import default_cache_dir
+
+
+@typechecked
+@dataclass(frozen=True)
+class JournalEntry:
+    key: str  # Idempotency key, sent with the request so that a replay never creates the record twice
+    operation: str  # 'create' or 'delete'
+    row: Optional[Dict[str, Any]] = None  # The record to create, as Record.db_json
+    record_id: Optional[int] = None  # The record to delete
+
+    def __post_init__(self):
+        validate('operation', self.operation, is_in=('create', 'delete'))
+
+    @staticmethod
+    def for_create(row: Dict[str, Any]) -> 'JournalEntry':
+        return JournalEntry(str(uuid.uuid4()), 'create', row=row)
+
+    @staticmethod
+    def for_delete(record_id: int) -> 'JournalEntry':
+        return JournalEntry(str(uuid.uuid4()), 'delete', record_id=record_id)
+
+
+@typechecked
+class Journal:
+    """
+        Write-ahead journal of the changes sent to the server: every create and delete is written (and synced
+        to disk) before its request, and marked as done once the server answered. The changes not done, e.g.
+        because the server was unreachable or the TUI was closed meanwhile, are replayed later.
+
+        The file is append-only, one JSON object per line: an entry, or {"done": key} for a completed one.
+        Many entries (or completions) are written with a single fsync. When no entry is pending the file is
+        removed. A line left incomplete by a crash is ignored. Every user has a journal of their own, so changes
+        are never lost nor replayed by someone else.
+    """
+
+    def __init__(self, username: str, directory: Optional[Path] = None):
+        self.__path = (directory or default_cache_dir()) / f'records-{username}.journal'
+        self.__pending: Optional[Dict[str, JournalEntry]] = None  # Read from the file on first use
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    def __load(self) -> Dict[str, JournalEntry]:
+        if self.__pending is None:
+            self.__pending = {}
+            try:
+                lines = self.__path.read_text(encoding='utf-8').splitlines()
+            except OSError:
+                lines = []
+            for line in lines:
+                try:
+                    item = json.loads(line)
+                    if 'done' in item:
+                        self.__pending.pop(item['done'], None)
+                    else:
+                        self.__pending[item['key']] = JournalEntry(**item)
+                except (ValueError, TypeError, KeyError):
+                    continue  # Incomplete line of an interrupted write
+        return self.__pending
+
+    def __write(self, items: Iterable[Dict[str, Any]]) -> None:
+        data = ''.join(json.dumps(item) + '\n' for item in items)
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.__path, 'a', encoding='utf-8') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def pending(self) -> List[JournalEntry]:
+        """
+            Entries not done yet, in the order they were written
+        """
+        return list(self.__load().values())
+
+    def append(self, entries: List[JournalEntry]) -> None:
+        if not entries:
+            return
+        self.__write({'key': entry.key, 'operation': entry.operation, 'row': entry.row, 'record_id': entry.record_id}
+                     for entry in entries)
+        pending = self.__load()
+        for entry in entries:
+            pending[entry.key] = entry
+
+    def complete(self, keys: List[str]) -> None:
+        pending = self.__load()
+        keys = [key for key in keys if key in pending]
+        if not keys:
+            return
+        for key in keys:
+            del pending[key]
+        if not pending:
+            self.__path.unlink(missing_ok=True)
+            return
+        self.__write({'done': key} for key in keys)
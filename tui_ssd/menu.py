@@ -1,9 +1,13 @@
+import asyncio
+import inspect
+import shutil
 from dataclasses import field, InitVar, dataclass
 from typing import Callable, List, Dict, Optional, Any
 
 from typeguard import typechecked
 from valid8 import validate
 
+from tui_ssd.metrics import Metrics
 from validation.regex import pattern
 
 
@@ -38,10 +42,12 @@ class Entry:
     description: Description
     on_selected: Callable[[], None] = field(default=lambda: None)
     is_exit: bool = field(default=False)
+    is_hidden: bool = field(default=False)  # Selectable, but not listed
 
     @staticmethod
-    def create(key: str, description: str, on_selected: Callable[[], None] = lambda: None, is_exit: bool = False) -> 'Entry':
-        return Entry(Key(key), Description(description), on_selected, is_exit)
+    def create(key: str, description: str, on_selected: Callable[[], None] = lambda: None, is_exit: bool = False,
+               is_hidden: bool = False) -> 'Entry':
+        return Entry(Key(key), Description(description), on_selected, is_exit, is_hidden)
 
 
 @typechecked
@@ -49,6 +55,8 @@ class Entry:
 class Menu:
     description: Description
     auto_select: Callable[[], None] = field(default=lambda: None)
+    status: Callable[[], str] = field(default=lambda: '')  # Shown under the title when not empty
+    metrics: Metrics = field(default=Metrics(enabled=False), repr=False)  # Times every selected entry
     __entries: List[Entry] = field(default_factory=list, repr=False, init=False)
     __key2entry: Dict[Key, Entry] = field(default_factory=dict, repr=False, init=False)
     create_key: InitVar[Any] = field(default='it must be Builder.__create_key')
@@ -62,6 +70,26 @@ class Menu:
         self.__entries.append(value)
         self.__key2entry[value.key] = value
 
+    @property
+    def height(self) -> int:
+        """
+            Lines written by a redraw of the menu: the title, a status line, the lines of entries and the prompt
+        """
+        return 3 + 1 + len(self.__lines()) + 1
+
+    def __lines(self) -> List[str]:
+        """
+            The visible entries in as many columns as the width of the terminal allows, filled top to bottom,
+            so that a long menu leaves room for the records on a small terminal
+        """
+        labels = [f'{entry.key}: {entry.description}' for entry in self.__entries if not entry.is_hidden]
+        if not labels:
+            return []
+        width = max(len(label) for label in labels) + 2
+        columns = max(1, min(len(labels), shutil.get_terminal_size().columns // width))
+        rows = -(-len(labels) // columns)
+        return [''.join(label.ljust(width) for label in labels[row::rows]).rstrip() for row in range(rows)]
+
     def _has_exit(self) -> bool:
         return bool(list(filter(lambda e: e.is_exit, self.__entries)))
 
@@ -72,8 +100,11 @@ class Menu:
         print(fmt.format(' ', self.description.value, ' '))
         print(fmt.format('*', '*' * length, '*'))
         self.auto_select()
-        for entry in self.__entries:
-            print(f'{entry.key}:\t{entry.description}')
+        status = self.status()
+        if status:
+            print(status)
+        for line in self.__lines():
+            print(line)
 
     def __select_from_input(self) -> bool:
         while True:
@@ -81,7 +112,8 @@ class Menu:
                 line = input("? ")
                 key = Key(line.strip())
                 entry = self.__key2entry[key]
-                entry.on_selected()
+                with self.metrics.timer('menu_action_seconds', action=entry.description.value):
+                    entry.on_selected()
                 return entry.is_exit
             except (KeyError, TypeError, ValueError):
                 print('Invalid selection. Please, try again...')
@@ -93,14 +125,41 @@ class Menu:
             if is_exit:
                 return
 
+    async def __select_from_async_input(self) -> bool:
+        while True:
+            try:
+                line = await asyncio.to_thread(input, "? ")
+                key = Key(line.strip())
+                entry = self.__key2entry[key]
+                with self.metrics.timer('menu_action_seconds', action=entry.description.value):
+                    res = entry.on_selected()
+                    if inspect.isawaitable(res):
+                        await res
+                return entry.is_exit
+            except (KeyError, TypeError, ValueError):
+                print('Invalid selection. Please, try again...')
+
+    async def run_async(self) -> None:
+        """
+            Same as run(), but stdin is read in a worker thread, so the tasks scheduled on the event loop
+            (e.g. network calls started by the entries) keep running while the user is typing.
+            An entry may return an awaitable, which is awaited before showing the menu again.
+        """
+        while True:
+            self.__print()
+            is_exit = await self.__select_from_async_input()
+            if is_exit:
+                return
+
     @typechecked
     @dataclass()
     class Builder:
         __menu: Optional['Menu']
         __create_key = object()
 
-        def __init__(self, description: Description, auto_select: Callable[[], None] = lambda: None):
-            self.__menu = Menu(description, auto_select, self.__create_key)
+        def __init__(self, description: Description, auto_select: Callable[[], None] = lambda: None,
+                     status: Callable[[], str] = lambda: '', metrics: Metrics = Metrics(enabled=False)):
+            self.__menu = Menu(description, auto_select, status, metrics, create_key=self.__create_key)
 
         @staticmethod
         def is_valid_key(key: Any) -> bool:
@@ -0,0 +1,213 @@
+import os
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from pathlib import Path
+from time import perf_counter
+from typing import ContextManager, Dict, List, Optional, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_NULL_TIMER = nullcontext()
+
+
+@typechecked
+class Histogram:
+    """
+        Latency histogram with fixed buckets (upper bounds in seconds, as the default ones of Prometheus),
+        so observing a value costs a binary search and no memory.
+    """
+    BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.__buckets = [0] * (len(self.BOUNDS) + 1)  # The last one is +Inf
+        self.__count = 0
+        self.__sum = 0.0
+        self.__max = 0.0
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    @property
+    def sum(self) -> float:
+        return self.__sum
+
+    @property
+    def max(self) -> float:
+        return self.__max
+
+    def observe(self, seconds: float) -> None:
+        self.__buckets[bisect_left(self.BOUNDS, seconds)] += 1
+        self.__count += 1
+        self.__sum += seconds
+        self.__max = max(self.__max, seconds)
+
+    def cumulative(self) -> List[int]:
+        res, total = [], 0
+        for value in self.__buckets:
+            total += value
+            res.append(total)
+        return res
+
+    def quantile(self, q: float) -> float:
+        """
+            Upper bound of the bucket containing the q-quantile (the maximum if it is in the +Inf bucket)
+        """
+        validate('q', q, min_value=0, max_value=1)
+        rank = q * self.__count
+        for bound, total in zip(self.BOUNDS, self.cumulative()):
+            if total >= rank:
+                return min(bound, self.__max)
+        return self.__max
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, lock: threading.Lock):
+        self.__histogram = histogram
+        self.__lock = lock
+
+    def __enter__(self) -> '_Timer':
+        self.__start = perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        elapsed = perf_counter() - self.__start
+        with self.__lock:
+            self.__histogram.observe(elapsed)
+
+
+@typechecked
+class Metrics:
+    """
+        Registry of latency histograms, counters and gauges, identified by a name and a set of labels.
+        When disabled every call returns right away (timer() returns a shared no-op context manager),
+        so the instrumented code can always call it.
+
+        The metrics can be shown as a table or written in the text format of Prometheus, to be scraped from a file.
+    """
+    PREFIX = 'tui_ssd_'
+
+    def __init__(self, enabled: bool = True, dump_path: Optional[Path] = None, prometheus: bool = False):
+        self.__enabled = enabled
+        self.__dump_path = dump_path
+        self.__prometheus = prometheus
+        self.__lock = threading.Lock()  # The background reconcile and AsyncApp record from worker threads
+        self.__histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.__counters: Dict[Tuple[str, Labels], int] = {}
+        self.__gauges: Dict[Tuple[str, Labels], float] = {}  # Last value set
+
+    @staticmethod
+    def from_environ() -> 'Metrics':
+        """
+            Enabled if TUI_SSD_METRICS is the path of the file to write on exit;
+            TUI_SSD_METRICS_FORMAT=prometheus selects the Prometheus text format
+        """
+        path = os.environ.get('TUI_SSD_METRICS')
+        if not path:
+            return Metrics(enabled=False)
+        return Metrics(dump_path=Path(path), prometheus=os.environ.get('TUI_SSD_METRICS_FORMAT') == 'prometheus')
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    def __histogram(self, name: str, labels: Dict[str, str]) -> Histogram:
+        key = name, tuple(sorted(labels.items()))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = Histogram()
+        return histogram
+
+    def timer(self, name: str, **labels: str) -> ContextManager:
+        if not self.__enabled:
+            return _NULL_TIMER
+        return _Timer(self.__histogram(name, labels), self.__lock)
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        if not self.__enabled:
+            return
+        histogram = self.__histogram(name, labels)
+        with self.__lock:
+            histogram.observe(seconds)
+
+    def increment(self, name: str, value: int = 1, **labels: str) -> None:
+        if not self.__enabled:
+            return
+        key = name, tuple(sorted(labels.items()))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        if not self.__enabled:
+            return
+        with self.__lock:
+            self.__gauges[name, tuple(sorted(labels.items()))] = value
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        return self.__histograms.get((name, tuple(sorted(labels.items()))))
+
+    def counter(self, name: str, **labels: str) -> int:
+        return self.__counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def gauge(self, name: str, **labels: str) -> Optional[float]:
+        return self.__gauges.get((name, tuple(sorted(labels.items()))))
+
+    @staticmethod
+    def __format_labels(labels: Labels, extra: Labels = ()) -> str:
+        items = labels + extra
+        if not items:
+            return ''
+        return '{' + ','.join(f'{name}="{value}"' for name, value in items) + '}'
+
+    def to_text(self) -> str:
+        lines = [f'{"METRIC":<60} {"COUNT":>7} {"MEAN ms":>9} {"P50 ms":>9} {"P95 ms":>9} {"MAX ms":>9}']
+        with self.__lock:
+            for (name, labels), histogram in sorted(self.__histograms.items()):
+                mean = histogram.sum / histogram.count if histogram.count else 0.0
+                lines.append(f'{name + self.__format_labels(labels):<60} {histogram.count:>7} {mean * 1000:>9.1f} '
+                             f'{histogram.quantile(0.5) * 1000:>9.1f} {histogram.quantile(0.95) * 1000:>9.1f} '
+                             f'{histogram.max * 1000:>9.1f}')
+            for (name, labels), value in sorted({**self.__counters, **self.__gauges}.items()):
+                lines.append(f'{name + self.__format_labels(labels):<60} {value:>7}')
+        return '\n'.join(lines)
+
+    def to_prometheus(self) -> str:
+        lines, typed = [], set()
+        with self.__lock:
+            for (name, labels), histogram in sorted(self.__histograms.items()):
+                metric = self.PREFIX + name
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f'# TYPE {metric} histogram')
+                bounds = [str(bound) for bound in Histogram.BOUNDS] + ['+Inf']
+                for bound, total in zip(bounds, histogram.cumulative()):
+                    lines.append(f'{metric}_bucket{self.__format_labels(labels, (("le", bound),))} {total}')
+                lines.append(f'{metric}_sum{self.__format_labels(labels)} {histogram.sum}')
+                lines.append(f'{metric}_count{self.__format_labels(labels)} {histogram.count}')
+            for (name, labels), value in sorted(self.__counters.items()):
+                metric = self.PREFIX + name
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric}{self.__format_labels(labels)} {value}')
+            for (name, labels), value in sorted(self.__gauges.items()):
+                metric = self.PREFIX + name
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f'# TYPE {metric} gauge')
+                lines.append(f'{metric}{self.__format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self) -> None:
+        """
+            Writes the metrics to the file given at construction, if any
+        """
+        if not self.__enabled or self.__dump_path is None:
+            return
+        self.__dump_path.parent.mkdir(parents=True, exist_ok=True)
+        self.__dump_path.write_text(self.to_prometheus() if self.__prometheus else self.to_text() + '\n')
@@ -0,0 +1,95 @@
+import math
+import threading
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Callable, List
+
+from typeguard import typechecked
+from valid8 import validate
+
+from tui_ssd.domain import environ_setting
+from tui_ssd.sync import Delta
+
+
+@typechecked
+@dataclass(frozen=True)
+class PollInterval:
+    """
+        Seconds between two background refreshes: initial at first and after every poll that found changes,
+        multiplied by factor after every poll that found none, up to longest. An initial of 0 disables the polling.
+    """
+    initial: float = 30.0
+    longest: float = 600.0
+    factor: float = 2.0
+
+    def __post_init__(self):
+        validate('initial', self.initial, min_value=0.0)
+        validate('longest', self.longest, min_value=self.initial)
+        validate('factor', self.factor, min_value=1.0)
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.initial > 0
+
+    def after(self, current: float, changed: bool) -> float:
+        return self.initial if changed else min(current * self.factor, self.longest)
+
+    @staticmethod
+    def from_environ() -> 'PollInterval':
+        """
+            TUI_SSD_POLL_INTERVAL and TUI_SSD_POLL_MAX_INTERVAL, in seconds (0 disables the polling);
+            unset variables are the defaults
+        """
+        initial, longest = (environ_setting(name, _seconds) for name in ('POLL_INTERVAL', 'POLL_MAX_INTERVAL'))
+        default = PollInterval()
+        initial = initial if initial is not None else default.initial
+        return PollInterval(initial, max(longest if longest is not None else default.longest, initial))
+
+
+def _seconds(value: str) -> float:
+    validate('seconds', float(value), min_value=0.0, custom=math.isfinite)
+    return float(value)
+
+
+@typechecked
+class Poller:
+    """
+        Fetches the changes of the records in the background, one job at a time on the given executor.
+        A job waits the current interval, fetches, and ends as soon as something changed, returning the deltas
+        to be applied by the main thread; while nothing changes it keeps waiting, longer every time.
+
+        The job owns the sync state until it ends: stop() interrupts the wait, so the main thread can take it back
+        by waiting for the future, without waiting for the interval (only for a fetch in progress, if any).
+    """
+
+    def __init__(self, interval: PollInterval):
+        self.__interval = interval
+        self.__current = interval.initial
+        self.__stopped = threading.Event()
+
+    @property
+    def interval(self) -> PollInterval:
+        return self.__interval
+
+    @property
+    def current(self) -> float:
+        """
+            Seconds the next poll waits
+        """
+        return self.__current
+
+    def start(self, executor: Executor, fetch: Callable[[], List[Delta]]) -> Future:
+        self.__stopped.clear()  # Here and not in the job, so that a stop() before it runs is not lost
+        return executor.submit(self.__run, fetch)
+
+    def stop(self) -> None:
+        self.__stopped.set()
+
+    def __run(self, fetch: Callable[[], List[Delta]]) -> List[Delta]:
+        while not self.__stopped.wait(self.__current):
+            deltas = fetch()
+            changed = any(not delta.is_empty for delta in deltas)
+            self.__current = self.__interval.after(self.__current, changed)
+            if changed:
+                return deltas
+        return []
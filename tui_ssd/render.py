@@ -0,0 +1,124 @@
+import shutil
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Union
+
+from typeguard import typechecked
+from valid8 import validate
+
+from tui_ssd.domain import Condition, RecordList, RecordView, Rollup, Statistics, from_epoch_minutes
+
+CLEAR_SCREEN = '\033[H\033[2J\033[3J'  # Cursor home, clear the screen and the scrollback, as clear(1) does
+_SEPARATOR = '-' * 130
+_FMT = '%-10s %-30s %-20s %-20s %-20s %-30s'
+_HEADER = _FMT % ('#', 'CONDITION', 'TEMPERATURE (˚C)', 'HUMIDITY (%)', 'WIND (Km/h)', 'DATE')
+
+
+@lru_cache(maxsize=4096)
+def _format_row(condition: int, temperature: int, humidity: int, wind: int, date: int) -> str:
+    """
+        Columns of a row after the index, formatted from the raw values of RecordList.row.
+        Records with the same values share the string, so a redraw formats only the rows never shown before.
+    """
+    moment = from_epoch_minutes(date).strftime('%d/%m/%Y at %H:%M')  # As RecordDate.value
+    return '%-30s %-20s %-20s %-20s %-30s' % (Condition.create(str(condition)).value, temperature, humidity, wind,
+                                              moment)
+
+
+def _table(record_list: Union[RecordList, RecordView], first: int, last: int) -> List[str]:
+    lines = [_SEPARATOR, _HEADER, _SEPARATOR]
+    for index in range(first, last):
+        _, temperature, humidity, wind, condition, date = record_list.row(index)
+        lines.append('%-10s %s' % (index + 1, _format_row(condition, temperature, humidity, wind, date)))
+    lines.append(_SEPARATOR)
+    return lines
+
+
+@typechecked
+def print_records(record_list: Union[RecordList, RecordView]) -> None:
+    """
+        Clears the screen and shows all the records, with a single write
+    """
+    print(CLEAR_SCREEN + '\n'.join(_table(record_list, 0, record_list.records)))
+
+
+@typechecked
+class RecordTable:
+    """
+        Paginated table of the records. Every redraw clears the screen with ANSI escapes (no clear process is
+        started) and writes the whole page at once; only the rows of the page are read and formatted.
+        The page size follows the height of the terminal, leaving reserved_lines for the menu (see Menu.height),
+        a number or a function returning it, since the lines of the menu depend on the width of the terminal.
+    """
+    TABLE_LINES = 5  # Separators and header above the rows, separator and page footer below
+
+    def __init__(self, reserved_lines: Union[int, Callable[[], int]] = 0, page_size: Optional[int] = None):
+        if not callable(reserved_lines):
+            validate('reserved_lines', reserved_lines, min_value=0)
+        if page_size is not None:
+            validate('page_size', page_size, min_value=1)
+        self.__reserved_lines = reserved_lines
+        self.__fixed_page_size = page_size
+        self.__page = 0
+
+    @property
+    def page_size(self) -> int:
+        if self.__fixed_page_size is not None:
+            return self.__fixed_page_size
+        reserved = self.__reserved_lines() if callable(self.__reserved_lines) else self.__reserved_lines
+        return max(1, shutil.get_terminal_size().lines - reserved - self.TABLE_LINES)
+
+    @property
+    def page(self) -> int:
+        return self.__page
+
+    def pages(self, record_list: Union[RecordList, RecordView]) -> int:
+        return max(1, -(-record_list.records // self.page_size))
+
+    def next_page(self) -> None:
+        self.__page += 1  # Clamped to the last page when drawn, the list may shrink in the meantime
+
+    def previous_page(self) -> None:
+        self.__page = max(0, self.__page - 1)
+
+    def first_page(self) -> None:
+        self.__page = 0
+
+    def render(self, record_list: Union[RecordList, RecordView]) -> None:
+        page_size, pages = self.page_size, self.pages(record_list)
+        self.__page = min(self.__page, pages - 1)
+        first = self.__page * page_size
+        last = min(first + page_size, record_list.records)
+        lines = _table(record_list, first, last)
+        if pages > 1:
+            lines.append(f'Page {self.__page + 1} of {pages} (records {first + 1}-{last} of {record_list.records})')
+        print(CLEAR_SCREEN + '\n'.join(lines))
+
+
+@typechecked
+def print_statistics(title: str, statistics: Dict[str, Statistics]) -> None:
+    fmt = '%-14s %8s %6s %6s %8s %8s %6s %6s %6s %6s'
+    print(title)
+    print(fmt % ('GROUP', 'COUNT', 'MIN', 'MAX', 'MEAN', 'STDDEV', 'P50', 'P90', 'P95', 'P99'))
+    for group, stats in statistics.items():
+        print(fmt % (group, stats.count, stats.minimum, stats.maximum, f'{stats.mean:.1f}', f'{stats.stddev:.1f}',
+                     *(stats.percentiles.get(q, '') for q in (50, 90, 95, 99))))
+
+
+@typechecked
+def print_rollups(period: str, rollups: List[Rollup]) -> None:
+    """
+        One line per bucket, so the cost depends on the number of hours, days or months and not of records
+    """
+    fmt = '%-16s %7s %16s %16s %16s  %s'
+    start = {'hour': '%d/%m/%Y %H:00', 'day': '%d/%m/%Y', 'month': '%m/%Y'}[period]
+    lines = [f'RECORDS BY {period.upper()} (min/max/mean)', _SEPARATOR,
+             fmt % (period.upper(), 'COUNT', 'TEMPERATURE (˚C)', 'HUMIDITY (%)', 'WIND (Km/h)', 'CONDITION'),
+             _SEPARATOR]
+    for rollup in rollups:
+        moment = rollup.start.strftime(start)
+        lines.append(fmt % (moment, rollup.count,
+                            *(f'{summary.minimum}/{summary.maximum}/{summary.mean:.1f}'
+                              for summary in (rollup.temperature, rollup.humidity, rollup.wind)),
+                            rollup.condition.value))
+    lines.append(_SEPARATOR)
+    print(CLEAR_SCREEN + '\n'.join(lines))
@@ -0,0 +1,116 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Optional, Tuple
+
+from typeguard import typechecked
+
+from tui_ssd.domain import RecordList
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or Path.home() / '.cache'
+    return Path(base) / 'tui_ssd'
+
+
+@typechecked
+class Snapshot:
+    """
+        Copy on disk of the record list of the last user, used to show the records right after the login
+        while the list is reconciled with the server.
+
+        The file stores the arrays of the RecordList as they are in memory, so saving and loading cost one write
+        and one read per column. Layout (little endian):
+            header: magic, format version, byte order, number of records, user, ETag, Last-Modified
+            for every column: typecode, item size, raw bytes
+            trailer: CRC32 of everything before it
+        A file with another version, byte order or item size, a wrong checksum or belonging to another user
+        is invalid and is deleted.
+    """
+    MAGIC = b'TSSD'
+    VERSION = 1
+    __HEADER = struct.Struct('<4sHBQ')
+    __STRING = struct.Struct('<H')
+    __COLUMN = struct.Struct('<cBQ')
+    __TRAILER = struct.Struct('<I')
+
+    def __init__(self, username: str, directory: Optional[Path] = None):
+        self.__username = username
+        self.__path = (directory or default_cache_dir()) / 'records.snapshot'
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    def __pack_string(self, value: Optional[str]) -> bytes:
+        data = (value or '').encode('utf-8')
+        return self.__STRING.pack(len(data)) + data
+
+    def save(self, record_list: RecordList, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        parts = [self.__HEADER.pack(self.MAGIC, self.VERSION, sys.byteorder == 'big', record_list.records),
+                 self.__pack_string(self.__username), self.__pack_string(etag), self.__pack_string(last_modified)]
+        for column in record_list.columns().values():
+            data = column.tobytes()
+            parts.append(self.__COLUMN.pack(column.typecode.encode(), column.itemsize, len(data)))
+            parts.append(data)
+        crc = 0
+        for part in parts:
+            crc = zlib.crc32(part, crc)
+        parts.append(self.__TRAILER.pack(crc))
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.__path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as file:
+            file.writelines(parts)
+        os.replace(tmp_path, self.__path)  # Readers never see a half written snapshot
+
+    def load(self, record_list: RecordList) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+            Fills the list with the snapshot of the user and returns the ETag and Last-Modified it was taken with,
+            or returns None (deleting the file if it is not valid) if there is no usable snapshot.
+        """
+        try:
+            data = self.__path.read_bytes()
+        except OSError:
+            return None
+        try:
+            validators = self.__decode(data, record_list)
+        except (ValueError, TypeError, KeyError, struct.error, UnicodeDecodeError):
+            self.invalidate()
+            return None
+        return validators
+
+    def __decode(self, data: bytes, record_list: RecordList) -> Tuple[Optional[str], Optional[str]]:
+        body, (crc,) = data[:-self.__TRAILER.size], self.__TRAILER.unpack_from(data, len(data) - self.__TRAILER.size)
+        if zlib.crc32(body) != crc:
+            raise ValueError('Corrupted snapshot')
+        magic, version, big_endian, count = self.__HEADER.unpack_from(body)
+        if magic != self.MAGIC or version != self.VERSION or big_endian != (sys.byteorder == 'big'):
+            raise ValueError('Incompatible snapshot')
+        offset = self.__HEADER.size
+        strings = []
+        for _ in range(3):
+            (length,) = self.__STRING.unpack_from(body, offset)
+            offset += self.__STRING.size
+            strings.append(body[offset:offset + length].decode('utf-8'))
+            offset += length
+        username, etag, last_modified = strings
+        if username != self.__username:
+            raise ValueError('Snapshot of another user')
+        columns = {}
+        for name in RecordList.COLUMN_NAMES:
+            typecode, itemsize, length = self.__COLUMN.unpack_from(body, offset)
+            offset += self.__COLUMN.size
+            column = array(typecode.decode())
+            if column.itemsize != itemsize or length != count * itemsize:
+                raise ValueError('Incompatible snapshot')
+            column.frombytes(body[offset:offset + length])
+            offset += length
+            columns[name] = column
+        record_list.load_columns(columns)
+        return etag or None, last_modified or None
+
+    def invalidate(self) -> None:
+        self.__path.unlink(missing_ok=True)
@@ -0,0 +1,197 @@
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from itertools import compress
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+from typeguard import typechecked
+
+from tui_ssd.domain import Record, from_epoch_minutes
+
+
+@typechecked
+@dataclass(frozen=True)
+class Delta:
+    added: List[Record] = field(default_factory=list)  # New and changed records, to be (re)inserted
+    removed: List[int] = field(default_factory=list)  # Ids of deleted and changed records, to be removed first
+    changed: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.added and not self.removed
+
+
+@typechecked
+class RecordSync:
+    """
+        Remembers what the client has already received from the server, so that a reload only builds Record
+        objects for rows that are new or changed and only removes the rows that disappeared.
+        The validators (ETag and Last-Modified) of the last response are sent back on the next request:
+        a server supporting them can answer 304 Not Modified without sending the records again.
+
+        A sync can be fed page by page: begin(), then feed() for every page, then finish() to get the deleted ids.
+
+        Every record ever received stays known, also after it is evicted from the list, so the rows seen are kept
+        compactly: the ids sorted in an array and the hash of every row in a parallel array (see bytes_per_record).
+        Rows new in a sync are kept apart and merged at its end, sorting once whatever the order of the pages.
+    """
+
+    def __init__(self):
+        self.__etag: Optional[str] = None
+        self.__last_modified: Optional[str] = None
+        self.__ids = array('q')
+        self.__fingerprints = array('q')
+        self.__new: Dict[int, int] = {}  # Rows received in the current sync and not seen before, by id
+        self.__received: Set[int] = set()
+
+    @staticmethod
+    def __fingerprint(row: Mapping[str, Any]) -> int:
+        # Dates are compared up to the minute ("2023-12-08T12:20"), the resolution kept by RecordList.
+        # Fingerprints only live in this process, so the hash of the values is enough to detect a change
+        return hash((row['temperature'], row['humidity'], row['wind'], str(row['condition']), row['date'][:16]))
+
+    def __slot(self, record_id: int) -> Optional[int]:
+        slot = bisect_left(self.__ids, record_id)
+        return slot if slot < len(self.__ids) and self.__ids[slot] == record_id else None
+
+    def __merge(self) -> None:
+        new = sorted(self.__new.items())
+        self.__new.clear()
+        if not new:
+            return
+        if not self.__ids or new[0][0] > self.__ids[-1]:  # Usual case: ids grow with the records
+            self.__ids.extend(record_id for record_id, _ in new)
+            self.__fingerprints.extend(fingerprint for _, fingerprint in new)
+            return
+        rows = sorted(list(zip(self.__ids, self.__fingerprints)) + new)
+        self.__ids = array('q', (record_id for record_id, _ in rows))
+        self.__fingerprints = array('q', (fingerprint for _, fingerprint in rows))
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.__etag
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.__last_modified
+
+    @property
+    def records(self) -> int:
+        return len(self.__ids) + len(self.__new)
+
+    @property
+    def bytes_per_record(self) -> int:
+        """
+            Memory taken by a record seen, in the list or evicted: its id and its fingerprint
+        """
+        return self.__ids.itemsize + self.__fingerprints.itemsize
+
+    @property
+    def memory_usage(self) -> int:  # Bytes taken by the records seen out of a sync, see bytes_per_record
+        return self.records * self.bytes_per_record
+
+    @property
+    def request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.__etag is not None:
+            headers['If-None-Match'] = self.__etag
+        if self.__last_modified is not None:
+            headers['If-Modified-Since'] = self.__last_modified
+        return headers
+
+    def track(self, row: Mapping[str, Any]) -> None:
+        """
+            Marks a row as already known, e.g. a record the server returned when it was created
+        """
+        record_id, fingerprint = row['id'], self.__fingerprint(row)
+        if record_id in self.__new:
+            self.__new[record_id] = fingerprint
+            return
+        slot = bisect_left(self.__ids, record_id)
+        if slot < len(self.__ids) and self.__ids[slot] == record_id:
+            self.__fingerprints[slot] = fingerprint
+        else:
+            self.__ids.insert(slot, record_id)
+            self.__fingerprints.insert(slot, fingerprint)
+
+    def seed(self, rows: Iterable[tuple], etag: Optional[str], last_modified: Optional[str]) -> None:
+        """
+            Restores the state of a previous sync from the raw rows of a RecordList (see RecordList.rows),
+            e.g. after loading a snapshot from disk
+        """
+        self.reset()
+        for record_id, temperature, humidity, wind, condition, date in rows:
+            if record_id:
+                moment = from_epoch_minutes(date).isoformat(timespec='minutes')
+                self.__new[record_id] = hash((temperature, humidity, wind, str(condition), moment))
+        self.__merge()
+        self.__etag, self.__last_modified = etag, last_modified
+
+    def forget(self, record_id: int) -> None:
+        if self.__new.pop(record_id, None) is None:
+            slot = self.__slot(record_id)
+            if slot is not None:
+                del self.__ids[slot]
+                del self.__fingerprints[slot]
+
+    def begin(self) -> None:
+        self.__received.clear()
+
+    def feed(self, rows: List[Dict[str, Any]]) -> Delta:
+        """
+            Compares a page of rows sent by the server with the rows seen so far.
+            Only new and changed rows are parsed into Record objects, validating them as a batch;
+            if a row is not valid nothing is marked as seen.
+        """
+        ids, seen, new = self.__ids, self.__fingerprints, self.__new
+        new_rows, removed, fingerprints = [], [], []
+        for row in rows:  # Inlined lookups: this loop runs for every record at every load
+            record_id, fingerprint = row['id'], self.__fingerprint(row)
+            slot = bisect_left(ids, record_id)
+            if slot < len(ids) and ids[slot] == record_id:
+                previous = seen[slot]
+            else:
+                slot, previous = None, new.get(record_id)
+            if previous != fingerprint:
+                new_rows.append(row)
+                if previous is not None:
+                    removed.append(record_id)
+            fingerprints.append((record_id, slot, fingerprint))
+        added = Record.from_trusted_rows(new_rows)
+        for record_id, slot, fingerprint in fingerprints:  # Slots do not move until the sync ends
+            if slot is not None:
+                seen[slot] = fingerprint
+            else:
+                new[record_id] = fingerprint
+            self.__received.add(record_id)
+        return Delta(added, removed, len(removed))
+
+    def finish(self, headers: Mapping[str, str]) -> Delta:
+        """
+            Ends the sync started by begin(): the rows that were not received anymore have been deleted
+        """
+        kept = [record_id in self.__received for record_id in self.__ids]
+        removed = [record_id for record_id, keep in zip(self.__ids, kept) if not keep]
+        if removed:
+            self.__ids = array('q', compress(self.__ids, kept))
+            self.__fingerprints = array('q', compress(self.__fingerprints, kept))
+        self.__merge()
+        self.__received.clear()
+        self.__etag = headers.get('ETag')
+        self.__last_modified = headers.get('Last-Modified')
+        return Delta(removed=removed)
+
+    def diff(self, rows: List[Dict[str, Any]], headers: Mapping[str, str]) -> Delta:
+        """
+            Compares the full list of rows sent by the server with the rows seen so far
+        """
+        self.begin()
+        delta = self.feed(rows)
+        deleted = self.finish(headers)
+        return Delta(delta.added, delta.removed + deleted.removed, delta.changed)
+
+    def reset(self) -> None:
+        self.__etag, self.__last_modified = None, None
+        self.__ids, self.__fingerprints = array('q'), array('q')
+        self.__new.clear()
+        self.__received.clear()